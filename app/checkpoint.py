@@ -0,0 +1,146 @@
+import hashlib
+import os
+from datetime import datetime
+
+import numpy as np
+from pydantic import BaseModel
+
+from app.controller_config import ControllerConfig
+from app.geometry import TunnelGeometry
+from app.pump import (
+    PumpActivation,
+    PumpRecord,
+    PumpRuntimeLedger,
+    PumpStateRecord,
+    PumpType,
+)
+from app.pump_curves import PumpCurveTable
+
+
+"""
+Snapshots of a running simulation to restore or fork it from.
+
+A ``SimulationCheckpoint`` holds everything that carries over from one row
+to the next: the tunnel volume, the controller fields of the pump state and
+the runtime state of every pump (run start, last activation, start count and
+cumulative runtime). It is a plain
+pydantic model, so it serialises to JSON; ``simulation.resume`` and
+``simulation.fork`` continue from one.
+
+A checkpoint also records the controller config it was taken with and a
+fingerprint of the tunnel geometry and pump curves, so a run cannot silently
+continue with different physics.
+
+``simulation.run`` keeps the end state of its output next to it, in
+``state_path(output_path)``, for appending rows to the output later.
+
+A checkpoint does not grow with the run: older activations only matter to
+later decisions through the start count and the cumulative runtime.
+"""
+
+
+def state_path(output_path: str) -> str:
+    return f"{output_path}.state.json"
+
+
+def physics_fingerprint(
+    geometry: TunnelGeometry, pump_curves: PumpCurveTable | None
+) -> str:
+    """Digest of the level curve (sampled over its volume range) and pump curves."""
+    digest = hashlib.sha256()
+    volumes = np.linspace(geometry.min_volume_m3, geometry.max_volume_m3, 257)
+    digest.update(np.asarray(geometry.level_from_volume_array(volumes)).tobytes())
+    if pump_curves is not None:
+        digest.update(pump_curves.table.tobytes())
+    return digest.hexdigest()
+
+
+class PumpSnapshot(BaseModel):
+    id: str
+    pump_type: PumpType
+    current_run_time_start: datetime | None
+    last_activation: PumpActivation | None
+    # Like Pump.start_count, the current run included.
+    start_count: int
+    # Runtime of the finished activations.
+    cumulative_runtime_seconds: float
+
+    @classmethod
+    def capture(cls, pump: PumpRecord) -> "PumpSnapshot":
+        return cls.model_construct(
+            id=pump.id,
+            pump_type=pump.pump_type,
+            current_run_time_start=pump.current_run_time_start,
+            last_activation=pump.last_activation,
+            start_count=pump.start_count,
+            cumulative_runtime_seconds=pump.cumulative_runtime_seconds,
+        )
+
+    def to_record(self) -> PumpRecord:
+        # A fresh ledger, so runs forked from one snapshot never share history.
+        activation_count = self.start_count - (self.current_run_time_start is not None)
+        return PumpRecord(
+            self.id,
+            self.pump_type,
+            self.current_run_time_start,
+            PumpRuntimeLedger.restored(
+                self.last_activation, activation_count, self.cumulative_runtime_seconds
+            ),
+            activation_count,
+        )
+
+
+class SimulationCheckpoint(BaseModel):
+    # The last simulated row; a run resumed from here continues after it.
+    timestamp: datetime
+    water_volume_ul: int
+    target_outflow_ul_15min: int | None
+    average_inflow_ul_15min: int | None
+    last_daily_drain_timestamp: datetime | None
+    pending_daily_drain: bool
+    pumps: list[PumpSnapshot]
+    config: ControllerConfig
+    # See physics_fingerprint.
+    physics_fingerprint: str
+
+    @classmethod
+    def capture(
+        cls,
+        timestamp: datetime,
+        water_volume_ul: int,
+        pump_state: PumpStateRecord,
+        config: ControllerConfig,
+        physics_fingerprint: str,
+    ) -> "SimulationCheckpoint":
+        return cls.model_construct(
+            timestamp=timestamp,
+            water_volume_ul=water_volume_ul,
+            target_outflow_ul_15min=pump_state.target_outflow_ul_15min,
+            average_inflow_ul_15min=pump_state.average_inflow_ul_15min,
+            last_daily_drain_timestamp=pump_state.last_daily_drain_timestamp,
+            pending_daily_drain=pump_state.pending_daily_drain,
+            pumps=[PumpSnapshot.capture(pump) for pump in pump_state.pumps],
+            config=config,
+            physics_fingerprint=physics_fingerprint,
+        )
+
+    def pump_state(self) -> PumpStateRecord:
+        return PumpStateRecord(
+            pumps=[pump.to_record() for pump in self.pumps],
+            target_outflow_ul_15min=self.target_outflow_ul_15min,
+            average_inflow_ul_15min=self.average_inflow_ul_15min,
+            last_daily_drain_timestamp=self.last_daily_drain_timestamp,
+            pending_daily_drain=self.pending_daily_drain,
+        )
+
+    def save(self, file_path: str) -> None:
+        # Replace the file in one step, so a killed run leaves the previous one.
+        temporary_path = f"{file_path}.tmp"
+        with open(temporary_path, "w") as file:
+            file.write(self.model_dump_json())
+        os.replace(temporary_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: str) -> "SimulationCheckpoint":
+        with open(file_path) as file:
+            return cls.model_validate_json(file.read())
@@ -0,0 +1,166 @@
+import os
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+import pandas
+import pytest
+
+from app.checkpoint import SimulationCheckpoint, state_path
+from app.controller_config import DEFAULT_CONTROLLER_CONFIG
+from app.instrumentation import Instrumentation
+from app.pump_curves import DEFAULT_PUMP_CURVES
+from app.result_sink import read_results
+from app.simulation import fork, resume, run, simulate
+from app.testing import storm_dataframe
+
+
+class TestCheckpoint:
+    def test_resumed_run_matches_the_tail_of_the_full_run(self) -> None:
+        dataframe = storm_dataframe()
+        checkpoints: list[SimulationCheckpoint] = []
+        full = simulate(
+            dataframe,
+            Decimal(20_000),
+            verbose=False,
+            fast_forward=True,
+            checkpoint_every=96,
+            on_checkpoint=checkpoints.append,
+        )
+
+        assert [checkpoint.timestamp for checkpoint in checkpoints] == [
+            dataframe["timestamp"].iloc[row].to_pydatetime()
+            for row in (96, 192, 288, 384, 480, 576, 599)
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, "state.json")
+            checkpoints[2].save(file_path)
+            checkpoint = SimulationCheckpoint.load(file_path)
+
+        resumed = resume(dataframe, checkpoint)
+        pandas.testing.assert_frame_equal(
+            resumed.to_dataframe(),
+            full.to_dataframe(start=289).reset_index(drop=True),
+            check_exact=True,
+        )
+        assert resumed.final_water_volume_ul == full.final_water_volume_ul
+
+    def test_forks_share_the_history_before_the_checkpoint(self) -> None:
+        dataframe = storm_dataframe()
+        checkpoints: list[SimulationCheckpoint] = []
+        simulate(
+            dataframe,
+            Decimal(20_000),
+            verbose=False,
+            checkpoint_every=200,
+            on_checkpoint=checkpoints.append,
+        )
+        smoothing = DEFAULT_CONTROLLER_CONFIG.model_copy(
+            update={"smoothing_alpha": Decimal("0.5")}
+        )
+        snapshots = [pump.model_dump() for pump in checkpoints[0].pumps]
+
+        logs = fork(
+            dataframe,
+            checkpoints[0],
+            {"default": DEFAULT_CONTROLLER_CONFIG, "fast_smoothing": smoothing},
+        )
+
+        assert {name: len(log) for name, log in logs.items()} == {
+            "default": 399,
+            "fast_smoothing": 399,
+        }
+        assert not np.array_equal(
+            logs["default"].outflow_m3_15min, logs["fast_smoothing"].outflow_m3_15min
+        )
+        # The forks extend copies of the pump histories, not the checkpoint's.
+        assert [pump.model_dump() for pump in checkpoints[0].pumps] == snapshots
+
+    def test_appended_run_continues_from_the_stored_end_state(
+        self, tmp_path: Path
+    ) -> None:
+        dataframe = storm_dataframe()
+        output_path = str(tmp_path / "out.csv")
+        run(dataframe.iloc[:400], Decimal(20_000), output_path=output_path)
+        checkpoint = SimulationCheckpoint.load(state_path(output_path))
+        first = read_results(output_path)
+
+        run(
+            dataframe.iloc[400:],
+            Decimal(0),
+            output_path=output_path,
+            append=True,
+        )
+
+        written = read_results(output_path)
+        assert len(written) == 600
+        expected = resume(dataframe, checkpoint).to_dataframe()
+        pandas.testing.assert_frame_equal(
+            written.iloc[400:].drop(columns="Time stamp").reset_index(drop=True),
+            expected.drop(columns="Time stamp"),
+        )
+        pandas.testing.assert_frame_equal(written.iloc[:400], first)
+
+    def test_checkpoints_follow_the_written_rows_and_the_run_settings(
+        self,
+    ) -> None:
+        dataframe = storm_dataframe(300)
+        written = []
+        checkpoints: list[SimulationCheckpoint] = []
+
+        class Sink:
+            def write_batch(self, frame: pandas.DataFrame) -> None:
+                written.extend(frame["Time stamp"])
+
+            def close(self) -> None:
+                pass
+
+        def on_checkpoint(checkpoint: SimulationCheckpoint) -> None:
+            assert written[-1] == checkpoint.timestamp
+            checkpoints.append(checkpoint)
+
+        simulate(
+            dataframe,
+            Decimal(20_000),
+            verbose=False,
+            sink=Sink(),
+            batch_size=1000,
+            checkpoint_every=50,
+            on_checkpoint=on_checkpoint,
+        )
+
+        assert len(checkpoints) == 6
+        with pytest.raises(ValueError):
+            resume(dataframe, checkpoints[0], pump_curves=DEFAULT_PUMP_CURVES)
+        instrumentation = Instrumentation()
+        resume(dataframe, checkpoints[0], instrumentation=instrumentation)
+        assert instrumentation.report().wall_s > 0
+
+    def test_state_size_does_not_grow_with_the_history(self, tmp_path: Path) -> None:
+        dataframe = storm_dataframe(1200)
+        checkpoints: list[SimulationCheckpoint] = []
+        simulate(
+            dataframe,
+            Decimal(20_000),
+            verbose=False,
+            checkpoint_every=300,
+            on_checkpoint=checkpoints.append,
+        )
+        sizes = []
+        for index, checkpoint in enumerate(checkpoints):
+            file_path = str(tmp_path / f"{index}.json")
+            checkpoint.save(file_path)
+            sizes.append(os.path.getsize(file_path))
+
+        assert max(sizes) - min(sizes) < 100
+        first, last = checkpoints[0].pump_state(), checkpoints[-1].pump_state()
+        assert sum(pump.start_count for pump in last.pumps) > sum(
+            pump.start_count for pump in first.pumps
+        )
+        for snapshot, pump in zip(checkpoints[-1].pumps, last.pumps):
+            assert pump.start_count == snapshot.start_count
+            assert pump.cumulative_runtime_seconds == (
+                snapshot.cumulative_runtime_seconds
+            )
+            assert pump.last_activation == snapshot.last_activation
@@ -0,0 +1,83 @@
+import hashlib
+from datetime import timedelta
+from decimal import Decimal
+from functools import lru_cache
+
+from pydantic import BaseModel, ConfigDict
+
+from app.fixed_point import VOLUME_UNITS_PER_M3, as_ratio, decimal_units
+
+
+class ControllerConfig(BaseModel):
+    """Tuning constants of the constant flow controller.
+
+    The defaults are the values the controller was hand-tuned with.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    # Pumps stay on (or off) at least this long after a toggle.
+    min_runtime: timedelta = timedelta(hours=2)
+    # Inflow above this counts as rain: no price-driven slow-down, no drain.
+    rain_threshold_m3_15min: Decimal = Decimal("2000")
+    # Step size of the outflow target and of the price bias.
+    flow_increment_m3_15min: Decimal = Decimal("375")
+    # Weight of the newest inflow in the exponentially smoothed inflow.
+    smoothing_alpha: Decimal = Decimal("0.2")
+    # Expensive-price slow-down only below these levels (q75 and mean rules).
+    expensive_price_max_level_m: Decimal = Decimal("7.0")
+    above_mean_price_max_level_m: Decimal = Decimal("6.5")
+    # The tunnel must reach this level at least once per drain interval.
+    drain_target_level_m: Decimal = Decimal("0.5")
+    drain_interval: timedelta = timedelta(hours=24)
+
+    def config_hash(self) -> str:
+        """Stable across processes, and equal for equal values (7.0 and 7)."""
+        key = {
+            name: str(value.normalize()) if isinstance(value, Decimal) else str(value)
+            for name, value in self.model_dump().items()
+        }
+        return hashlib.sha256(repr(sorted(key.items())).encode()).hexdigest()
+
+
+class FixedControllerConfig(BaseModel):
+    """A ``ControllerConfig`` in the integer units of ``app.fixed_point``.
+
+    Level limits stay floats: a float level compares with ``float(limit)``
+    exactly as its shortest decimal repr compares with the Decimal limit.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    min_runtime: timedelta
+    rain_threshold_ul_15min: int
+    flow_increment_ul_15min: int
+    smoothing_numerator: int
+    smoothing_denominator: int
+    expensive_price_max_level_m: float
+    above_mean_price_max_level_m: float
+    drain_target_level_m: float
+    drain_interval: timedelta
+
+
+@lru_cache(maxsize=256)
+def fixed_controller_config(config: ControllerConfig) -> FixedControllerConfig:
+    numerator, denominator = as_ratio(config.smoothing_alpha)
+    return FixedControllerConfig(
+        min_runtime=config.min_runtime,
+        rain_threshold_ul_15min=decimal_units(
+            config.rain_threshold_m3_15min, VOLUME_UNITS_PER_M3
+        ),
+        flow_increment_ul_15min=decimal_units(
+            config.flow_increment_m3_15min, VOLUME_UNITS_PER_M3
+        ),
+        smoothing_numerator=numerator,
+        smoothing_denominator=denominator,
+        expensive_price_max_level_m=float(config.expensive_price_max_level_m),
+        above_mean_price_max_level_m=float(config.above_mean_price_max_level_m),
+        drain_target_level_m=float(config.drain_target_level_m),
+        drain_interval=config.drain_interval,
+    )
+
+
+DEFAULT_CONTROLLER_CONFIG = ControllerConfig()
@@ -0,0 +1,356 @@
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+
+from app.controller_config import DEFAULT_CONTROLLER_CONFIG, ControllerConfig
+from app.geometry import ANALYTIC_GEOMETRY, TunnelGeometry
+from app.price_window import forward_price_stat_arrays
+from app.pump import Pump, default_pumps
+from app.vectorized_simulation import (
+    MAX_SAFE_LEVEL_M,
+    NO_TIME,
+    PumpFleetArrays,
+    SimulationArrays,
+)
+from app.water_level import V_MIN
+
+
+"""
+Monte Carlo ensembles: K inflow scenarios simulated together.
+
+``perturbed_inflows`` builds K storm variants of the measured inflow (block
+bootstrap, time shift, scaling). ``run_ensemble`` steps all of them at once:
+the state of every member is a row of (K,) or (K, pumps) arrays, the mass
+balance is one vector operation per step, and the constant flow controller
+picks every member's activation mask in one (K, masks) scoring pass. The
+scoring uses the lexicographic order of ``ActivationMaskTable.best_mask``.
+With the same inflow a member follows ``run_vectorized`` step for step.
+
+A member that reaches ``MAX_SAFE_LEVEL_M`` counts as overflowed and is frozen
+there, like a single run that stops at the breach. Pumps deliver their
+nominal flow and power.
+"""
+
+STEP_HOURS = 0.25
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def scaled_inflows(inflow: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return np.asarray(scales, dtype=float)[:, None] * np.asarray(inflow, dtype=float)
+
+
+def shifted_inflows(inflow: np.ndarray, shifts: np.ndarray) -> np.ndarray:
+    """Row k is the inflow rotated ``shifts[k]`` steps later in time."""
+    inflow = np.asarray(inflow, dtype=float)
+    positions = (np.arange(len(inflow))[None, :] - np.asarray(shifts)[:, None]) % len(
+        inflow
+    )
+    return inflow[positions]
+
+
+def block_bootstrap_inflows(
+    inflow: np.ndarray, members: int, block_steps: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Rows stitched from randomly chosen blocks of ``block_steps`` consecutive steps."""
+    inflow = np.asarray(inflow, dtype=float)
+    size = len(inflow)
+    block_count = -(-size // block_steps)
+    starts = rng.integers(
+        0, max(size - block_steps, 0) + 1, size=(members, block_count)
+    )
+    positions = (starts[:, :, None] + np.arange(block_steps)).reshape(members, -1)
+    return inflow[np.minimum(positions[:, :size], size - 1)]
+
+
+def perturbed_inflows(
+    inflow: np.ndarray,
+    members: int,
+    seed: int = 0,
+    scale_range: tuple[float, float] = (1.0, 2.0),
+    max_shift_steps: int = 96,
+    block_steps: int = 96,
+) -> np.ndarray:
+    """(members, T) storm scenarios: bootstrapped, shifted and scaled inflow."""
+    rng = np.random.default_rng(seed)
+    bootstrapped = block_bootstrap_inflows(inflow, members, block_steps, rng)
+    shifts = rng.integers(0, max_shift_steps + 1, size=members)
+    positions = (np.arange(bootstrapped.shape[1])[None, :] - shifts[:, None]) % (
+        bootstrapped.shape[1]
+    )
+    shifted = np.take_along_axis(bootstrapped, positions, axis=1)
+    return rng.uniform(*scale_range, size=members)[:, None] * shifted
+
+
+class EnsembleSummary(BaseModel):
+    members: int
+    overflow_probability: float
+    peak_level_m: dict[str, float]
+    cost_eur: dict[str, float]
+    energy_kwh: dict[str, float]
+
+
+class EnsembleResult(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    # One entry per member.
+    peak_level_m: np.ndarray
+    overflowed: np.ndarray
+    # First step at or above MAX_SAFE_LEVEL_M, -1 for members that never got there.
+    overflow_step: np.ndarray
+    cost_eur: np.ndarray
+    energy_kwh: np.ndarray
+    # (K, T) logs; rows of overflowed members stop changing at the breach.
+    water_level_m: np.ndarray
+    activation_masks: np.ndarray
+
+    def summary(self) -> EnsembleSummary:
+        def distribution(values: np.ndarray) -> dict[str, float]:
+            stats = {
+                f"p{percentile}": float(value)
+                for percentile, value in zip(
+                    PERCENTILES, np.percentile(values, PERCENTILES)
+                )
+            }
+            stats["mean"] = float(values.mean())
+            stats["max"] = float(values.max())
+            return stats
+
+        return EnsembleSummary(
+            members=len(self.peak_level_m),
+            overflow_probability=float(self.overflowed.mean()),
+            peak_level_m=distribution(self.peak_level_m),
+            cost_eur=distribution(self.cost_eur),
+            energy_kwh=distribution(self.energy_kwh),
+        )
+
+
+def _round_half_up(values: np.ndarray, increment: float) -> np.ndarray:
+    steps = values / increment
+    return np.copysign(np.floor(np.abs(steps) + 0.5), steps) * increment
+
+
+def _tie_break_table(mask_capacity: np.ndarray, popcounts: np.ndarray) -> np.ndarray:
+    """Integer key of every (current mask, candidate mask) pair.
+
+    Orders candidates of equal capacity difference like ``best_mask`` does:
+    by toggles, smoothing penalty, pumps on and finally the mask itself, so
+    the smallest key of a row names the winning mask.
+    """
+    masks = np.arange(len(mask_capacity))
+    toggles = popcounts[masks[:, None] ^ masks[None, :]]
+    _, smoothing_rank = np.unique(
+        np.abs(mask_capacity[:, None] - mask_capacity[None, :]), return_inverse=True
+    )
+    smoothing_rank = smoothing_rank.reshape(toggles.shape)
+    key = toggles * (smoothing_rank.max() + 1) + smoothing_rank
+    key = key * (popcounts.max() + 1) + popcounts[None, :]
+    return key * len(masks) + masks[None, :]
+
+
+def run_ensemble(
+    arrays: SimulationArrays,
+    initial_water_volume_m3: float,
+    inflows_m3_15min: np.ndarray,
+    pumps: list[Pump] | None = None,
+    config: ControllerConfig = DEFAULT_CONTROLLER_CONFIG,
+    geometry: TunnelGeometry = ANALYTIC_GEOMETRY,
+) -> EnsembleResult:
+    """Simulate every row of ``inflows_m3_15min`` against the prices of ``arrays``."""
+    inflows = np.asarray(inflows_m3_15min, dtype=float)
+    members, size = inflows.shape
+    if size != len(arrays):
+        raise ValueError("Every inflow scenario needs one value per input row")
+    if pumps is None:
+        pumps = default_pumps()
+    fleet = PumpFleetArrays(pumps)
+    mask_table = fleet.mask_table
+
+    timestamps = arrays.timestamps_s
+    prices = arrays.price_eur_cent_per_kwh
+    price_stats = forward_price_stat_arrays(timestamps, prices)
+
+    min_runtime_s = int(config.min_runtime.total_seconds())
+    drain_interval_s = int(config.drain_interval.total_seconds())
+    rain_threshold = float(config.rain_threshold_m3_15min)
+    flow_increment = float(config.flow_increment_m3_15min)
+    expensive_price_max_level = float(config.expensive_price_max_level_m)
+    above_mean_price_max_level = float(config.above_mean_price_max_level_m)
+    drain_target_level = float(config.drain_target_level_m)
+    alpha = float(config.smoothing_alpha)
+    max_capacity = fleet.max_capacity
+    min_capacity = fleet.min_capacity
+
+    # Every activation mask as a column: capacity, power, pump count.
+    all_masks = np.arange(len(mask_table.capacities))
+    mask_capacity = np.asarray(mask_table.capacities, dtype=float)
+    popcounts = np.asarray(mask_table.popcounts)
+    bit_values = np.asarray(fleet.bit_values)
+    mask_power_kw = ((all_masks[:, None] & bit_values) != 0) @ fleet.power_kw
+    switched_on_capacity = mask_capacity > 0
+    # The per-step (K, masks) gathers are the hot spot; keep their rows narrow.
+    mask_count = len(all_masks)
+    mask_dtype = np.min_scalar_type(mask_count - 1)
+    toggled_by_mask = (all_masks[:, None] ^ all_masks[None, :]).astype(mask_dtype)
+    tie_break = _tie_break_table(mask_capacity, popcounts)
+    tie_break = tie_break.astype(np.min_scalar_type(tie_break.max() + 1))
+    no_key = np.iinfo(tie_break.dtype).max
+
+    pump_count = len(pumps)
+    volume = np.full(members, float(initial_water_volume_m3))
+    level = geometry.level_from_volume_array(volume, out_of_range="clip")
+    is_active = np.zeros((members, pump_count), dtype=bool)
+    run_start_s = np.full((members, pump_count), NO_TIME, dtype=np.int64)
+    last_stop_s = np.full((members, pump_count), NO_TIME, dtype=np.int64)
+    current_mask = np.zeros(members, dtype=np.int64)
+    current_capacity = np.zeros(members)
+    target_outflow = np.full(members, np.nan)
+    last_drain_s = np.full(members, NO_TIME, dtype=np.int64)
+    pending_drain = np.zeros(members, dtype=bool)
+    average_inflow = inflows[:, min(1, size - 1)].copy()
+
+    alive = np.ones(members, dtype=bool)
+    overflow_step = np.full(members, -1, dtype=np.int64)
+    energy_kwh = np.zeros(members)
+    cost_eur = np.zeros(members)
+    water_level = np.empty((members, size))
+    water_level[:, 0] = level
+    activation_masks = np.zeros((members, size), dtype=np.int64)
+
+    for index in range(1, size):
+        step_inflow = inflows[:, index]
+
+        # Mass balance of every member, as in run_step.
+        max_removable = np.maximum(volume + step_inflow - V_MIN, 0.0)
+        step_outflow = np.minimum(current_capacity, max_removable)
+        new_volume = np.maximum(volume + step_inflow - step_outflow, V_MIN)
+        new_level = geometry.level_from_volume_array(new_volume, out_of_range="clip")
+
+        breached = alive & (new_level >= MAX_SAFE_LEVEL_M)
+        overflow_step[breached] = index
+        water_level[:, index] = np.where(alive, new_level, water_level[:, index - 1])
+        alive &= ~breached
+        activation_masks[:, index] = current_mask
+        step_energy = np.where(alive, mask_power_kw[current_mask] * STEP_HOURS, 0.0)
+        energy_kwh += step_energy
+        cost_eur += step_energy * float(prices[index]) / 100.0
+
+        # Constant flow controller, fed with the volume before this step.
+        now_s = int(timestamps[index])
+        low_inflow = step_inflow <= rain_threshold
+        meets_drain_target = level <= drain_target_level
+        last_drain_s[meets_drain_target] = now_s
+        pending_drain &= ~meets_drain_target
+        drain_due = (last_drain_s == NO_TIME) | (
+            now_s - last_drain_s >= drain_interval_s
+        )
+        pending_drain |= drain_due & ~meets_drain_target
+
+        if index > 1:
+            average_inflow = average_inflow * (1.0 - alpha) + step_inflow * alpha
+
+        current_target = np.where(
+            np.isnan(target_outflow) | (target_outflow == 0.0),
+            current_capacity,
+            target_outflow,
+        )
+        current_target[current_target == 0.0] = min_capacity
+
+        baseline_target = np.clip(
+            _round_half_up(average_inflow, flow_increment), min_capacity, max_capacity
+        )
+        if price_stats.count[index] > 0:
+            # The elif chain of the controller, evaluated for every member.
+            price = float(prices[index])
+            below_mean = (
+                price <= price_stats.mean_price[index]
+                and price <= price_stats.min_price[index]
+            )
+            price_bias = np.select(
+                [
+                    np.full(members, price <= price_stats.q25_price[index]),
+                    (price >= price_stats.q75_price[index])
+                    & low_inflow
+                    & (level < expensive_price_max_level),
+                    (
+                        price > price_stats.mean_price[index]
+                        and price > price_stats.min_price[index]
+                    )
+                    & low_inflow
+                    & (level < above_mean_price_max_level),
+                    np.full(members, below_mean),
+                ],
+                [1.0, -1.0, -1.0, 1.0],
+                0.0,
+            )
+            price_bias[pending_drain] = 0.0
+            baseline_target = np.clip(
+                baseline_target + price_bias * flow_increment,
+                min_capacity,
+                max_capacity,
+            )
+
+        delta = baseline_target - current_target
+        desired_target = np.where(
+            delta > flow_increment,
+            current_target + flow_increment,
+            np.where(
+                delta < -flow_increment,
+                current_target - flow_increment,
+                baseline_target,
+            ),
+        )
+        desired_target = np.clip(desired_target, min_capacity, max_capacity)
+        draining = pending_drain & low_inflow & ~meets_drain_target
+        desired_target[draining] = max_capacity
+
+        max_safe_outflow = np.maximum(
+            np.maximum(volume + step_inflow - V_MIN, 0.0), min_capacity
+        )
+        desired_target = np.minimum(desired_target, max_safe_outflow)
+
+        # Pumps whose state may change under the minimum runtime rule.
+        changeable = np.where(
+            is_active,
+            now_s - run_start_s >= min_runtime_s,
+            (last_stop_s == NO_TIME) | (now_s - last_stop_s >= min_runtime_s),
+        )
+        fixed_bits = (~(changeable @ bit_values) & (mask_count - 1)).astype(mask_dtype)
+
+        # best_mask for every member: closest capacity first, then the tie-break key.
+        reachable = (
+            (toggled_by_mask[current_mask] & fixed_bits[:, None]) == 0
+        ) & switched_on_capacity
+        diff = np.where(
+            reachable, np.abs(mask_capacity - desired_target[:, None]), np.inf
+        )
+        min_diff = diff.min(axis=1)
+        closest_key = np.where(
+            diff == min_diff[:, None], tie_break[current_mask], no_key
+        )
+        best_mask = closest_key.min(axis=1) % mask_count
+        best_mask = np.where(alive & (min_diff < np.inf), best_mask, current_mask)
+
+        changed = ((best_mask ^ current_mask)[:, None] & bit_values) != 0
+        stopped = changed & is_active
+        started = changed & ~is_active
+        last_stop_s[stopped] = now_s
+        run_start_s[stopped] = NO_TIME
+        run_start_s[started] = now_s
+        is_active ^= changed
+        current_mask = best_mask
+        current_capacity = mask_capacity[best_mask]
+        target_outflow = np.where(
+            alive, np.minimum(current_capacity, max_safe_outflow), target_outflow
+        )
+
+        volume = np.where(alive, new_volume, volume)
+        level = np.where(alive, new_level, level)
+
+    return EnsembleResult(
+        peak_level_m=water_level.max(axis=1),
+        overflowed=overflow_step >= 0,
+        overflow_step=overflow_step,
+        cost_eur=cost_eur,
+        energy_kwh=energy_kwh,
+        water_level_m=water_level,
+        activation_masks=activation_masks,
+    )
@@ -0,0 +1,59 @@
+import numpy as np
+
+from app.ensemble import perturbed_inflows, run_ensemble, scaled_inflows
+from app.kpi import kpis_from_log
+from app.vectorized_simulation import run_vectorized
+from app.testing import synthetic_arrays
+
+
+class TestEnsemble:
+    def test_members_follow_separate_runs(self) -> None:
+        arrays = synthetic_arrays(400)
+        scales = np.array([1.0, 0.6, 1.7, 4.0])
+
+        ensemble = run_ensemble(
+            arrays, 20_000.0, scaled_inflows(arrays.inflow_m3_15min, scales)
+        )
+
+        for member, scale in enumerate(scales):
+            single = run_vectorized(
+                arrays.model_copy(
+                    update={"inflow_m3_15min": arrays.inflow_m3_15min * scale}
+                ),
+                20_000.0,
+            )
+            steps = len(single.log)
+            assert ensemble.overflowed[member] == single.breached_safe_level
+            assert np.array_equal(
+                ensemble.activation_masks[member, :steps], single.log.activation_masks
+            )
+            assert np.array_equal(
+                ensemble.water_level_m[member, :steps], single.log.water_level_m
+            )
+            assert np.isclose(
+                ensemble.cost_eur[member], kpis_from_log(single.log).cost_normal_eur
+            )
+        assert ensemble.overflowed.tolist() == [False, False, False, True]
+        assert ensemble.overflow_step[-1] == len(
+            run_vectorized(
+                arrays.model_copy(
+                    update={"inflow_m3_15min": arrays.inflow_m3_15min * 4}
+                ),
+                20_000.0,
+            ).log
+        )
+
+    def test_summary_of_perturbed_storms(self) -> None:
+        arrays = synthetic_arrays(400)
+        inflows = perturbed_inflows(arrays.inflow_m3_15min, 64, seed=3)
+
+        assert inflows.shape == (64, len(arrays))
+        assert np.array_equal(
+            inflows, perturbed_inflows(arrays.inflow_m3_15min, 64, seed=3)
+        )
+        summary = run_ensemble(arrays, 20_000.0, inflows).summary()
+
+        assert summary.members == 64
+        assert 0.0 <= summary.overflow_probability <= 1.0
+        assert summary.peak_level_m["p5"] <= summary.peak_level_m["p95"]
+        assert summary.cost_eur["p50"] > 0
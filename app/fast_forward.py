@@ -0,0 +1,293 @@
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+from decimal import Decimal
+import math
+from typing import NamedTuple
+
+import numpy as np
+import pandas
+
+from app.controller_config import ControllerConfig, fixed_controller_config
+from app.fixed_point import (
+    VOLUME_UNITS_PER_M3,
+    decimal_units,
+    round_half_up_div,
+)
+from app.geometry import TunnelGeometry
+from app.price_window import IntegerPriceWindowStats, forward_price_stat_arrays
+from app.pump import PUMP_CAPACITY_UL_15MIN, PumpStateRecord, PumpType
+from app.water_level import V_MIN
+
+
+"""
+Event-driven fast-forward for the constant flow controller.
+
+``change_pump_state_constant_flow`` keeps the running pumps exactly when its
+desired target equals their capacity ``C`` and at least ``C`` can be pumped
+without going below the minimum volume. The desired target is then ``C``
+until an event changes it: the smoothed inflow rounding to another flow
+step, a price-quantile change, the level crossing one of the price-rule
+limits or the drain target, the drain deadline passing, or the volume
+running low. While the pumps keep running none of these depend on the
+pumps, so:
+
+* the smoothed inflow, its flow step and the price rule of every row are
+  functions of the input columns only and are computed once per run;
+* the volume after ``k`` quiet rows is ``v + sum(inflow) - k * C`` (no
+  clamping, since a quiet row pumps ``C`` in full);
+* the drain deadline is a comparison against the last drain timestamp.
+
+``advance`` walks these per-row values from a decision row until the first
+event, which the simulation then runs through the full controller. Quiet
+rows cost a few integer comparisons and one level lookup instead of a mask
+search. Min-runtime expiries need no event of their own: they only matter
+when the controller wants another capacity, and that row is an event.
+"""
+
+MIN_VOLUME_REMAINING_UL = decimal_units(Decimal(str(V_MIN)), VOLUME_UNITS_PER_M3)
+# Rows that would trip the safety checks of ``simulate`` are never skipped.
+MAX_LEVEL_M = 8.0
+MAX_VOLUME_UL = 225000 * VOLUME_UNITS_PER_M3
+NO_LEVEL_LIMIT = -math.inf
+
+
+def smoothed_inflows(
+    inflows_ul_15min: Sequence[int],
+    config: ControllerConfig,
+    initial_average_inflow_ul_15min: int | None = None,
+) -> list[int]:
+    """The controller's smoothed inflow after every row.
+
+    It only depends on the inflow column and its value at row 0, as long as
+    the controller sees every later row, which quiet rows replay. Row 0 is
+    the initial state, where the controller does not run; its entry is
+    ``initial_average_inflow_ul_15min`` (0 for None).
+    """
+    fixed_config = fixed_controller_config(config)
+    numerator = fixed_config.smoothing_numerator
+    denominator = fixed_config.smoothing_denominator
+    average = initial_average_inflow_ul_15min
+    averages = [average or 0]
+    for inflow in inflows_ul_15min[1:]:
+        average = (
+            inflow
+            if average is None
+            else round_half_up_div(
+                average * (denominator - numerator) + inflow * numerator,
+                denominator,
+            )
+        )
+        averages.append(average)
+    return averages
+
+
+class QuietStretch(NamedTuple):
+    """Rows ``start`` up to ``stop`` (exclusive) with the running pumps kept."""
+
+    start: int
+    stop: int
+    water_volume_ul: list[int]
+    water_level_m: list[float]
+    pump_state: PumpStateRecord
+
+
+class FastForward:
+    """Per-row controller inputs of one run and the quiet-stretch search over them."""
+
+    def __init__(
+        self,
+        timestamps: Sequence[datetime],
+        inflows_ul_15min: Sequence[int],
+        price_milli_cents: Sequence[int | None],
+        pump_types: Sequence[PumpType],
+        geometry: TunnelGeometry,
+        config: ControllerConfig,
+        horizon: timedelta = timedelta(hours=24),
+        initial_average_inflow_ul_15min: int | None = None,
+    ) -> None:
+        fixed_config = fixed_controller_config(config)
+        self.geometry = geometry
+        self.timestamps = list(timestamps)
+        self.timestamps_ns = pandas.DatetimeIndex(self.timestamps).asi8
+        self.inflows_ul_15min = list(inflows_ul_15min)
+        self.drain_interval = fixed_config.drain_interval
+        self.drain_target_level_m = fixed_config.drain_target_level_m
+
+        capacities = [PUMP_CAPACITY_UL_15MIN[pump_type] for pump_type in pump_types]
+        self.max_capacity = sum(capacities)
+        min_capacity = min(capacities)
+        increment = fixed_config.flow_increment_ul_15min
+        rain_threshold = fixed_config.rain_threshold_ul_15min
+
+        self.average_inflow_ul_15min = smoothed_inflows(
+            self.inflows_ul_15min, config, initial_average_inflow_ul_15min
+        )
+
+        # ``round_to_increment`` for every row: half up is floor(x / d + 1 / 2).
+        averages = np.array(self.average_inflow_ul_15min, dtype=np.int64)
+        rounded = (
+            np.sign(averages)
+            * ((2 * np.abs(averages) + increment) // (2 * increment))
+            * increment
+            if increment
+            else averages
+        )
+        baseline = np.clip(rounded, min_capacity, self.max_capacity)
+        self.baseline = baseline.tolist()
+        self.raised_baseline = np.clip(
+            baseline + increment, min_capacity, self.max_capacity
+        ).tolist()
+        self.lowered_baseline = np.clip(
+            baseline - increment, min_capacity, self.max_capacity
+        ).tolist()
+        low_inflow = np.array(self.inflows_ul_15min, dtype=np.int64) <= rain_threshold
+        self.low_inflow = low_inflow.tolist()
+
+        # The price rule of each row from the same integer window statistics
+        # the controller uses: a raised baseline, or a lowered one below a
+        # level limit, or else ``price_at_minimum`` raises it. The q75 rule
+        # has the higher limit and comes first, so one limit per row covers
+        # both. Integer prices are exact in float64, so the vectorised window
+        # picks the same min and quantiles; the sum is an integer cumsum.
+        has_price = np.array([price is not None for price in price_milli_cents])
+        prices = np.array(
+            [0 if price is None else price for price in price_milli_cents],
+            dtype=np.int64,
+        )
+        horizon_ns = horizon // pandas.Timedelta(1, "ns")
+        arrays = forward_price_stat_arrays(
+            self.timestamps_ns,
+            np.where(has_price, prices, np.nan),
+            horizon_s=horizon_ns,
+        )
+        starts = np.searchsorted(self.timestamps_ns, self.timestamps_ns, side="right")
+        ends = np.searchsorted(
+            self.timestamps_ns, self.timestamps_ns + horizon_ns, side="right"
+        )
+        price_sums = np.concatenate(([0], np.cumsum(prices)))
+        price_sum = price_sums[ends] - price_sums[starts]
+        count = arrays.count
+        has_forecast = has_price & (count > 0)
+        min_price = np.where(has_forecast, arrays.min_price, 0).astype(np.int64)
+        q25_price = np.where(has_forecast, arrays.q25_price, 0).astype(np.int64)
+        q75_price = np.where(has_forecast, arrays.q75_price, 0).astype(np.int64)
+        above_mean = prices * count > price_sum
+        lowering_level_limit = np.select(
+            [prices >= q75_price, above_mean & (prices > min_price)],
+            [
+                fixed_config.expensive_price_max_level_m,
+                fixed_config.above_mean_price_max_level_m,
+            ],
+            NO_LEVEL_LIMIT,
+        )
+
+        self._window_stats = (
+            count.tolist(),
+            min_price.tolist(),
+            q25_price.tolist(),
+            q75_price.tolist(),
+            price_sum.tolist(),
+        )
+        self.has_price = has_price.tolist()
+        self.has_forecast = has_forecast.tolist()
+        self.price_at_q25 = (has_forecast & (prices <= q25_price)).tolist()
+        self.price_at_minimum = (
+            has_forecast & ~above_mean & (prices <= min_price)
+        ).tolist()
+        self.lowering_level_limit_m = np.where(
+            has_forecast & low_inflow, lowering_level_limit, NO_LEVEL_LIMIT
+        ).tolist()
+
+    def price_stats(self, index: int) -> IntegerPriceWindowStats | None:
+        """``ForwardPriceWindow.integer_stats`` of row ``index``."""
+        count, min_price, q25_price, q75_price, price_sum = self._window_stats
+        if count[index] == 0:
+            return None
+        return IntegerPriceWindowStats(
+            min_price=min_price[index],
+            q25_price=q25_price[index],
+            q75_price=q75_price[index],
+            price_sum=price_sum[index],
+            count=count[index],
+        )
+
+    def _target(self, index: int, water_level_m: float, pending_drain: bool) -> int:
+        """Desired target of row ``index`` before the step toward it."""
+        if pending_drain or not self.has_forecast[index]:
+            return self.baseline[index]
+        if self.price_at_q25[index]:
+            return self.raised_baseline[index]
+        if water_level_m < self.lowering_level_limit_m[index]:
+            return self.lowered_baseline[index]
+        if self.price_at_minimum[index]:
+            return self.raised_baseline[index]
+        return self.baseline[index]
+
+    def advance(
+        self,
+        start: int,
+        water_volume_ul: int,
+        water_level_m: float,
+        pump_state: PumpStateRecord,
+        stop: int | None = None,
+    ) -> QuietStretch | None:
+        """The quiet rows from ``start`` on, or None if row ``start`` needs the controller.
+
+        ``water_volume_ul`` and ``water_level_m`` are the state after row
+        ``start - 1`` and ``pump_state`` the decision taken there. The stretch
+        ends before ``stop`` (default: the last row).
+        """
+        stop = len(self.timestamps) if stop is None else stop
+        capacity = pump_state.total_suction_ul_15min
+        if capacity == 0 or pump_state.target_outflow_ul_15min != capacity:
+            return None
+
+        level_from_volume = self.geometry.level_from_volume
+        last_drain = pump_state.last_daily_drain_timestamp
+        pending_drain = pump_state.pending_daily_drain
+        volumes: list[int] = []
+        levels: list[float] = []
+        index = start
+        for index in range(start, stop):
+            if water_level_m <= self.drain_target_level_m or not self.has_price[index]:
+                break
+            pending = pending_drain or (
+                last_drain is None
+                or self.timestamps[index] - last_drain >= self.drain_interval
+            )
+            if pending and self.low_inflow[index]:
+                if self.max_capacity != capacity:
+                    break
+            elif self._target(index, water_level_m, pending) != capacity:
+                break
+
+            volume = water_volume_ul + self.inflows_ul_15min[index] - capacity
+            if volume < MIN_VOLUME_REMAINING_UL or volume > MAX_VOLUME_UL:
+                break
+            level = level_from_volume(volume / VOLUME_UNITS_PER_M3)
+            if level >= MAX_LEVEL_M:
+                break
+
+            volumes.append(volume)
+            levels.append(level)
+            water_volume_ul = volume
+            water_level_m = level
+            pending_drain = pending
+        else:
+            index = stop
+
+        if index == start:
+            return None
+        return QuietStretch(
+            start=start,
+            stop=index,
+            water_volume_ul=volumes,
+            water_level_m=levels,
+            pump_state=PumpStateRecord(
+                pumps=pump_state.pumps,
+                target_outflow_ul_15min=capacity,
+                average_inflow_ul_15min=self.average_inflow_ul_15min[index - 1],
+                last_daily_drain_timestamp=last_drain,
+                pending_daily_drain=pending_drain,
+            ),
+        )
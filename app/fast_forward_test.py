@@ -0,0 +1,81 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas
+import pytest
+
+from app.controller_config import DEFAULT_CONTROLLER_CONFIG
+from app.fast_forward import FastForward
+from app.fixed_point import price_units, volume_units
+from app.geometry import ANALYTIC_GEOMETRY
+from app.instrumentation import Instrumentation
+from app.pump import default_pumps
+from app.pump_curves import DEFAULT_PUMP_CURVES
+from app.simulation import simulate
+from app.testing import storm_dataframe
+
+
+def _dataframe(rows: int = 700) -> pandas.DataFrame:
+    # Dry weather around 1000 m3 per 15 min with two rain bursts.
+    dataframe = storm_dataframe(
+        rows, storm_step=250, storm_m3_15min=3000, storm_width_steps=20
+    )
+    steps = np.arange(rows)
+    dataframe["inflow_to_tunnel_m3_per_15min"] += 2000 * np.exp(
+        -(((steps - 520) / 10) ** 2)
+    )
+    return dataframe
+
+
+class TestFastForward:
+    def test_log_is_identical_to_the_step_by_step_run(self) -> None:
+        dataframe = _dataframe()
+        instrumentation = Instrumentation()
+
+        fast = simulate(
+            dataframe,
+            Decimal(20_000),
+            verbose=False,
+            fast_forward=True,
+            instrumentation=instrumentation,
+        )
+        stepped = simulate(dataframe, Decimal(20_000), verbose=False)
+
+        pandas.testing.assert_frame_equal(
+            fast.to_dataframe(), stepped.to_dataframe(), check_exact=True
+        )
+        counters = instrumentation.report().counters
+        assert counters["fast_forward_rows"] > len(dataframe) // 4
+        assert (
+            counters["fast_forward_rows"]
+            + instrumentation.report().phases["controller"].calls
+            == len(dataframe) - 1
+        )
+
+    def test_other_controllers_are_rejected(self) -> None:
+        with pytest.raises(ValueError):
+            simulate(
+                _dataframe(rows=10),
+                Decimal(20_000),
+                verbose=False,
+                fast_forward=True,
+                pump_curves=DEFAULT_PUMP_CURVES,
+            )
+
+    def test_smoothed_inflow_starts_where_the_controller_starts(self) -> None:
+        dataframe = _dataframe(rows=20)
+        inflows = volume_units(dataframe["inflow_to_tunnel_m3_per_15min"]).tolist()
+
+        fast_forward = FastForward(
+            timestamps=dataframe["timestamp"].tolist(),
+            inflows_ul_15min=inflows,
+            price_milli_cents=price_units(
+                dataframe["electricity_price_eur_cent_per_kwh"]
+            ).tolist(),
+            pump_types=[pump.pump_type for pump in default_pumps()],
+            geometry=ANALYTIC_GEOMETRY,
+            config=DEFAULT_CONTROLLER_CONFIG,
+        )
+
+        # The controller first runs at row 1, without a previous average.
+        assert fast_forward.average_inflow_ul_15min[1] == inflows[1]
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas
+
+from app.fixed_point import (
+    VOLUME_UNITS_PER_M3,
+    price_units,
+    round_half_up_div,
+    round_to_increment,
+    volume_from_units,
+    volume_units,
+)
+from app.price_window import ForwardPriceWindow
+from app.simulation import simulate
+from app.testing import synthetic_dataframe
+
+
+class TestFixedPoint:
+    def test_rounding_matches_decimal_half_up(self) -> None:
+        for numerator in range(-40, 41):
+            for denominator in (1, 2, 3, 5, 8):
+                expected = (Decimal(numerator) / Decimal(denominator)).quantize(
+                    Decimal("1"), rounding=ROUND_HALF_UP
+                )
+                assert round_half_up_div(numerator, denominator) == int(expected)
+
+        increment = 375 * VOLUME_UNITS_PER_M3
+        assert round_to_increment(562_500_000_000, increment) == 2 * increment
+        assert round_to_increment(562_499_999_999, increment) == increment
+
+    def test_units_round_trip(self) -> None:
+        prices = [0.001, 12.345, -3.2, 99.999]
+        assert price_units(prices).tolist() == [1, 12_345, -3_200, 99_999]
+
+        volumes = [0.0, 350.0, 1234.567891, 225_000.0]
+        assert [
+            volume_from_units(units) for units in volume_units(volumes).tolist()
+        ] == (volumes)
+
+    def test_integer_window_stats_are_exact(self) -> None:
+        start = datetime(2024, 11, 15)
+        timestamps = [start + timedelta(minutes=15 * i) for i in range(200)]
+        prices = [round(4 + 3 * np.sin(i / 7), 3) for i in range(200)]
+        decimal_window = ForwardPriceWindow(timestamps=timestamps, prices=prices)
+        integer_window = ForwardPriceWindow(
+            timestamps=timestamps, prices=price_units(prices).tolist()
+        )
+
+        for index in range(len(timestamps) - 1):
+            expected = decimal_window.stats(index)
+            stats = integer_window.integer_stats(index)
+            assert expected is not None and stats is not None
+            assert Decimal(stats.min_price) / 1000 == expected.min_price
+            assert Decimal(stats.q75_price) / 1000 == expected.q75_price
+            assert Decimal(stats.price_sum) / 1000 / stats.count == expected.mean_price
+        assert integer_window.integer_stats(len(timestamps) - 1) is None
+
+    def test_runs_are_bit_identical(self) -> None:
+        dataframe = synthetic_dataframe()
+
+        first = simulate(dataframe, Decimal(20_000), verbose=False).to_dataframe()
+        second = simulate(dataframe, Decimal(20_000), verbose=False).to_dataframe()
+
+        pandas.testing.assert_frame_equal(first, second, check_exact=True)
@@ -0,0 +1,263 @@
+import os
+from typing import Protocol
+
+import numpy as np
+import numpy.typing as npt
+import pandas
+
+from app.ingest import CACHE_DIR_NAME, file_content_hash
+from app import water_level
+from app.water_level import OutOfRangePolicy
+
+
+"""
+Tunnel geometry backends: level <-> volume conversion.
+
+``AnalyticGeometry`` is the piecewise model of ``app.water_level``.
+``TableGeometry`` follows a measured volume-level curve such as the shipped
+``Volume of tunnel vs level Blominmäki.xlsx``. The curve is resampled once onto
+two uniform grids, one over level and one over volume, so a lookup in either
+direction is an index computation plus one linear interpolation, whatever
+the table size. Linear interpolation of the non-decreasing samples keeps the
+interpolant monotone. The compiled grids are cached as ``.npz`` next to the
+table, validated like the ingest cache.
+
+Simulation loops bind ``geometry.level_from_volume`` once before the loop; for
+the analytic geometry that is the ``app.water_level`` function itself.
+"""
+
+DEFAULT_GRID_SIZE = 4096
+
+
+class TunnelGeometry(Protocol):
+    min_volume_m3: float
+    max_volume_m3: float
+
+    def level_from_volume(self, volume: float) -> float: ...
+
+    def volume_from_level(self, level: float) -> float: ...
+
+    def level_from_volume_array(
+        self, volumes: npt.ArrayLike, out_of_range: OutOfRangePolicy = "nan"
+    ) -> np.ndarray: ...
+
+    def volume_from_level_array(
+        self, levels: npt.ArrayLike, out_of_range: OutOfRangePolicy = "nan"
+    ) -> np.ndarray: ...
+
+
+class AnalyticGeometry:
+    min_volume_m3 = water_level.V_MIN
+    max_volume_m3 = water_level.V_MAX
+
+    level_from_volume = staticmethod(water_level.level_from_volume)
+    volume_from_level = staticmethod(water_level.volume_from_level)
+    level_from_volume_array = staticmethod(water_level.level_from_volume_array)
+    volume_from_level_array = staticmethod(water_level.volume_from_level_array)
+
+
+ANALYTIC_GEOMETRY = AnalyticGeometry()
+
+
+class _UniformGrid:
+    """Values of a monotone function sampled on a uniform grid of its argument."""
+
+    def __init__(self, start: float, stop: float, values: np.ndarray) -> None:
+        self.start = start
+        self.stop = stop
+        self.values = values
+        self.scale = (len(values) - 1) / (stop - start)
+        self.last_cell = len(values) - 2
+        # Python floats keep the scalar lookup free of NumPy scalar overhead.
+        self.value_list = values.tolist()
+
+    def at(self, x: float) -> float:
+        position = (x - self.start) * self.scale
+        index = int(position)
+        if index > self.last_cell:
+            index = self.last_cell
+        values = self.value_list
+        low = values[index]
+        return low + (values[index + 1] - low) * (position - index)
+
+    def at_array(self, x: np.ndarray) -> np.ndarray:
+        position = (x - self.start) * self.scale
+        with np.errstate(invalid="ignore"):
+            index = np.clip(position.astype(np.int64), 0, self.last_cell)
+        low = self.values[index]
+        return low + (self.values[index + 1] - low) * (position - index)
+
+
+class TableGeometry:
+    """Monotone level <-> volume interpolant of a measured curve."""
+
+    def __init__(
+        self,
+        levels_m: npt.ArrayLike,
+        volumes_m3: npt.ArrayLike,
+        grid_size: int = DEFAULT_GRID_SIZE,
+    ) -> None:
+        levels = np.asarray(levels_m, dtype=float)
+        volumes = np.asarray(volumes_m3, dtype=float)
+        order = np.argsort(levels, kind="stable")
+        levels, volumes = levels[order], volumes[order]
+        if len(levels) < 2 or np.any(np.diff(levels) <= 0):
+            raise ValueError("Geometry table needs at least two distinct levels")
+        if np.any(np.diff(volumes) < 0):
+            raise ValueError("Geometry table volumes must not decrease with level")
+
+        level_grid = np.linspace(levels[0], levels[-1], grid_size)
+        self._volume_at_level = _UniformGrid(
+            levels[0], levels[-1], np.interp(level_grid, levels, volumes)
+        )
+
+        # The inverse follows the strictly rising part of the curve; a flat
+        # stretch maps to its top level, like water_level.level_from_volume.
+        last_of_flat = np.concatenate((np.diff(volumes) > 0, [True]))
+        inverse_volumes, inverse_levels = volumes[last_of_flat], levels[last_of_flat]
+        volume_grid = np.linspace(volumes[0], volumes[-1], grid_size)
+        self._level_at_volume = _UniformGrid(
+            volumes[0],
+            volumes[-1],
+            np.interp(volume_grid, inverse_volumes, inverse_levels),
+        )
+
+        self.min_level_m = float(levels[0])
+        self.max_level_m = float(levels[-1])
+        self.min_volume_m3 = float(volumes[0])
+        self.max_volume_m3 = float(volumes[-1])
+
+    def level_from_volume(self, volume: float) -> float:
+        if volume < self.min_volume_m3 or volume > self.max_volume_m3:
+            raise ValueError(
+                f"Volume {volume} m³ is outside the table range "
+                f"[{self.min_volume_m3}, {self.max_volume_m3}] m³."
+            )
+        # Inlined _UniformGrid.at: this runs once per simulation step.
+        grid = self._level_at_volume
+        position = (volume - grid.start) * grid.scale
+        index = int(position)
+        if index > grid.last_cell:
+            index = grid.last_cell
+        values = grid.value_list
+        low = values[index]
+        return low + (values[index + 1] - low) * (position - index)
+
+    def volume_from_level(self, level: float) -> float:
+        if level < self.min_level_m:
+            return self.min_volume_m3
+        if level > self.max_level_m:
+            raise ValueError(
+                f"Level {level} m is above the table range ({self.max_level_m} m)."
+            )
+        return self._volume_at_level.at(level)
+
+    def level_from_volume_array(
+        self, volumes: npt.ArrayLike, out_of_range: OutOfRangePolicy = "nan"
+    ) -> np.ndarray:
+        volume = np.asarray(volumes, dtype=float)
+        in_range = (volume >= self.min_volume_m3) & (volume <= self.max_volume_m3)
+        levels = self._level_at_volume.at_array(
+            np.clip(volume, self.min_volume_m3, self.max_volume_m3)
+        )
+        if out_of_range == "nan":
+            return np.where(in_range, levels, np.nan)
+        return np.where(np.isnan(volume), np.nan, levels)
+
+    def volume_from_level_array(
+        self, levels: npt.ArrayLike, out_of_range: OutOfRangePolicy = "nan"
+    ) -> np.ndarray:
+        level = np.asarray(levels, dtype=float)
+        volumes = self._volume_at_level.at_array(
+            np.clip(level, self.min_level_m, self.max_level_m)
+        )
+        if out_of_range == "nan":
+            return np.where(level <= self.max_level_m, volumes, np.nan)
+        return np.where(np.isnan(level), np.nan, volumes)
+
+    def to_npz(self, file_path: str, **metadata: npt.ArrayLike) -> None:
+        # Write to a temporary file first so parallel readers never see half a cache.
+        temporary_path = f"{file_path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            temporary_path,
+            level_range=np.array([self.min_level_m, self.max_level_m]),
+            volume_range=np.array([self.min_volume_m3, self.max_volume_m3]),
+            volume_at_level=self._volume_at_level.values,
+            level_at_volume=self._level_at_volume.values,
+            **metadata,
+        )
+        os.replace(temporary_path, file_path)
+
+    @classmethod
+    def from_npz(cls, file_path: str) -> "TableGeometry":
+        with np.load(file_path, allow_pickle=False) as compiled:
+            geometry = cls.__new__(cls)
+            geometry.min_level_m, geometry.max_level_m = compiled[
+                "level_range"
+            ].tolist()
+            geometry.min_volume_m3, geometry.max_volume_m3 = compiled[
+                "volume_range"
+            ].tolist()
+            geometry._volume_at_level = _UniformGrid(
+                geometry.min_level_m, geometry.max_level_m, compiled["volume_at_level"]
+            )
+            geometry._level_at_volume = _UniformGrid(
+                geometry.min_volume_m3,
+                geometry.max_volume_m3,
+                compiled["level_at_volume"],
+            )
+        return geometry
+
+
+def read_geometry_table(file_path: str) -> tuple[np.ndarray, np.ndarray]:
+    """Level and volume columns (the first two) of an ``.xlsx`` or CSV table."""
+    if file_path.endswith((".xlsx", ".xlsm")):
+        table = pandas.read_excel(file_path, engine="openpyxl")
+    else:
+        table = pandas.read_csv(file_path)
+    table = table.iloc[:, :2].apply(pandas.to_numeric, errors="coerce").dropna()
+    return table.iloc[:, 0].to_numpy(float), table.iloc[:, 1].to_numpy(float)
+
+
+def load_table_geometry(
+    file_path: str, grid_size: int = DEFAULT_GRID_SIZE, use_cache: bool = True
+) -> TableGeometry:
+    """Table geometry of a measured curve, compiled once and cached as ``.npz``."""
+    directory, name = os.path.split(os.path.abspath(file_path))
+    cache_path = os.path.join(
+        directory, CACHE_DIR_NAME, f"{name}.geometry.{grid_size}.npz"
+    )
+    stat = os.stat(file_path)
+
+    content_hash = None
+    if use_cache and os.path.isfile(cache_path):
+        with np.load(cache_path, allow_pickle=False) as cache:
+            cached_hash = str(cache["content_hash"])
+            unchanged = (
+                int(cache["mtime_ns"]) == stat.st_mtime_ns
+                and int(cache["size"]) == stat.st_size
+            )
+        if unchanged:
+            return TableGeometry.from_npz(cache_path)
+        content_hash = file_content_hash(file_path)
+        if content_hash == cached_hash:
+            geometry = TableGeometry.from_npz(cache_path)
+            geometry.to_npz(
+                cache_path,
+                content_hash=np.array(content_hash),
+                mtime_ns=np.array(stat.st_mtime_ns, dtype=np.int64),
+                size=np.array(stat.st_size, dtype=np.int64),
+            )
+            return geometry
+
+    levels, volumes = read_geometry_table(file_path)
+    geometry = TableGeometry(levels, volumes, grid_size=grid_size)
+    if use_cache:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        geometry.to_npz(
+            cache_path,
+            content_hash=np.array(content_hash or file_content_hash(file_path)),
+            mtime_ns=np.array(stat.st_mtime_ns, dtype=np.int64),
+            size=np.array(stat.st_size, dtype=np.int64),
+        )
+    return geometry
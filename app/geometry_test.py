@@ -0,0 +1,96 @@
+import os
+from decimal import Decimal
+
+import numpy as np
+import pandas
+import pytest
+
+from app import geometry
+from app.geometry import ANALYTIC_GEOMETRY, TableGeometry, load_table_geometry
+from app.testing import synthetic_dataframe
+from app.vectorized_simulation import SimulationArrays, check_parity, run_vectorized
+from app.water_level import R4, V_MAX, V_MIN, level_from_volume_array
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _write_table(tmp_path) -> str:
+    levels = np.round(np.arange(0.0, R4 + 0.05, 0.1), 10)
+    path = tmp_path / "geometry.csv"
+    pandas.DataFrame(
+        {
+            "Level L1 m": levels,
+            "Volume V m³": ANALYTIC_GEOMETRY.volume_from_level_array(levels),
+        }
+    ).to_csv(path, index=False)
+    return str(path)
+
+
+class TestTableGeometry:
+    def test_interpolant_follows_the_table_monotonically(self, tmp_path) -> None:
+        table = load_table_geometry(_write_table(tmp_path), use_cache=False)
+        volumes = np.linspace(V_MIN, V_MAX, 50_001)
+
+        levels = table.level_from_volume_array(volumes)
+
+        assert np.all(np.diff(levels) >= 0)
+        # Only the sqrt knee just above V_MIN is far from a 0.1 m table.
+        assert np.abs(levels - level_from_volume_array(volumes)).max() < 0.05
+        assert table.level_from_volume(V_MIN) == pytest.approx(0.4)
+        assert table.volume_from_level(table.level_from_volume(100_000.0)) == (
+            pytest.approx(100_000.0, abs=1.0)
+        )
+        assert [table.level_from_volume(volume) for volume in volumes[:100]] == (
+            levels[:100].tolist()
+        )
+        with pytest.raises(ValueError):
+            table.level_from_volume(V_MAX + 1)
+        assert np.isnan(table.level_from_volume_array([V_MAX + 1]))[0]
+        assert table.level_from_volume_array([V_MAX + 1], out_of_range="clip")[0] == (
+            table.level_from_volume(V_MAX)
+        )
+
+    def test_compiled_table_is_cached(self, tmp_path, monkeypatch) -> None:
+        path = _write_table(tmp_path)
+        compiled = load_table_geometry(path)
+        assert os.listdir(tmp_path / ".ingest_cache")
+
+        def fail(file_path: str) -> None:
+            raise AssertionError("table parsed again")
+
+        monkeypatch.setattr(geometry, "read_geometry_table", fail)
+        cached = load_table_geometry(path)
+        volumes = np.linspace(V_MIN, V_MAX, 1001)
+        assert np.array_equal(
+            cached.level_from_volume_array(volumes),
+            compiled.level_from_volume_array(volumes),
+        )
+
+        with open(path, "a") as file:
+            file.write("14.2,225900\n")
+        with pytest.raises(AssertionError, match="parsed again"):
+            load_table_geometry(path)
+
+    def test_simulators_agree_on_the_table_geometry(self, tmp_path) -> None:
+        table = TableGeometry(*geometry.read_geometry_table(_write_table(tmp_path)))
+        dataframe = synthetic_dataframe()
+
+        result = run_vectorized(
+            SimulationArrays.from_dataframe(dataframe), 20_000.0, geometry=table
+        )
+        report = check_parity(dataframe, Decimal(20_000), result, geometry=table)
+
+        assert report.passed, report
+        assert np.array_equal(
+            result.log.water_level_m,
+            table.level_from_volume_array(result.log.water_volume_m3),
+        )
+
+    def test_reads_the_shipped_workbook(self) -> None:
+        levels, volumes = geometry.read_geometry_table(
+            os.path.join(REPO_ROOT, "Volume of tunnel vs level Blominmäki.xlsx")
+        )
+        table = TableGeometry(levels, volumes)
+
+        assert table.min_volume_m3 == V_MIN
+        assert table.max_volume_m3 == pytest.approx(V_MAX)
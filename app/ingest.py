@@ -0,0 +1,240 @@
+import hashlib
+import io
+import os
+from collections.abc import Sequence
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas
+from pydantic import BaseModel, ConfigDict
+
+
+"""
+Typed loading of the HSY data file and simulation result CSVs.
+
+Only the requested columns are read, all of them as float64 except the
+timestamp, which is parsed with a fixed format instead of ``dayfirst``
+guessing. The parsed columns are kept in an ``.npz`` cache next to the source
+file. A cache entry is reused while the source's mtime and size are unchanged;
+otherwise the content hash decides, so touching a file does not force a
+re-parse but editing it does.
+
+For incremental runs, ``load_simulation_rows_after`` reads only the rows
+after a given time, scanning a time-ordered file backwards from its end.
+"""
+
+TIMESTAMP_COLUMN = "Time stamp"
+HSY_TIMESTAMP_FORMAT = "%d/%m/%Y %H:%M"
+INITIAL_VOLUME_COLUMN = "Water volume in tunnel V (m3)"
+CACHE_DIR_NAME = ".ingest_cache"
+
+# HSY column label -> simulation input name.
+SIMULATION_COLUMNS = {
+    TIMESTAMP_COLUMN: "timestamp",
+    "Electricity price 2: normal (EUR/kWh)": "electricity_price_eur_cent_per_kwh",
+    "Electricity price 1: high (EUR/kWh)": "electricity_price_eur_cent_per_kwh_high",
+    "Inflow to tunnel F1 (m3/15 min)": "inflow_to_tunnel_m3_per_15min",
+}
+
+
+class SimulationInput(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    dataframe: pandas.DataFrame
+    initial_water_volume_m3: Decimal
+    source_hash: str
+
+
+def file_content_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _parse_timestamps(values: pandas.Series) -> pandas.Series:
+    try:
+        return pandas.to_datetime(values, format=HSY_TIMESTAMP_FORMAT)
+    except ValueError:
+        # Result files written by the simulation use ISO timestamps.
+        return pandas.to_datetime(values, format="ISO8601")
+
+
+def read_csv_typed(
+    file_path: str, columns: Sequence[str] | None = None
+) -> pandas.DataFrame:
+    """Parse the CSV without any cache: float64 columns, parsed timestamps."""
+    header = pandas.read_csv(file_path, nrows=0).columns
+    return _read_selected(file_path, file_path, header, columns)
+
+
+def _read_selected(
+    file_path: str,
+    source: str | io.BytesIO,
+    header: Sequence[str],
+    columns: Sequence[str] | None,
+) -> pandas.DataFrame:
+    selected = list(header) if columns is None else list(columns)
+    missing = [column for column in selected if column not in header]
+    if missing:
+        raise ValueError(f"{file_path} has no columns {missing}")
+
+    dataframe = pandas.read_csv(
+        source,
+        usecols=selected,
+        dtype={column: np.float64 for column in selected if column != TIMESTAMP_COLUMN},
+    )[selected]
+    if TIMESTAMP_COLUMN in dataframe:
+        dataframe[TIMESTAMP_COLUMN] = _parse_timestamps(dataframe[TIMESTAMP_COLUMN])
+    return dataframe
+
+
+def read_csv_rows_after(
+    file_path: str,
+    after: datetime,
+    columns: Sequence[str] | None = None,
+    block_size: int = 1 << 16,
+) -> pandas.DataFrame:
+    """The rows of a CSV ordered by time stamp that are later than ``after``.
+
+    The file is read backwards in blocks until a row at or before ``after``
+    turns up, so the cost follows the number of new rows, not the file size.
+    """
+    with open(file_path, "rb") as file:
+        header_line = file.readline()
+        header = pandas.read_csv(io.BytesIO(header_line), nrows=0).columns
+        timestamp_index = list(header).index(TIMESTAMP_COLUMN)
+        data_start = file.tell()
+        start = file.seek(0, os.SEEK_END)
+        tail = b""
+        while start > data_start:
+            block_start = max(data_start, start - block_size)
+            file.seek(block_start)
+            tail = file.read(start - block_start) + tail
+            start = block_start
+            # The first line of the tail is cut off unless it starts the data.
+            lines = tail.split(b"\n")[0 if start == data_start else 1 :]
+            first_line = next((line for line in lines if line.strip()), None)
+            if first_line is None:
+                continue
+            first_timestamp = _parse_timestamps(
+                pandas.Series([first_line.decode().split(",")[timestamp_index]])
+            ).iloc[0]
+            if first_timestamp <= after:
+                break
+    if start > data_start:
+        tail = tail[tail.index(b"\n") + 1 :]
+
+    dataframe = _read_selected(
+        file_path, io.BytesIO(header_line + tail), header, columns
+    )
+    return dataframe[dataframe[TIMESTAMP_COLUMN] > after].reset_index(drop=True)
+
+
+def _cache_path(file_path: str, columns: Sequence[str] | None) -> str:
+    directory, name = os.path.split(os.path.abspath(file_path))
+    column_key = hashlib.sha256(repr(columns).encode()).hexdigest()[:12]
+    return os.path.join(directory, CACHE_DIR_NAME, f"{name}.{column_key}.npz")
+
+
+def _read_cache(
+    cache_path: str, stat: os.stat_result, file_path: str
+) -> tuple[pandas.DataFrame, str] | None:
+    if not os.path.isfile(cache_path):
+        return None
+    with np.load(cache_path, allow_pickle=False) as cache:
+        content_hash = str(cache["content_hash"])
+        unchanged = (
+            int(cache["mtime_ns"]) == stat.st_mtime_ns
+            and int(cache["size"]) == stat.st_size
+        )
+        if not unchanged and content_hash != file_content_hash(file_path):
+            return None
+        names = [str(name) for name in cache["columns"]]
+        dataframe = pandas.DataFrame(
+            {name: cache[f"column_{index}"] for index, name in enumerate(names)}
+        )
+    if TIMESTAMP_COLUMN in dataframe:
+        dataframe[TIMESTAMP_COLUMN] = pandas.to_datetime(
+            dataframe[TIMESTAMP_COLUMN].to_numpy(dtype=np.int64)
+        )
+    if not unchanged:
+        _write_cache(cache_path, dataframe, stat, content_hash)
+    return dataframe, content_hash
+
+
+def _write_cache(
+    cache_path: str,
+    dataframe: pandas.DataFrame,
+    stat: os.stat_result,
+    content_hash: str,
+) -> None:
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    arrays = {
+        f"column_{index}": (
+            dataframe[name].to_numpy(dtype="datetime64[ns]").view(np.int64)
+            if name == TIMESTAMP_COLUMN
+            else dataframe[name].to_numpy(dtype=np.float64)
+        )
+        for index, name in enumerate(dataframe.columns)
+    }
+    # Write to a temporary file first so parallel readers never see half a cache.
+    temporary_path = f"{cache_path}.{os.getpid()}.tmp.npz"
+    np.savez(
+        temporary_path,
+        columns=np.array(list(dataframe.columns), dtype=str),
+        content_hash=np.array(content_hash),
+        mtime_ns=np.array(stat.st_mtime_ns, dtype=np.int64),
+        size=np.array(stat.st_size, dtype=np.int64),
+        **arrays,
+    )
+    os.replace(temporary_path, cache_path)
+
+
+def load_csv(
+    file_path: str, columns: Sequence[str] | None = None, use_cache: bool = True
+) -> pandas.DataFrame:
+    """Typed columns of a CSV, from the binary cache when the source is unchanged."""
+    return _load_csv_with_hash(file_path, columns, use_cache)[0]
+
+
+def _load_csv_with_hash(
+    file_path: str, columns: Sequence[str] | None, use_cache: bool
+) -> tuple[pandas.DataFrame, str]:
+    stat = os.stat(file_path)
+    cache_path = _cache_path(file_path, columns)
+    if use_cache:
+        cached = _read_cache(cache_path, stat, file_path)
+        if cached is not None:
+            return cached
+
+    dataframe = read_csv_typed(file_path, columns)
+    content_hash = file_content_hash(file_path)
+    if use_cache:
+        _write_cache(cache_path, dataframe, stat, content_hash)
+    return dataframe, content_hash
+
+
+def load_simulation_input(file_path: str, use_cache: bool = True) -> SimulationInput:
+    """Simulation input columns and the initial tunnel volume of an HSY data file."""
+    dataframe, content_hash = _load_csv_with_hash(
+        file_path, [*SIMULATION_COLUMNS, INITIAL_VOLUME_COLUMN], use_cache
+    )
+    return SimulationInput(
+        dataframe=dataframe[list(SIMULATION_COLUMNS)].rename(
+            columns=SIMULATION_COLUMNS
+        ),
+        initial_water_volume_m3=Decimal(
+            float(dataframe[INITIAL_VOLUME_COLUMN].iloc[0])
+        ),
+        source_hash=content_hash,
+    )
+
+
+def load_simulation_rows_after(file_path: str, after: datetime) -> pandas.DataFrame:
+    """Simulation input columns of the rows of an HSY data file later than ``after``."""
+    return read_csv_rows_after(file_path, after, list(SIMULATION_COLUMNS)).rename(
+        columns=SIMULATION_COLUMNS
+    )
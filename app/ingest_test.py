@@ -0,0 +1,100 @@
+import os
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+import pandas
+
+from app.ingest import (
+    CACHE_DIR_NAME,
+    load_csv,
+    load_simulation_input,
+    load_simulation_rows_after,
+    read_csv_typed,
+)
+
+_CSV = """Time stamp,Water level in tunnel L1 (m),Water volume in tunnel V (m3),Inflow to tunnel F1 (m3/15 min),Electricity price 1: high (EUR/kWh),Electricity price 2: normal (EUR/kWh)
+15/11/2024 00:00,2.37,10064.9892578125,1454.5,3.383,0.291
+15/11/2024 00:15,2.40,10391.08,1454.5,3.383,0.291
+01/12/2024 13:45,2.41,10400,0,4,1
+"""
+
+
+def _write(path: Path, text: str = _CSV) -> str:
+    path.write_text(text)
+    return str(path)
+
+
+class TestIngest:
+    def test_fixed_format_timestamps_and_float_columns(self, tmp_path: Path) -> None:
+        dataframe = read_csv_typed(_write(tmp_path / "data.csv"))
+
+        assert dataframe["Time stamp"].tolist() == [
+            pandas.Timestamp("2024-11-15 00:00"),
+            pandas.Timestamp("2024-11-15 00:15"),
+            pandas.Timestamp("2024-12-01 13:45"),
+        ]
+        assert all(
+            dataframe[column].dtype == np.float64
+            for column in dataframe.columns
+            if column != "Time stamp"
+        )
+
+    def test_simulation_input_round_trips_through_the_cache(
+        self, tmp_path: Path
+    ) -> None:
+        file_path = _write(tmp_path / "data.csv")
+
+        parsed = load_simulation_input(file_path)
+        cached = load_simulation_input(file_path)
+
+        assert os.listdir(tmp_path / CACHE_DIR_NAME)
+        assert cached.initial_water_volume_m3 == Decimal(10064.9892578125)
+        assert list(cached.dataframe.columns) == [
+            "timestamp",
+            "electricity_price_eur_cent_per_kwh",
+            "electricity_price_eur_cent_per_kwh_high",
+            "inflow_to_tunnel_m3_per_15min",
+        ]
+        pandas.testing.assert_frame_equal(parsed.dataframe, cached.dataframe)
+        assert cached.source_hash == parsed.source_hash
+
+    def test_edited_source_invalidates_the_cache(self, tmp_path: Path) -> None:
+        file_path = _write(tmp_path / "data.csv")
+        columns = ["Time stamp", "Inflow to tunnel F1 (m3/15 min)"]
+        load_csv(file_path, columns)
+
+        _write(tmp_path / "data.csv", _CSV.replace("1454.5", "1000.0"))
+        stat = os.stat(file_path)
+        os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        reloaded = load_csv(file_path, columns)
+        assert reloaded["Inflow to tunnel F1 (m3/15 min)"].tolist() == [
+            1000.0,
+            1000.0,
+            0.0,
+        ]
+
+    def test_touched_source_keeps_using_the_cache(self, tmp_path: Path) -> None:
+        file_path = _write(tmp_path / "data.csv")
+        first = load_csv(file_path)
+
+        stat = os.stat(file_path)
+        os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        pandas.testing.assert_frame_equal(load_csv(file_path), first)
+
+    def test_rows_after_a_time_are_read_from_the_end(self, tmp_path: Path) -> None:
+        file_path = _write(tmp_path / "data.csv")
+
+        rows = load_simulation_rows_after(file_path, datetime(2024, 11, 15, 0, 0))
+
+        assert rows["timestamp"].tolist() == [
+            pandas.Timestamp("2024-11-15 00:15"),
+            pandas.Timestamp("2024-12-01 13:45"),
+        ]
+        assert rows["inflow_to_tunnel_m3_per_15min"].tolist() == [1454.5, 0.0]
+        assert load_simulation_rows_after(
+            file_path, datetime(2024, 12, 1, 13, 45)
+        ).empty
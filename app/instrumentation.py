@@ -0,0 +1,107 @@
+import cProfile
+import io
+import pstats
+import time
+
+from pydantic import BaseModel
+
+
+"""
+Opt-in timers and counters for a simulation run.
+
+The loop calls ``lap(phase)`` after each phase; the time since the previous
+lap is charged to that phase, so one clock read per phase covers it. Loops
+only touch an ``Instrumentation`` behind an ``is not None`` check, so a run
+without one pays nothing beyond that check.
+
+With ``profile=True`` a ``cProfile.Profile`` runs between ``start`` and
+``stop`` and the report carries its top functions. A sampling profiler such
+as py-spy can be attached to the process from outside instead.
+"""
+
+
+class PhaseTiming(BaseModel):
+    calls: int
+    total_s: float
+    mean_us: float
+    share: float
+
+
+class InstrumentationReport(BaseModel):
+    wall_s: float
+    phases: dict[str, PhaseTiming]
+    counters: dict[str, int]
+    profile: str | None = None
+
+    def format(self) -> str:
+        lines = [f"Run took {self.wall_s:.3f} s"]
+        for name, phase in sorted(
+            self.phases.items(), key=lambda item: -item[1].total_s
+        ):
+            lines.append(
+                f"  {name:<16} {phase.total_s:>9.4f} s {phase.share:>6.1%} "
+                f"{phase.calls:>8} calls {phase.mean_us:>9.1f} us/call"
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"  {name:<16} {value:>9}")
+        if self.profile is not None:
+            lines.append(self.profile)
+        return "\n".join(lines)
+
+
+class Instrumentation:
+    def __init__(self, profile: bool = False, profile_top: int = 25) -> None:
+        self.phase_ns: dict[str, int] = {}
+        self.phase_calls: dict[str, int] = {}
+        self.counters: dict[str, int] = {}
+        self.profile_top = profile_top
+        self._profiler = cProfile.Profile() if profile else None
+        self._started_ns: int | None = None
+        self._stopped_ns: int | None = None
+        self._last_ns = 0
+
+    def start(self) -> None:
+        self._started_ns = self._last_ns = time.perf_counter_ns()
+        if self._profiler is not None:
+            self._profiler.enable()
+
+    def stop(self) -> None:
+        if self._profiler is not None:
+            self._profiler.disable()
+        self._stopped_ns = time.perf_counter_ns()
+
+    def lap(self, phase: str) -> None:
+        now = time.perf_counter_ns()
+        self.phase_ns[phase] = self.phase_ns.get(phase, 0) + now - self._last_ns
+        self.phase_calls[phase] = self.phase_calls.get(phase, 0) + 1
+        self._last_ns = now
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def report(self) -> InstrumentationReport:
+        started = self._started_ns or 0
+        stopped = self._stopped_ns or time.perf_counter_ns()
+        wall_s = (stopped - started) / 1e9 if self._started_ns is not None else 0.0
+
+        profile = None
+        if self._profiler is not None:
+            stream = io.StringIO()
+            stats = pstats.Stats(self._profiler, stream=stream)
+            stats.sort_stats("cumulative").print_stats(self.profile_top)
+            profile = stream.getvalue()
+
+        return InstrumentationReport(
+            wall_s=wall_s,
+            phases={
+                name: PhaseTiming(
+                    calls=self.phase_calls[name],
+                    total_s=total_ns / 1e9,
+                    mean_us=total_ns / self.phase_calls[name] / 1000,
+                    share=total_ns / 1e9 / wall_s if wall_s else 0.0,
+                )
+                for name, total_ns in self.phase_ns.items()
+            },
+            counters=dict(self.counters),
+            profile=profile,
+        )
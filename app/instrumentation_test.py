@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+import pandas
+
+from app.instrumentation import Instrumentation
+from app.pump import Pump, PumpState, PumpStateRecord, PumpType
+from app.pump_masks import mask_table_for
+from app.pump_selection import MASK_TABLE_MAX_PUMPS
+from app.simulation import simulate
+from app.testing import synthetic_dataframe
+
+
+class TestInstrumentation:
+    def test_report_covers_every_phase_without_changing_the_run(self) -> None:
+        dataframe = synthetic_dataframe()
+        instrumentation = Instrumentation(profile=True, profile_top=5)
+
+        log = simulate(
+            dataframe, Decimal(20_000), verbose=False, instrumentation=instrumentation
+        )
+        report = instrumentation.report()
+
+        pandas.testing.assert_frame_equal(
+            log.to_dataframe(),
+            simulate(dataframe, Decimal(20_000), verbose=False).to_dataframe(),
+        )
+        steps = len(dataframe) - 1
+        for phase in ("run_step", "log", "price_window", "controller"):
+            assert report.phases[phase].calls == steps
+        assert "print" not in report.phases
+        assert sum(phase.total_s for phase in report.phases.values()) <= report.wall_s
+
+        masks = log.activation_masks
+        toggles = sum(bin(int(a) ^ int(b)).count("1") for a, b in zip(masks, masks[1:]))
+        # The decision of the last step is never applied to a logged row.
+        assert report.counters["pump_toggles"] >= toggles
+        assert report.counters["masks_evaluated"] >= steps
+        assert report.profile is not None
+        assert "change_pump_state_constant_flow" in report.profile
+
+    def test_large_fleets_skip_the_mask_counter(self) -> None:
+        pumps = [
+            Pump(id=str(index), pump_type=PumpType.LARGE, current_run_time_start=None)
+            for index in range(MASK_TABLE_MAX_PUMPS + 4)
+        ]
+        instrumentation = Instrumentation()
+        mask_table_for.cache_clear()
+
+        simulate(
+            synthetic_dataframe(50),
+            Decimal(20_000),
+            verbose=False,
+            initial_pump_state=PumpStateRecord.from_model(PumpState(pumps=pumps)),
+            instrumentation=instrumentation,
+        )
+
+        report = instrumentation.report()
+        assert "masks_evaluated" not in report.counters
+        assert report.counters["pump_toggles"] > 0
+        assert mask_table_for.cache_info().currsize == 0
@@ -0,0 +1,59 @@
+import numpy as np
+from pydantic import BaseModel
+
+from app.simulation_log import SimulationLog
+
+
+TIME_STEP_HOURS = 0.25
+SHORT_RUN_THRESHOLD_HOURS = 2.0
+
+
+class RunKpis(BaseModel):
+    steps: int
+    breached_safe_level: bool
+    energy_kwh: float
+    cost_normal_eur: float
+    cost_high_eur: float
+    max_level_m: float
+    pump_starts: int
+    short_run_count: int
+
+
+def _run_lengths(is_running: np.ndarray) -> np.ndarray:
+    """Lengths in steps of the contiguous on-periods of one pump."""
+    padded = np.concatenate(([False], is_running, [False])).astype(np.int8)
+    edges = np.diff(padded)
+    return np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+
+def kpis_from_log(log: SimulationLog, breached_safe_level: bool = False) -> RunKpis:
+    """Energy, cost and pump wear figures of a run, as in ``validate_run``.
+
+    Prices are in EUR cent/kWh despite the column labels, and an on-period
+    counts as short below two hours, including one still open at the end.
+    """
+    energy_kwh = np.zeros(len(log))
+    pump_starts = 0
+    short_run_count = 0
+    for pump_id in log.pump_ids:
+        energy_kwh += log.pump_power_kw(pump_id) * TIME_STEP_HOURS
+        run_lengths = _run_lengths(log.pump_is_active(pump_id))
+        pump_starts += len(run_lengths)
+        short_run_count += int(
+            np.count_nonzero(run_lengths * TIME_STEP_HOURS < SHORT_RUN_THRESHOLD_HOURS)
+        )
+
+    return RunKpis(
+        steps=len(log),
+        breached_safe_level=breached_safe_level,
+        energy_kwh=float(energy_kwh.sum()),
+        cost_normal_eur=float(
+            (energy_kwh * log.electricity_price_eur_cent_per_kwh).sum() / 100.0
+        ),
+        cost_high_eur=float(
+            (energy_kwh * log.electricity_price_eur_cent_per_kwh_high).sum() / 100.0
+        ),
+        max_level_m=float(log.water_level_m.max()) if len(log) else 0.0,
+        pump_starts=pump_starts,
+        short_run_count=short_run_count,
+    )
@@ -0,0 +1,34 @@
+import pytest
+
+import validate_run
+from app.kpi import kpis_from_log
+from app.testing import synthetic_arrays
+from app.vectorized_simulation import run_vectorized
+
+
+class TestKpis:
+    def test_matches_validate_run_metrics(self) -> None:
+        arrays = synthetic_arrays(
+            400,
+            inflow_m3_15min=1200,
+            inflow_swing_m3_15min=2000,
+            inflow_period_steps=25,
+        )
+        log = run_vectorized(arrays=arrays, initial_water_volume_m3=10_000.0).log
+
+        kpis = kpis_from_log(log)
+        dataframe = log.to_dataframe()
+        _, energy_kwh, cost_high, cost_normal = (
+            validate_run._compute_energy_cost_components(dataframe)
+        )
+        short_runs = sum(
+            validate_run.count_short_runtime_events(dataframe, column, 0.25)
+            for column in validate_run.get_pump_power_columns(dataframe)
+        )
+
+        assert kpis.energy_kwh == pytest.approx(energy_kwh.sum())
+        assert kpis.cost_high_eur == pytest.approx(cost_high.sum())
+        assert kpis.cost_normal_eur == pytest.approx(cost_normal.sum())
+        assert kpis.short_run_count == short_runs
+        assert kpis.max_level_m == dataframe["Water level in tunnel L1 (m)"].max()
+        assert kpis.pump_starts > 0
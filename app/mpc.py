@@ -0,0 +1,258 @@
+import time
+from collections.abc import Sequence
+from datetime import datetime
+
+import numpy as np
+import pandas
+
+from app.controller_config import DEFAULT_CONTROLLER_CONFIG, ControllerConfig
+from app.fixed_point import volume_from_units
+from app.optimal_schedule import MAX_SAFE_LEVEL_M, capacity_levels
+from app.pump import Pump, PumpRecord, PumpStateRecord, default_pumps, toggle_pump
+from app.pump_selection import select_activation
+from app.water_level import V_MIN, volume_from_level
+
+
+"""
+Receding-horizon (MPC) pump controller.
+
+At every step a plan of one capacity level per hour block is optimised over
+the next ``horizon_hours`` of inflow and prices, the first block is applied
+through the usual min-runtime aware pump selection, and the plan is kept as
+the warm start of the next step (unless ``warm_start`` is off, in which case
+every step searches from the current level).
+
+A plan is scored as energy cost over the horizon plus the value of the water
+left at its end (the cost of pumping it later with a large pump at the mean
+horizon price), with penalties for rising above the safety level, for missing
+the drain deadline and a small one per level change. The score of many
+candidate plans is evaluated at once: the clamped mass balance
+``v' = max(v + inflow - capacity, V_MIN)`` is a Lindley recursion with a
+closed form over cumulative sums, and the step costs of every capacity level
+are tabulated for the whole series up front.
+"""
+
+BLOCK_STEPS = 4
+SAFETY_LEVEL_M = MAX_SAFE_LEVEL_M - 0.5
+LEVEL_PENALTY_EUR_PER_M3 = 10.0
+DRAIN_PENALTY_EUR_PER_M3 = 1.0
+SWITCH_PENALTY_EUR = 0.5
+
+
+class MpcController:
+    def __init__(
+        self,
+        timestamps: Sequence[datetime],
+        inflow_m3_15min: np.ndarray,
+        price_eur_cent_per_kwh: np.ndarray,
+        pumps: list[Pump] | None = None,
+        config: ControllerConfig = DEFAULT_CONTROLLER_CONFIG,
+        horizon_hours: int = 12,
+        max_iterations: int = 20,
+        warm_start: bool = True,
+    ) -> None:
+        pumps = default_pumps() if pumps is None else pumps
+        self.config = config
+        self.horizon_blocks = horizon_hours
+        self.max_iterations = max_iterations
+        self.warm_start = warm_start
+        self.inflow = np.asarray(inflow_m3_15min, dtype=float)
+        self.prices = np.asarray(price_eur_cent_per_kwh, dtype=float)
+        self.timestamps = list(timestamps)
+
+        levels = capacity_levels(pumps)
+        self.capacities = np.array(
+            [level.capacity_m3_15min for level in levels], dtype=float
+        )
+        power_kw = np.array([level.power_kw for level in levels], dtype=float)
+        # Transition tables for the whole series: EUR per step for every level.
+        self.step_cost = self.prices[:, None] * power_kw[None, :] * 0.25 / 100.0
+        large_kwh_per_m3 = max(
+            level.power_kw * 0.25 / level.capacity_m3_15min
+            for level in levels
+            if level.capacity_m3_15min > 0 and level.small_on == 0
+        )
+        self.water_value_per_price = large_kwh_per_m3 / 100.0
+
+        self.safety_volume = volume_from_level(SAFETY_LEVEL_M)
+        self.drain_volume = volume_from_level(float(config.drain_target_level_m))
+        self.plan: np.ndarray | None = None
+        self.last_drain_time: datetime | None = None
+        self.latencies_s: list[float] = []
+        self.iterations: list[int] = []
+
+    @classmethod
+    def from_dataframe(
+        cls, dataframe: pandas.DataFrame, **kwargs: object
+    ) -> "MpcController":
+        return cls(
+            timestamps=[
+                timestamp.to_pydatetime()
+                for timestamp in pandas.to_datetime(dataframe["timestamp"])
+            ],
+            inflow_m3_15min=dataframe["inflow_to_tunnel_m3_per_15min"].to_numpy(float),
+            price_eur_cent_per_kwh=dataframe[
+                "electricity_price_eur_cent_per_kwh"
+            ].to_numpy(float),
+            **kwargs,  # pyright: ignore
+        )
+
+    def _scores(
+        self, plans: np.ndarray, start: int, volume: float, drain_deadline: int | None
+    ) -> np.ndarray:
+        """Score of every plan (rows of block levels) for steps ``start:``."""
+        steps = min(plans.shape[1] * BLOCK_STEPS, len(self.inflow) - start)
+        levels = np.repeat(plans, BLOCK_STEPS, axis=1)[:, :steps]
+        inflow = self.inflow[start : start + steps]
+
+        # Volume above V_MIN after every step, Lindley recursion in closed form.
+        running = (volume - V_MIN) + np.cumsum(
+            inflow[None, :] - self.capacities[levels], axis=1
+        )
+        above_min = running - np.minimum(np.minimum.accumulate(running, axis=1), 0.0)
+        volumes = above_min + V_MIN
+
+        rows = np.arange(steps)[None, :] + start
+        energy = self.step_cost[rows, levels].sum(axis=1)
+        water_value = (
+            volumes[:, -1]
+            * self.prices[start : start + steps].mean()
+            * self.water_value_per_price
+        )
+        overflow = np.maximum(volumes - self.safety_volume, 0.0).max(axis=1)
+        switches = np.count_nonzero(np.diff(plans, axis=1), axis=1)
+
+        scores = (
+            energy
+            + water_value
+            + LEVEL_PENALTY_EUR_PER_M3 * overflow
+            + SWITCH_PENALTY_EUR * switches
+        )
+        if drain_deadline is not None:
+            until = min(max(drain_deadline - start, 1), steps)
+            lowest = volumes[:, :until].min(axis=1)
+            scores += DRAIN_PENALTY_EUR_PER_M3 * np.maximum(
+                lowest - self.drain_volume, 0.0
+            )
+        return scores
+
+    def _optimise(
+        self, start: int, volume: float, current_level: int, drain_deadline: int | None
+    ) -> np.ndarray:
+        blocks = self.horizon_blocks
+        if self.plan is None:
+            plan = np.full(blocks, current_level, dtype=np.int64)
+        else:
+            # Warm start: blocks are anchored at the current step, so the
+            # previous plan read from here on is its solution shifted one step.
+            plan = self.plan.copy()
+        best = float(self._scores(plan[None, :], start, volume, drain_deadline)[0])
+
+        level_count = len(self.capacities)
+        iterations = 0
+        while iterations < self.max_iterations:
+            iterations += 1
+            candidates = []
+            for block in range(blocks):
+                for change in (-2, -1, 1, 2):
+                    level = plan[block] + change
+                    if 0 <= level < level_count:
+                        candidate = plan.copy()
+                        candidate[block] = level
+                        candidates.append(candidate)
+                # Also move a whole tail of the plan, so the search can shift
+                # pumping between hours without passing through worse plans.
+                for change in (-1, 1):
+                    candidate = plan.copy()
+                    candidate[block:] = np.clip(
+                        plan[block:] + change, 0, level_count - 1
+                    )
+                    candidates.append(candidate)
+            stacked = np.array(candidates)
+            scores = self._scores(stacked, start, volume, drain_deadline)
+            index = int(np.argmin(scores))
+            if scores[index] >= best - 1e-9:
+                break
+            best = float(scores[index])
+            plan = stacked[index]
+
+        self.iterations.append(iterations)
+        return plan
+
+    def decide(
+        self,
+        step_index: int,
+        water_volume_m3: float,
+        pump_state: PumpStateRecord,
+        timestamp: datetime,
+    ) -> PumpStateRecord:
+        """Pump state for the steps after ``step_index``, given the volume after it."""
+        if step_index + 1 >= len(self.inflow):
+            return pump_state
+        started = time.perf_counter()
+        config = self.config
+
+        if water_volume_m3 <= self.drain_volume or self.last_drain_time is None:
+            self.last_drain_time = timestamp
+        deadline_steps = int(
+            (self.last_drain_time + config.drain_interval - timestamp).total_seconds()
+            // 900
+        )
+        drain_deadline = step_index + 1 + max(deadline_steps, 0)
+        if drain_deadline > step_index + self.horizon_blocks * BLOCK_STEPS:
+            drain_deadline = None
+
+        current_capacity = volume_from_units(pump_state.total_suction_ul_15min)
+        current_level = int(
+            np.argmin(np.abs(self.capacities - float(current_capacity)))
+        )
+        plan = self._optimise(
+            step_index + 1, water_volume_m3, current_level, drain_deadline
+        )
+        if self.warm_start:
+            self.plan = plan
+
+        def changeable(pump: PumpRecord) -> bool:
+            since = (
+                pump.current_run_time_start if pump.is_active else pump.last_stop_time
+            )
+            return since is None or timestamp - since >= config.min_runtime
+
+        desired = select_activation(
+            pumps=pump_state.pumps,
+            changeable=[changeable(pump) for pump in pump_state.pumps],
+            desired_capacity=float(self.capacities[plan[0]]),
+            current_capacity=float(current_capacity),
+            allow_all_off=True,
+        )
+        pumps = pump_state.pumps
+        if desired is not None:
+            pumps = [
+                pump
+                if pump.is_active == on
+                else toggle_pump(pump=pump, timestamp=timestamp)
+                for pump, on in zip(pumps, desired)
+            ]
+
+        self.latencies_s.append(time.perf_counter() - started)
+        return PumpStateRecord(
+            pumps=pumps,
+            target_outflow_ul_15min=pump_state.target_outflow_ul_15min,
+            average_inflow_ul_15min=pump_state.average_inflow_ul_15min,
+            last_daily_drain_timestamp=self.last_drain_time,
+            pending_daily_drain=drain_deadline is not None,
+        )
+
+    def latency_summary(self) -> dict[str, float]:
+        """Per-step decision latency percentiles in milliseconds."""
+        if not self.latencies_s:
+            return {}
+        latencies_ms = np.array(self.latencies_s) * 1000.0
+        return {
+            "steps": float(len(latencies_ms)),
+            "p50_ms": float(np.percentile(latencies_ms, 50)),
+            "p95_ms": float(np.percentile(latencies_ms, 95)),
+            "p99_ms": float(np.percentile(latencies_ms, 99)),
+            "max_ms": float(latencies_ms.max()),
+            "mean_iterations": float(np.mean(self.iterations)),
+        }
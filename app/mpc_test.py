@@ -0,0 +1,50 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas
+
+from app.kpi import kpis_from_log
+from app.mpc import MpcController
+from app.simulation import simulate
+from app.testing import synthetic_dataframe
+
+
+def _dataframe(rows: int) -> pandas.DataFrame:
+    # Prices on a daily cycle, so every horizon sees cheap and expensive hours.
+    return synthetic_dataframe(
+        rows,
+        inflow_m3_15min=1400,
+        inflow_period_steps=30,
+        price_period_steps=96 / (2 * np.pi),
+    )
+
+
+class TestMpcController:
+    def test_stays_below_the_limit_and_beats_the_constant_flow_controller(self) -> None:
+        dataframe = _dataframe(24 * 4 * 2)
+        mpc = MpcController.from_dataframe(dataframe, horizon_hours=8)
+
+        log = simulate(dataframe, Decimal(20_000), verbose=False, mpc=mpc)
+        baseline = simulate(dataframe, Decimal(20_000), verbose=False)
+
+        assert log.water_level_m.max() < 8.0
+        assert (
+            kpis_from_log(log).cost_normal_eur < kpis_from_log(baseline).cost_normal_eur
+        )
+
+        summary = mpc.latency_summary()
+        assert summary["steps"] == len(dataframe) - 2
+        assert 0 < summary["p50_ms"] <= summary["p95_ms"] <= summary["max_ms"]
+
+    def test_warm_start_needs_fewer_iterations(self) -> None:
+        dataframe = _dataframe(24 * 4)
+        warm = MpcController.from_dataframe(dataframe, horizon_hours=8)
+        simulate(dataframe, Decimal(20_000), verbose=False, mpc=warm)
+
+        cold = MpcController.from_dataframe(
+            dataframe, horizon_hours=8, warm_start=False
+        )
+        simulate(dataframe, Decimal(20_000), verbose=False, mpc=cold)
+
+        assert len(warm.iterations) == len(cold.iterations) == len(dataframe) - 2
+        assert np.mean(warm.iterations) < np.mean(cold.iterations)
@@ -0,0 +1,387 @@
+import argparse
+import math
+import time
+from collections.abc import Sequence
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+
+from app.controller_config import DEFAULT_CONTROLLER_CONFIG, ControllerConfig
+from app.kpi import RunKpis, kpis_from_log
+from app.pump import (
+    PUMP_CAPACITY_M3_15MIN,
+    PUMP_POWER_KW,
+    Pump,
+    PumpType,
+    default_pumps,
+)
+from app.simulation_log import SimulationLog
+from app.water_level import V_MIN, level_from_volume_array, volume_from_level
+
+
+"""
+Minimum-cost pump schedule over a whole inflow and price series.
+
+Backward dynamic programming over the state
+
+    (tunnel volume bin, aggregate pump configuration, hold counter, drain counter)
+
+with one vectorized NumPy transition per 15-minute step. Modelling choices:
+
+- Pumps of one type are interchangeable, so a configuration is a count of
+  running large and small pumps. Configurations with the same capacity but
+  more power are dominated and dropped, which leaves one per capacity level.
+- The 2 h minimum runtime applies to the aggregate configuration: after a
+  change it is held for ``min_runtime`` before the next change. Individual
+  pumps are assigned afterwards, starting the longest idle and stopping the
+  longest running ones.
+- The tunnel must reach the drain target level within ``drain_interval`` of
+  dry weather; the counter advances by one hour on every fourth step whose
+  inflow is at or below the rain threshold.
+- Volume is binned in ``volume_step_m3`` steps; the schedule found on the
+  bins is then simulated with the exact mass balance.
+
+With ``min_runtime`` set to zero the optimum is a lower bound (up to the
+volume binning) on the cost of any controller that keeps the level below
+8 m, drains on schedule and ends no fuller than the terminal volume. With the
+aggregate hold it is the cost of a realistic best schedule instead.
+"""
+
+MAX_SAFE_LEVEL_M = 8.0
+STEP_SECONDS = 15 * 60
+STEPS_PER_HOUR = 4
+
+
+class CapacityLevel(BaseModel):
+    capacity_m3_15min: int
+    power_kw: int
+    large_on: int
+    small_on: int
+
+
+class OptimalSchedule(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    # Capacity level index per step; step 0 is the initial state and has no pumping.
+    level_indices: np.ndarray
+    capacity_levels: list[CapacityLevel]
+    expected_cost_eur: float
+    log: SimulationLog
+    kpis: RunKpis
+    solve_seconds: float
+
+
+def capacity_levels(pumps: Sequence[Pump]) -> list[CapacityLevel]:
+    """Cheapest configuration for every reachable total capacity, ascending."""
+    large_count = sum(pump.pump_type == PumpType.LARGE for pump in pumps)
+    small_count = len(pumps) - large_count
+    cheapest: dict[int, CapacityLevel] = {}
+    for large_on in range(large_count + 1):
+        for small_on in range(small_count + 1):
+            level = CapacityLevel(
+                capacity_m3_15min=large_on * PUMP_CAPACITY_M3_15MIN[PumpType.LARGE]
+                + small_on * PUMP_CAPACITY_M3_15MIN[PumpType.SMALL],
+                power_kw=large_on * PUMP_POWER_KW[PumpType.LARGE]
+                + small_on * PUMP_POWER_KW[PumpType.SMALL],
+                large_on=large_on,
+                small_on=small_on,
+            )
+            known = cheapest.get(level.capacity_m3_15min)
+            if known is None or level.power_kw < known.power_kw:
+                cheapest[level.capacity_m3_15min] = level
+    return [cheapest[capacity] for capacity in sorted(cheapest)]
+
+
+def _step_transitions(
+    volumes: np.ndarray,
+    inflow: float,
+    capacities: np.ndarray,
+    volume_step_m3: float,
+    max_volume_m3: float,
+    drain_volume_m3: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Next volume, its bin, feasibility and drain flag for every (level, bin)."""
+    available = np.maximum(volumes + inflow - V_MIN, 0.0)
+    outflow = np.minimum(capacities[:, None], available[None, :])
+    next_volumes = np.maximum(volumes[None, :] + inflow - outflow, V_MIN)
+    # Half a bin of margin: the exact volume can sit that far above its bin.
+    feasible = next_volumes + volume_step_m3 / 2 < max_volume_m3
+    bins = np.clip(
+        np.rint((next_volumes - V_MIN) / volume_step_m3).astype(np.int64),
+        0,
+        len(volumes) - 1,
+    )
+    drained = next_volumes <= drain_volume_m3
+    return next_volumes, bins, feasible, drained
+
+
+def _assign_pumps(
+    pumps: Sequence[Pump], levels: list[CapacityLevel], level_indices: np.ndarray
+) -> np.ndarray:
+    """Per-step activation masks that realise the aggregate configurations."""
+    size = len(pumps)
+    bit_values = [1 << (size - 1 - index) for index in range(size)]
+    is_active = [False] * size
+    changed_at = [-(10**9)] * size
+    masks = np.zeros(len(level_indices), dtype=np.int64)
+    for step, level_index in enumerate(level_indices):
+        level = levels[level_index]
+        for pump_type, wanted in (
+            (PumpType.LARGE, level.large_on),
+            (PumpType.SMALL, level.small_on),
+        ):
+            members = [i for i, pump in enumerate(pumps) if pump.pump_type == pump_type]
+            running = [i for i in members if is_active[i]]
+            idle = [i for i in members if not is_active[i]]
+            # Longest idle starts first; longest running stops first.
+            for index in sorted(idle, key=lambda i: changed_at[i])[
+                : max(wanted - len(running), 0)
+            ]:
+                is_active[index] = True
+                changed_at[index] = step
+            for index in sorted(running, key=lambda i: changed_at[i])[
+                : max(len(running) - wanted, 0)
+            ]:
+                is_active[index] = False
+                changed_at[index] = step
+        masks[step] = sum(bit for bit, active in zip(bit_values, is_active) if active)
+    return masks
+
+
+def solve_optimal_schedule(
+    timestamps_s: np.ndarray,
+    inflow_m3_15min: np.ndarray,
+    price_eur_cent_per_kwh: np.ndarray,
+    initial_water_volume_m3: float,
+    pumps: list[Pump] | None = None,
+    config: ControllerConfig = DEFAULT_CONTROLLER_CONFIG,
+    volume_step_m3: float = 375.0,
+    terminal_max_volume_m3: float | None = None,
+    price_high_eur_cent_per_kwh: np.ndarray | None = None,
+) -> OptimalSchedule:
+    """Minimum energy cost schedule at the given (normal) tariff.
+
+    Step 0 is the initial state, as in ``simulate``; the configuration chosen
+    for step ``t`` sets the outflow and the power of that step. The final
+    volume may not exceed ``terminal_max_volume_m3`` (default: the initial
+    volume), so emptying the tunnel cannot be deferred past the horizon.
+    """
+    start_time = time.perf_counter()
+    if pumps is None:
+        pumps = default_pumps()
+    size = len(inflow_m3_15min)
+    levels = capacity_levels(pumps)
+    capacities = np.array([level.capacity_m3_15min for level in levels], dtype=float)
+    step_cost_per_price = np.array([level.power_kw * 0.25 / 100.0 for level in levels])
+    level_count = len(levels)
+
+    hold_steps = max(1, math.ceil(config.min_runtime.total_seconds() / STEP_SECONDS))
+    drain_hours = math.floor(config.drain_interval.total_seconds() / 3600)
+    rain_threshold = float(config.rain_threshold_m3_15min)
+    max_volume = volume_from_level(MAX_SAFE_LEVEL_M)
+    drain_volume = volume_from_level(float(config.drain_target_level_m))
+    if terminal_max_volume_m3 is None:
+        terminal_max_volume_m3 = initial_water_volume_m3
+
+    bin_count = int(math.ceil((max_volume - V_MIN) / volume_step_m3)) + 1
+    volumes = V_MIN + volume_step_m3 * np.arange(bin_count)
+    drain_states = drain_hours + 1
+
+    # Cost-to-go indexed [level, hold - 1, drain hours * bins + volume bin]; hold
+    # counts the steps the current level has been kept, capped at hold_steps
+    # (free to change). One trailing infinite entry per row is the target of
+    # every infeasible transition, so a step is a single gather per level.
+    plane = drain_states * bin_count
+    infeasible = plane
+    cost_to_go = np.full((level_count, hold_steps, plane + 1), np.inf, dtype=np.float32)
+    terminal = (volumes <= terminal_max_volume_m3 + volume_step_m3 / 2)[None, :]
+    cost_to_go[:, :, :plane] = np.where(
+        np.broadcast_to(terminal, (drain_states, bin_count)).reshape(-1), 0.0, np.inf
+    )
+    updated = np.empty_like(cost_to_go)
+    updated[:, :, plane] = np.inf
+
+    drain_offsets = (np.arange(drain_states) * bin_count)[:, None]
+    level_axis = np.arange(level_count)[:, None]
+
+    # Decisions at free states (hold == hold_steps), kept for the forward pass:
+    # the best and second best level to switch to, and whether keeping wins.
+    best_switch = np.zeros((size, plane), dtype=np.int8)
+    second_switch = np.zeros((size, plane), dtype=np.int8)
+    keep_bits = np.zeros((size, math.ceil(level_count * plane / 8)), dtype=np.uint8)
+
+    for step in range(size - 1, 0, -1):
+        inflow = float(inflow_m3_15min[step])
+        hour_tick = int(step % STEPS_PER_HOUR == 0 and inflow <= rain_threshold)
+        _, bins, feasible, drained = _step_transitions(
+            volumes, inflow, capacities, volume_step_m3, max_volume, drain_volume
+        )
+        step_cost = (step_cost_per_price * float(price_eur_cent_per_kwh[step])).astype(
+            np.float32
+        )
+
+        keep = np.empty((level_count, plane), dtype=np.float32)
+        switch = np.empty((level_count, plane), dtype=np.float32)
+        for level_index in range(level_count):
+            # Flat index of the successor of every (drain hours, volume bin).
+            targets = np.where(
+                drained[level_index],
+                bins[level_index],
+                drain_offsets + hour_tick * bin_count + bins[level_index],
+            )
+            targets[drain_states - hour_tick :] = np.where(
+                drained[level_index], targets[drain_states - hour_tick :], infeasible
+            )
+            targets = np.where(feasible[level_index], targets, infeasible).reshape(-1)
+
+            source = cost_to_go[level_index]
+            # Not yet free: the level is kept and the hold counter advances.
+            np.take(source[1:], targets, axis=1, out=updated[level_index, :-1, :plane])
+            np.take(source[hold_steps - 1], targets, out=keep[level_index])
+            np.take(source[0], targets, out=switch[level_index])
+
+        updated[:, :-1, :plane] += step_cost[:, None, None]
+        keep += step_cost[:, None]
+        if hold_steps > 1:
+            switch += step_cost[:, None]
+        else:
+            switch = keep.copy()
+
+        best = np.argmin(switch, axis=0)
+        best_value = np.take_along_axis(switch, best[None], axis=0)[0]
+        np.put_along_axis(switch, best[None], np.inf, axis=0)
+        second = np.argmin(switch, axis=0)
+        second_value = np.take_along_axis(switch, second[None], axis=0)[0]
+        switch_value = np.where(level_axis == best[None], second_value, best_value)
+        keeps = keep <= switch_value
+        updated[:, hold_steps - 1, :plane] = np.where(keeps, keep, switch_value)
+
+        best_switch[step] = best
+        second_switch[step] = second
+        keep_bits[step] = np.packbits(keeps.reshape(-1))
+        cost_to_go, updated = updated, cost_to_go
+
+    # Forward pass from the initial state: all pumps off, free to start, just drained.
+    start_bin = int(round((initial_water_volume_m3 - V_MIN) / volume_step_m3))
+    start_bin = min(max(start_bin, 0), bin_count - 1)
+    expected_cost = float(cost_to_go[0, hold_steps - 1, start_bin])
+    if not math.isfinite(expected_cost):
+        raise ValueError(
+            "No schedule keeps the level below the limit and meets the drain rule"
+        )
+
+    level_indices = np.zeros(size, dtype=np.int64)
+    water_volume = np.empty(size)
+    outflow = np.zeros(size)
+    water_volume[0] = initial_water_volume_m3
+    volume = float(initial_water_volume_m3)
+    level_index, hold, drain = 0, hold_steps, 0
+    for step in range(1, size):
+        volume_bin = min(
+            max(int(round((volume - V_MIN) / volume_step_m3)), 0), bin_count - 1
+        )
+        if hold >= hold_steps:
+            keep_flags = np.unpackbits(
+                keep_bits[step], count=level_count * drain_states * bin_count
+            ).reshape(level_count, plane)
+            state = drain * bin_count + volume_bin
+            if keep_flags[level_index, state]:
+                chosen = level_index
+            else:
+                chosen = int(best_switch[step, state])
+                if chosen == level_index:
+                    chosen = int(second_switch[step, state])
+        else:
+            chosen = level_index
+
+        hold = min(hold + 1, hold_steps) if chosen == level_index else 1
+        level_index = chosen
+
+        inflow = float(inflow_m3_15min[step])
+        step_outflow = min(capacities[chosen], max(volume + inflow - V_MIN, 0.0))
+        volume = max(volume + inflow - step_outflow, V_MIN)
+        if volume <= drain_volume:
+            drain = 0
+        elif step % STEPS_PER_HOUR == 0 and inflow <= rain_threshold:
+            drain = min(drain + 1, drain_states - 1)
+
+        level_indices[step] = chosen
+        water_volume[step] = volume
+        outflow[step] = step_outflow
+
+    log = SimulationLog.from_arrays(
+        pumps=pumps,
+        timestamps_ns=np.asarray(timestamps_s, dtype=np.int64) * 1_000_000_000,
+        water_volume_m3=water_volume,
+        water_level_m=level_from_volume_array(water_volume),
+        inflow_m3_15min=np.asarray(inflow_m3_15min, dtype=float),
+        outflow_m3_15min=outflow,
+        activation_masks=_assign_pumps(pumps, levels, level_indices),
+        electricity_price_eur_cent_per_kwh=np.asarray(
+            price_eur_cent_per_kwh, dtype=float
+        ),
+        electricity_price_eur_cent_per_kwh_high=np.asarray(
+            price_eur_cent_per_kwh
+            if price_high_eur_cent_per_kwh is None
+            else price_high_eur_cent_per_kwh,
+            dtype=float,
+        ),
+    )
+    return OptimalSchedule(
+        level_indices=level_indices,
+        capacity_levels=levels,
+        expected_cost_eur=expected_cost,
+        log=log,
+        kpis=kpis_from_log(log),
+        solve_seconds=time.perf_counter() - start_time,
+    )
+
+
+if __name__ == "__main__":
+    from datetime import timedelta
+
+    from app.ingest import load_simulation_input
+    from app.vectorized_simulation import SimulationArrays, run_vectorized
+
+    parser = argparse.ArgumentParser(description="Compute the optimal pump schedule.")
+    parser.add_argument("--data", default="Hackathon_HSY_data.csv")
+    parser.add_argument("--volume-step", type=float, default=375.0)
+    args = parser.parse_args()
+
+    simulation_input = load_simulation_input(args.data)
+    arrays = SimulationArrays.from_dataframe(simulation_input.dataframe)
+    initial_volume = float(simulation_input.initial_water_volume_m3)
+
+    controller = run_vectorized(arrays=arrays, initial_water_volume_m3=initial_volume)
+    controller_kpis = kpis_from_log(controller.log)
+    print(
+        f"Real-time controller: {controller_kpis.cost_normal_eur:,.2f} EUR, "
+        f"max level {controller_kpis.max_level_m:.2f} m, "
+        f"final volume {controller.log.water_volume_m3[-1]:,.0f} m3"
+    )
+
+    for label, config in (
+        ("Optimal, aggregate 2 h hold", DEFAULT_CONTROLLER_CONFIG),
+        (
+            "Lower bound, no min runtime",
+            DEFAULT_CONTROLLER_CONFIG.model_copy(update={"min_runtime": timedelta(0)}),
+        ),
+    ):
+        schedule = solve_optimal_schedule(
+            timestamps_s=arrays.timestamps_s,
+            inflow_m3_15min=arrays.inflow_m3_15min,
+            price_eur_cent_per_kwh=arrays.price_eur_cent_per_kwh,
+            price_high_eur_cent_per_kwh=arrays.price_high_eur_cent_per_kwh,
+            initial_water_volume_m3=initial_volume,
+            config=config,
+            volume_step_m3=args.volume_step,
+            terminal_max_volume_m3=max(
+                initial_volume, float(controller.log.water_volume_m3[-1])
+            ),
+        )
+        print(
+            f"{label}: {schedule.kpis.cost_normal_eur:,.2f} EUR "
+            f"(DP estimate {schedule.expected_cost_eur:,.2f}), "
+            f"max level {schedule.kpis.max_level_m:.2f} m, "
+            f"solved in {schedule.solve_seconds:.1f} s"
+        )
@@ -0,0 +1,109 @@
+from datetime import timedelta
+from itertools import product
+
+import numpy as np
+import pytest
+
+from app.controller_config import ControllerConfig
+from app.kpi import kpis_from_log
+from app.optimal_schedule import capacity_levels, solve_optimal_schedule
+from app.pump import Pump, PumpType, default_pumps
+from app.vectorized_simulation import SimulationArrays, run_vectorized
+from app.water_level import V_MIN, level_from_volume
+
+
+def _timestamps(size: int) -> np.ndarray:
+    return 1_731_628_800 + 900 * np.arange(size, dtype=np.int64)
+
+
+class TestOptimalSchedule:
+    def test_dominated_configurations_are_dropped(self) -> None:
+        levels = capacity_levels(default_pumps())
+
+        assert [level.capacity_m3_15min for level in levels] == list(
+            range(0, 5251, 375)
+        )
+        one_large = levels[2]
+        assert (one_large.large_on, one_large.small_on, one_large.power_kw) == (
+            1,
+            0,
+            350,
+        )
+        assert levels[-1].power_kw == 6 * 350 + 2 * 200
+
+    def test_matches_exhaustive_search_on_a_small_problem(self) -> None:
+        pumps = [
+            Pump(id="1", pump_type=PumpType.LARGE, current_run_time_start=None),
+            Pump(id="2", pump_type=PumpType.SMALL, current_run_time_start=None),
+        ]
+        inflow = np.array([0, 750, 1125, 375, 1500, 750, 0, 1125], dtype=float)
+        prices = np.array([1, 9, 2, 7, 1, 8, 3, 2], dtype=float)
+        initial_volume = V_MIN + 375 * 4
+        config = ControllerConfig(
+            min_runtime=timedelta(minutes=15), drain_interval=timedelta(hours=48)
+        )
+
+        schedule = solve_optimal_schedule(
+            timestamps_s=_timestamps(len(inflow)),
+            inflow_m3_15min=inflow,
+            price_eur_cent_per_kwh=prices,
+            initial_water_volume_m3=initial_volume,
+            pumps=pumps,
+            config=config,
+        )
+
+        levels = capacity_levels(pumps)
+        best = np.inf
+        for choice in product(range(len(levels)), repeat=len(inflow) - 1):
+            volume, cost = initial_volume, 0.0
+            for step, level_index in enumerate(choice, start=1):
+                outflow = min(
+                    levels[level_index].capacity_m3_15min,
+                    max(volume + inflow[step] - V_MIN, 0.0),
+                )
+                volume = max(volume + inflow[step] - outflow, V_MIN)
+                cost += levels[level_index].power_kw * 0.25 * prices[step] / 100
+            if volume <= initial_volume:
+                best = min(best, cost)
+
+        assert schedule.expected_cost_eur == pytest.approx(best, rel=1e-6)
+        assert schedule.kpis.cost_normal_eur == pytest.approx(best, rel=1e-6)
+
+    def test_schedule_respects_limits_and_beats_the_controller(self) -> None:
+        size = 24 * 4 * 3
+        steps = np.arange(size)
+        inflow = 1400 + 900 * np.sin(steps / 30) ** 2
+        prices = np.round(5 + 4 * np.sin(2 * np.pi * steps / 96), 3)
+        arrays = SimulationArrays(
+            timestamps_s=_timestamps(size),
+            inflow_m3_15min=inflow,
+            price_eur_cent_per_kwh=prices,
+            price_high_eur_cent_per_kwh=prices + 3,
+        )
+        controller = run_vectorized(arrays=arrays, initial_water_volume_m3=20_000.0)
+
+        schedule = solve_optimal_schedule(
+            timestamps_s=arrays.timestamps_s,
+            inflow_m3_15min=inflow,
+            price_eur_cent_per_kwh=prices,
+            initial_water_volume_m3=20_000.0,
+            terminal_max_volume_m3=max(
+                20_000.0, float(controller.log.water_volume_m3[-1])
+            ),
+        )
+
+        log = schedule.log
+        assert log.water_level_m.max() < 8.0
+        assert (
+            log.water_volume_m3[-1]
+            <= max(20_000.0, controller.log.water_volume_m3[-1]) + 375
+        )
+        assert min(level_from_volume(v) for v in log.water_volume_m3) <= 0.5
+        assert (
+            schedule.kpis.cost_normal_eur
+            < kpis_from_log(controller.log).cost_normal_eur
+        )
+
+        # The aggregate configuration is held at least 2 h after every change.
+        changes = np.flatnonzero(np.diff(schedule.level_indices[1:]) != 0)
+        assert (np.diff(changes) >= 8).all()
@@ -0,0 +1,350 @@
+import os
+import time
+from collections.abc import Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas
+from pydantic import BaseModel
+
+from app.controller_config import (
+    DEFAULT_CONTROLLER_CONFIG,
+    ControllerConfig,
+    fixed_controller_config,
+)
+from app.fast_forward import smoothed_inflows
+from app.fixed_point import VOLUME_UNITS_PER_M3, decimal_units, volume_units
+from app.geometry import ANALYTIC_GEOMETRY, TunnelGeometry
+from app.pump import (
+    PumpRecord,
+    PumpRuntimeLedger,
+    PumpState,
+    PumpStateRecord,
+    default_pumps,
+)
+from app.pump_selection import MASK_TABLE_MAX_PUMPS
+from app.simulation import simulate
+from app.simulation_log import SimulationLog
+
+
+"""
+Parallel-in-time (Parareal-style) runner for long histories.
+
+Only the tunnel volume and the pump state carry over from one row to the
+next, so the rows are split into chunks that worker processes simulate from
+estimated start states. A chunk is exact once its start state matches the
+end state of its (exact) predecessor; every iteration re-runs, in parallel,
+the chunks whose start state differs from their predecessor's latest end
+state. The first chunk is exact after the first iteration, so at most one
+iteration per chunk is needed. Usually far fewer are, because runs that
+start from different states meet again: the volume is clamped at the
+minimum when the tunnel is drained, and the smoothed inflow is a function of
+the inflow column alone.
+
+States are compared by what the rest of a run can still see of them. A pump
+start or stop older than the minimum runtime, or a drain older than the
+drain interval, no longer affects any decision, so those timestamps only
+have to match while they are recent. Cumulative pump runtimes only matter
+to fleets too large for the mask tables.
+"""
+
+
+class ParallelRunReport(BaseModel):
+    chunks: int
+    workers: int
+    # One iteration runs every chunk that is not yet known to be exact.
+    iterations: int
+    chunk_runs: int
+    wall_s: float
+
+
+class _ChunkResult:
+    __slots__ = ("log", "error")
+
+    def __init__(self, log: SimulationLog | None, error: str | None) -> None:
+        self.log = log
+        self.error = error
+
+
+def _initial_states(
+    dataframe: pandas.DataFrame,
+    bounds: Sequence[int],
+    initial_water_volume_ul: int,
+    config: ControllerConfig,
+) -> list[tuple[int, PumpStateRecord]]:
+    """Estimated (volume, pump state) before the first row of every chunk.
+
+    The smoothed inflow is exact; the tunnel is assumed at its initial volume
+    with all pumps off, as at the start of the run.
+    """
+    averages = smoothed_inflows(
+        volume_units(dataframe["inflow_to_tunnel_m3_per_15min"]).tolist(), config
+    )
+    states = []
+    for start in bounds[:-1]:
+        pump_state = PumpStateRecord.from_model(PumpState(pumps=default_pumps()))
+        if start > 1:
+            # The state before row ``start`` is the one after row ``start - 1``.
+            pump_state.average_inflow_ul_15min = averages[start - 1]
+        states.append((initial_water_volume_ul, pump_state))
+    return states
+
+
+def _compact(pump_state: PumpStateRecord) -> PumpStateRecord:
+    """``pump_state`` with only the last activation of each pump.
+
+    Enough for every decision of a mask-table fleet, and keeps what is sent
+    to a worker small however long the history before the chunk is.
+    """
+    if len(pump_state.pumps) > MASK_TABLE_MAX_PUMPS:
+        return pump_state
+    return PumpStateRecord(
+        pumps=[
+            PumpRecord(
+                pump.id,
+                pump.pump_type,
+                pump.current_run_time_start,
+                PumpRuntimeLedger(pump.activation_times[-1:]),
+                len(pump.activation_times[-1:]),
+            )
+            for pump in pump_state.pumps
+        ],
+        target_outflow_ul_15min=pump_state.target_outflow_ul_15min,
+        average_inflow_ul_15min=pump_state.average_inflow_ul_15min,
+        last_daily_drain_timestamp=pump_state.last_daily_drain_timestamp,
+        pending_daily_drain=pump_state.pending_daily_drain,
+    )
+
+
+def boundary_key(
+    water_volume_ul: int,
+    pump_state: PumpStateRecord,
+    next_timestamp: datetime,
+    min_runtime: timedelta,
+    drain_interval: timedelta,
+) -> tuple:
+    """The part of a state that can still change a run from ``next_timestamp`` on."""
+
+    def recent(timestamp: datetime | None, window: timedelta) -> datetime | None:
+        if timestamp is None or next_timestamp - timestamp >= window:
+            return None
+        return timestamp
+
+    pumps = tuple(
+        (
+            pump.is_active,
+            recent(
+                pump.current_run_time_start if pump.is_active else pump.last_stop_time,
+                min_runtime,
+            ),
+            pump.cumulative_time_minutes
+            if len(pump_state.pumps) > MASK_TABLE_MAX_PUMPS
+            else None,
+        )
+        for pump in pump_state.pumps
+    )
+    return (
+        water_volume_ul,
+        pumps,
+        pump_state.target_outflow_ul_15min,
+        pump_state.average_inflow_ul_15min,
+        recent(pump_state.last_daily_drain_timestamp, drain_interval),
+        pump_state.pending_daily_drain,
+    )
+
+
+def _run_chunk(
+    dataframe: pandas.DataFrame,
+    look_ahead_stops: Sequence[int],
+    start: int,
+    stop: int,
+    water_volume_ul: int,
+    pump_state: PumpStateRecord,
+    config: ControllerConfig,
+    geometry: TunnelGeometry,
+) -> _ChunkResult:
+    """Rows ``start:stop`` from the state after row ``start - 1`` (the initial row for 0).
+
+    The returned log starts with row ``start`` (row 0 for the first chunk).
+    """
+    first = max(start - 1, 0)
+    try:
+        log = simulate(
+            dataframe.iloc[first : look_ahead_stops[stop - 1]],
+            Decimal(water_volume_ul) / VOLUME_UNITS_PER_M3,
+            verbose=False,
+            config=config,
+            geometry=geometry,
+            fast_forward=True,
+            initial_pump_state=pump_state,
+            stop_row=stop - first,
+        )
+    except AssertionError as error:
+        return _ChunkResult(None, str(error) or "assertion failed")
+    return _ChunkResult(log if start == 0 else log.rows(1), None)
+
+
+# Set in each worker process by _attach_worker.
+_worker_input: tuple | None = None
+
+
+def _attach_worker(
+    dataframe: pandas.DataFrame,
+    look_ahead_stops: Sequence[int],
+    config: ControllerConfig,
+    geometry: TunnelGeometry,
+) -> None:
+    global _worker_input
+    _worker_input = (dataframe, look_ahead_stops, config, geometry)
+
+
+def _run_chunk_in_worker(
+    start: int, stop: int, water_volume_ul: int, pump_state: PumpStateRecord
+) -> _ChunkResult:
+    assert _worker_input is not None, "worker was not given the input"
+    dataframe, look_ahead_stops, config, geometry = _worker_input
+    return _run_chunk(
+        dataframe,
+        look_ahead_stops,
+        start,
+        stop,
+        water_volume_ul,
+        pump_state,
+        config,
+        geometry,
+    )
+
+
+def run_parallel_in_time(
+    dataframe: pandas.DataFrame,
+    initial_water_volume_m3: Decimal,
+    chunks: int | None = None,
+    max_workers: int | None = None,
+    config: ControllerConfig = DEFAULT_CONTROLLER_CONFIG,
+    geometry: TunnelGeometry = ANALYTIC_GEOMETRY,
+) -> tuple[SimulationLog, ParallelRunReport]:
+    """The log of ``simulate(dataframe, ...)`` with the constant flow controller,
+    computed by ``chunks`` chunks (default: one per worker) in parallel.
+
+    ``max_workers=1`` runs the chunks in-process. The pump runtime histories
+    of ``final_pump_state`` only cover the last chunk.
+    """
+    started = time.perf_counter()
+    max_workers = max_workers or os.cpu_count() or 1
+    chunks = max(1, min(chunks or max_workers, len(dataframe)))
+    bounds = np.linspace(0, len(dataframe), chunks + 1).round().astype(int).tolist()
+    fixed_config = fixed_controller_config(config)
+
+    # Each chunk also needs the prices of the day after its last row.
+    timestamps_ns = pandas.DatetimeIndex(dataframe["timestamp"]).asi8
+    look_ahead_stops = np.searchsorted(
+        timestamps_ns,
+        timestamps_ns + timedelta(hours=24) // pandas.Timedelta(1, "ns"),
+        side="right",
+    ).tolist()
+    timestamps = [timestamp.to_pydatetime() for timestamp in dataframe["timestamp"]]
+
+    def key(chunk: int, water_volume_ul: int, pump_state: PumpStateRecord) -> tuple:
+        return boundary_key(
+            water_volume_ul,
+            pump_state,
+            timestamps[min(bounds[chunk], len(timestamps) - 1)],
+            fixed_config.min_runtime,
+            fixed_config.drain_interval,
+        )
+
+    start_states = _initial_states(
+        dataframe,
+        bounds,
+        decimal_units(initial_water_volume_m3, VOLUME_UNITS_PER_M3),
+        config,
+    )
+    executor = None
+    if max_workers > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_attach_worker,
+            initargs=(dataframe, look_ahead_stops, config, geometry),
+        )
+
+    def submit(chunk: int) -> "Future[_ChunkResult]":
+        water_volume_ul, pump_state = start_states[chunk]
+        arguments = (
+            bounds[chunk],
+            bounds[chunk + 1],
+            water_volume_ul,
+            _compact(pump_state),
+        )
+        if executor is not None:
+            return executor.submit(_run_chunk_in_worker, *arguments)
+        future: Future[_ChunkResult] = Future()
+        future.set_result(
+            _run_chunk(dataframe, look_ahead_stops, *arguments, config, geometry)
+        )
+        return future
+
+    results: list[_ChunkResult | None] = [None] * chunks
+    # Logs of the chunks known to be exact, in order.
+    exact_logs: list[SimulationLog] = []
+    exact = 0
+    iterations = 0
+    chunk_runs = 0
+    try:
+        pending = list(range(chunks))
+        while True:
+            iterations += 1
+            chunk_runs += len(pending)
+            futures = {chunk: submit(chunk) for chunk in pending}
+            for chunk, future in futures.items():
+                results[chunk] = future.result()
+
+            # Extend the exact prefix while start states match.
+            while exact < chunks:
+                result = results[exact]
+                assert result is not None
+                if exact > 0:
+                    previous = exact_logs[-1]
+                    if key(exact, *start_states[exact]) != key(
+                        exact, previous.final_water_volume_ul, previous.final_pump_state
+                    ):
+                        break
+                if result.error is not None:
+                    raise AssertionError(result.error)
+                assert result.log is not None
+                exact_logs.append(result.log)
+                exact += 1
+                # A run that broke off early ends the whole run there.
+                expected_rows = bounds[exact] - bounds[exact - 1]
+                if len(result.log) < expected_rows:
+                    chunks = exact
+                    break
+            if exact >= chunks:
+                break
+
+            pending = []
+            for chunk in range(exact, chunks):
+                previous = results[chunk - 1]
+                assert previous is not None
+                if previous.log is None:
+                    continue
+                end_state = (
+                    previous.log.final_water_volume_ul,
+                    previous.log.final_pump_state,
+                )
+                if key(chunk, *start_states[chunk]) != key(chunk, *end_state):
+                    start_states[chunk] = end_state
+                    pending.append(chunk)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    log = SimulationLog.concatenate(exact_logs)
+    return log, ParallelRunReport(
+        chunks=len(results),
+        workers=max_workers,
+        iterations=iterations,
+        chunk_runs=chunk_runs,
+        wall_s=time.perf_counter() - started,
+    )
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pandas
+
+from app.parallel_in_time import boundary_key, run_parallel_in_time
+from app.pump import PumpState, PumpStateRecord, default_pumps, toggle_pump
+from app.simulation import simulate
+from app.testing import storm_dataframe
+
+
+class TestParallelInTime:
+    def test_chunked_log_is_identical_to_the_sequential_run(self) -> None:
+        dataframe = storm_dataframe(800, storm_step=400)
+
+        log, report = run_parallel_in_time(
+            dataframe, Decimal(20_000), chunks=5, max_workers=1
+        )
+
+        pandas.testing.assert_frame_equal(
+            log.to_dataframe(),
+            simulate(dataframe, Decimal(20_000), verbose=False).to_dataframe(),
+            check_exact=True,
+        )
+        assert report.chunks == 5
+        assert 1 <= report.iterations <= 5
+        assert report.chunk_runs >= 5
+
+    def test_boundary_key_forgets_old_pump_starts(self) -> None:
+        start = datetime(2024, 11, 15)
+        pumps = default_pumps()
+        state = PumpStateRecord.from_model(
+            PumpState(pumps=[toggle_pump(pumps[0], start), *pumps[1:]])
+        )
+        earlier = PumpStateRecord.from_model(
+            PumpState(
+                pumps=[toggle_pump(pumps[0], start - timedelta(days=3)), *pumps[1:]]
+            )
+        )
+
+        def key(pump_state: PumpStateRecord, hours: float) -> tuple:
+            return boundary_key(
+                1_000_000,
+                pump_state,
+                start + timedelta(hours=hours),
+                min_runtime=timedelta(hours=2),
+                drain_interval=timedelta(hours=24),
+            )
+
+        assert key(state, 1) != key(earlier, 1)
+        assert key(state, 2) == key(earlier, 2)
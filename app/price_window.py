@@ -0,0 +1,292 @@
+import math
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import NamedTuple
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+
+
+class PriceWindowStats(BaseModel):
+    min_price: Decimal
+    mean_price: Decimal
+    q25_price: Decimal
+    q75_price: Decimal
+
+
+class IntegerPriceWindowStats(NamedTuple):
+    """Window statistics over integer prices; the mean is ``price_sum / count``.
+
+    A plain tuple rather than a model: one is built on every simulation step.
+    """
+
+    min_price: int
+    q25_price: int
+    q75_price: int
+    price_sum: int
+    count: int
+
+
+class PriceWindowArrays(BaseModel):
+    """Float look-ahead statistics for every step, NaN where the window is empty."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    count: np.ndarray
+    min_price: np.ndarray
+    mean_price: np.ndarray
+    q25_price: np.ndarray
+    q75_price: np.ndarray
+
+
+class _FenwickTree:
+    """Counts per price rank with prefix sums and k-th smallest lookup."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self.top_bit = 1 << max(size.bit_length() - 1, 0)
+
+    def add(self, rank: int, delta: int) -> None:
+        index = rank + 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def kth_smallest(self, k: int) -> int:
+        """Return the rank of the k-th smallest (0-based) counted element."""
+        position = 0
+        remaining = k + 1
+        step = self.top_bit
+        while step:
+            candidate = position + step
+            if candidate <= self.size and self.tree[candidate] < remaining:
+                position = candidate
+                remaining -= self.tree[candidate]
+            step >>= 1
+        return position
+
+
+class ForwardPriceWindow:
+    """Look-ahead price statistics for every step of a timestamp-sorted series.
+
+    The window of step ``i`` holds the prices with a timestamp in
+    ``(timestamps[i], timestamps[i] + horizon]``, which is the same selection
+    the simulation used to build with a boolean mask per step. Window bounds are
+    found once with two pointers and the window content is kept in a Fenwick
+    tree over price ranks, so sliding forward and answering min, mean and
+    quantile queries costs O(log W) per step. Missing prices (NaN) are skipped.
+
+    Integer prices (e.g. the fixed-point units of ``app.fixed_point``) are kept
+    as integers, so the window sums stay exact integers as well.
+    """
+
+    def __init__(
+        self,
+        timestamps: Sequence[datetime],
+        prices: Sequence[float] | Sequence[int],
+        horizon: timedelta = timedelta(hours=24),
+    ) -> None:
+        if len(timestamps) != len(prices):
+            raise ValueError("Timestamps and prices must have the same length")
+
+        self.prices: list[Decimal | int | None] = [
+            None
+            if value is None or math.isnan(value)
+            else int(value)
+            if isinstance(value, (int, np.integer))
+            else Decimal(str(value))
+            for value in prices
+        ]
+
+        distinct_prices = sorted({p for p in self.prices if p is not None})
+        rank_of_price = {price: rank for rank, price in enumerate(distinct_prices)}
+        self._ranked_prices = distinct_prices
+        self._ranks = [None if p is None else rank_of_price[p] for p in self.prices]
+
+        # Two pointers: both window edges only ever move forward in time.
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        start = 0
+        end = 0
+        for index, timestamp in enumerate(timestamps):
+            if index and timestamp < timestamps[index - 1]:
+                raise ValueError("Timestamps must be sorted in ascending order")
+            window_end = timestamp + horizon
+            while start < len(timestamps) and timestamps[start] <= timestamp:
+                start += 1
+            end = max(end, start)
+            while end < len(timestamps) and timestamps[end] <= window_end:
+                end += 1
+            self._starts.append(start)
+            self._ends.append(end)
+
+        self._reset()
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def _reset(self) -> None:
+        self._tree = _FenwickTree(len(self._ranked_prices))
+        self._low = 0
+        self._high = 0
+        self._count = 0
+        self._sum: Decimal | int = 0
+
+    def _insert(self, position: int) -> None:
+        rank = self._ranks[position]
+        if rank is None:
+            return
+        self._tree.add(rank, 1)
+        self._count += 1
+        self._sum += self._ranked_prices[rank]
+
+    def _remove(self, position: int) -> None:
+        rank = self._ranks[position]
+        if rank is None:
+            return
+        self._tree.add(rank, -1)
+        self._count -= 1
+        self._sum -= self._ranked_prices[rank]
+
+    def _move_to(self, index: int) -> None:
+        start = self._starts[index]
+        end = self._ends[index]
+
+        # Queries normally walk forward; going back in time rebuilds the window.
+        if start < self._low or end < self._high:
+            self._reset()
+            self._low = self._high = start
+
+        while self._high < end:
+            self._insert(self._high)
+            self._high += 1
+        while self._low < start:
+            self._remove(self._low)
+            self._low += 1
+
+    def count(self, index: int) -> int:
+        self._move_to(index)
+        return self._count
+
+    def quantile(self, index: int, fraction: float) -> Decimal | None:
+        """Lower quantile of the window, i.e. ``sorted[int((n - 1) * fraction)]``."""
+        self._move_to(index)
+        if self._count == 0:
+            return None
+        rank = self._tree.kth_smallest(int((self._count - 1) * fraction))
+        return self._ranked_prices[rank]
+
+    def min(self, index: int) -> Decimal | None:
+        return self.quantile(index, 0.0)
+
+    def mean(self, index: int) -> Decimal | None:
+        self._move_to(index)
+        if self._count == 0:
+            return None
+        return self._sum / Decimal(self._count)
+
+    def stats(self, index: int) -> PriceWindowStats | None:
+        """Statistics used by the constant flow controller, None for an empty window."""
+        self._move_to(index)
+        if self._count == 0:
+            return None
+
+        def _at(fraction: float) -> Decimal:
+            rank = self._tree.kth_smallest(int((self._count - 1) * fraction))
+            return self._ranked_prices[rank]
+
+        return PriceWindowStats(
+            min_price=_at(0.0),
+            mean_price=self._sum / Decimal(self._count),
+            q25_price=_at(0.25),
+            q75_price=_at(0.75),
+        )
+
+    def integer_stats(self, index: int) -> IntegerPriceWindowStats | None:
+        """``stats`` of a window built from integer prices, without any division."""
+        self._move_to(index)
+        if self._count == 0:
+            return None
+
+        count = self._count
+        tree = self._tree
+        ranked = self._ranked_prices
+        return IntegerPriceWindowStats(
+            min_price=ranked[tree.kth_smallest(0)],
+            q25_price=ranked[tree.kth_smallest(int((count - 1) * 0.25))],
+            q75_price=ranked[tree.kth_smallest(int((count - 1) * 0.75))],
+            price_sum=self._sum,
+            count=count,
+        )
+
+
+def forward_price_stat_arrays(
+    timestamps_s: np.ndarray,
+    prices: np.ndarray,
+    horizon_s: int = 24 * 3600,
+    chunk_size: int = 16_384,
+) -> PriceWindowArrays:
+    """Vectorised counterpart of ``ForwardPriceWindow`` over float64 arrays.
+
+    Window bounds come from ``searchsorted`` on the (sorted) epoch seconds and
+    the windows are sorted in fixed-size chunks, so the memory use stays at
+    ``chunk_size * W`` regardless of the length of the series.
+    """
+    timestamps_s = np.asarray(timestamps_s, dtype=np.int64)
+    prices = np.asarray(prices, dtype=np.float64)
+    if np.any(np.diff(timestamps_s) < 0):
+        raise ValueError("Timestamps must be sorted in ascending order")
+
+    size = len(prices)
+    starts = np.searchsorted(timestamps_s, timestamps_s, side="right")
+    ends = np.searchsorted(timestamps_s, timestamps_s + horizon_s, side="right")
+
+    is_valid = ~np.isnan(prices)
+    valid_cumsum = np.concatenate(([0], np.cumsum(is_valid)))
+    count = valid_cumsum[ends] - valid_cumsum[starts]
+
+    min_price = np.full(size, np.nan)
+    mean_price = np.full(size, np.nan)
+    q25_price = np.full(size, np.nan)
+    q75_price = np.full(size, np.nan)
+
+    width = int((ends - starts).max()) if size else 0
+    if width:
+        # Missing prices sort last so they never reach a quantile index.
+        padded = np.concatenate(
+            (np.where(is_valid, prices, np.inf), np.full(width, np.inf))
+        )
+        for chunk_start in range(0, size, chunk_size):
+            chunk = slice(chunk_start, min(chunk_start + chunk_size, size))
+            offsets = starts[chunk, None] + np.arange(width)
+            windows = np.where(offsets < ends[chunk, None], padded[offsets], np.inf)
+            windows.sort(axis=1)
+            chunk_count = count[chunk]
+            has_values = chunk_count > 0
+            rows = np.arange(len(chunk_count))
+
+            # Prices are quoted with a few decimals; rounding the mean removes
+            # summation noise so ties compare like the exact Decimal mean.
+            window_sum = np.where(np.isfinite(windows), windows, 0.0).sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean_price[chunk] = np.where(
+                    has_values, np.round(window_sum / chunk_count, 9), np.nan
+                )
+
+            for target, fraction in (
+                (min_price, 0.0),
+                (q25_price, 0.25),
+                (q75_price, 0.75),
+            ):
+                index = ((chunk_count - 1) * fraction).astype(np.int64)
+                picked = windows[rows, np.maximum(index, 0)]
+                target[chunk] = np.where(has_values, picked, np.nan)
+
+    return PriceWindowArrays(
+        count=count,
+        min_price=min_price,
+        mean_price=mean_price,
+        q25_price=q25_price,
+        q75_price=q75_price,
+    )
@@ -0,0 +1,64 @@
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.price_window import ForwardPriceWindow
+
+
+def _brute_force_window(
+    timestamps: list[datetime], prices: list[float], index: int
+) -> list[Decimal]:
+    window_end = timestamps[index] + timedelta(hours=24)
+    return sorted(
+        Decimal(str(price))
+        for timestamp, price in zip(timestamps, prices)
+        if timestamps[index] < timestamp <= window_end and price == price
+    )
+
+
+class TestForwardPriceWindow:
+    def test_stats_match_brute_force_selection(self) -> None:
+        rng = random.Random(7)
+        start = datetime(2024, 11, 15)
+        timestamps = [start + timedelta(minutes=15 * i) for i in range(400)]
+        prices = [round(rng.uniform(-1, 20), 3) for _ in timestamps]
+        prices[10] = float("nan")
+        prices[150] = float("nan")
+
+        window = ForwardPriceWindow(timestamps=timestamps, prices=prices)
+
+        for index in range(len(timestamps)):
+            expected = _brute_force_window(timestamps, prices, index)
+            stats = window.stats(index)
+            if not expected:
+                assert stats is None
+                continue
+
+            assert stats is not None
+            assert stats.min_price == expected[0]
+            assert stats.mean_price == sum(expected, Decimal("0")) / len(expected)
+            assert stats.q25_price == expected[int((len(expected) - 1) * 0.25)]
+            assert stats.q75_price == expected[int((len(expected) - 1) * 0.75)]
+
+    def test_random_access_rebuilds_window(self) -> None:
+        start = datetime(2024, 11, 15)
+        timestamps = [start + timedelta(hours=i) for i in range(60)]
+        prices = [float(i % 7) for i in range(60)]
+
+        window = ForwardPriceWindow(timestamps=timestamps, prices=prices)
+
+        assert (
+            window.quantile(50, 0.5) == _brute_force_window(timestamps, prices, 50)[4]
+        )
+        assert window.count(3) == 24
+        assert window.min(3) == Decimal("0.0")
+        assert window.stats(59) is None
+
+    def test_unsorted_timestamps_are_rejected(self) -> None:
+        start = datetime(2024, 11, 15)
+        with pytest.raises(ValueError):
+            ForwardPriceWindow(
+                timestamps=[start, start - timedelta(minutes=15)], prices=[1.0, 2.0]
+            )
@@ -1,7 +1,10 @@
 from datetime import datetime
 from decimal import Decimal
 from enum import Enum
-from pydantic import BaseModel
+from typing import Any, TypeVar
+from pydantic import BaseModel, PrivateAttr, computed_field
+
+from app.fixed_point import VOLUME_UNITS_PER_M3
 
 
 """
@@ -19,118 +22,351 @@ class PumpActivation(BaseModel):
     end_time: datetime
 
 
+class PumpRuntimeLedger:
+    """Append-only activation history shared by successive snapshots of a pump.
+
+    Keeps prefix sums of the run durations next to the activations, so a
+    snapshot that knows how many activations belong to it can answer its
+    cumulative runtime, start count and last stop time in O(1). A ledger
+    restored from a checkpoint keeps only the last activation; the ``offset``
+    activations before it are known by their count and total runtime only.
+    """
+
+    __slots__ = ("activations", "cumulative_seconds", "offset")
+
+    def __init__(self, activations: list[PumpActivation] | None = None) -> None:
+        self.activations: list[PumpActivation] = []
+        self.cumulative_seconds: list[float] = [0.0]
+        self.offset = 0
+        for activation in activations or []:
+            self.append(activation)
+
+    @classmethod
+    def restored(
+        cls,
+        last_activation: PumpActivation | None,
+        activation_count: int,
+        cumulative_seconds: float,
+    ) -> "PumpRuntimeLedger":
+        """Ledger of ``activation_count`` activations of which only the last is kept."""
+        ledger = cls()
+        if last_activation is None:
+            return ledger
+        last_seconds = (
+            last_activation.end_time - last_activation.start_time
+        ).total_seconds()
+        ledger.activations = [last_activation]
+        ledger.cumulative_seconds = [
+            cumulative_seconds - last_seconds,
+            cumulative_seconds,
+        ]
+        ledger.offset = activation_count - 1
+        return ledger
+
+    def __len__(self) -> int:
+        return self.offset + len(self.activations)
+
+    def append(self, activation: PumpActivation) -> None:
+        self.activations.append(activation)
+        self.cumulative_seconds.append(
+            self.cumulative_seconds[-1]
+            + (activation.end_time - activation.start_time).total_seconds()
+        )
+
+    def fork(self, length: int) -> "PumpRuntimeLedger":
+        """Copy of the first ``length`` activations, for branching off an old snapshot."""
+        ledger = PumpRuntimeLedger()
+        ledger.activations = self.activations[: length - self.offset]
+        ledger.cumulative_seconds = self.cumulative_seconds[: length - self.offset + 1]
+        ledger.offset = self.offset
+        return ledger
+
+
 class PumpType(str, Enum):
     SMALL = "small"
     LARGE = "large"
 
 
-class Pump(BaseModel):
-    id: str
-    pump_type: PumpType
+# Nominal pump specs; the other units below are derived from these.
+PUMP_CAPACITY_M3_15MIN = {PumpType.LARGE: 750, PumpType.SMALL: 375}
+PUMP_POWER_KW = {PumpType.LARGE: 350, PumpType.SMALL: 200}
+PUMP_CAPACITY_UL_15MIN = {
+    pump_type: capacity * VOLUME_UNITS_PER_M3
+    for pump_type, capacity in PUMP_CAPACITY_M3_15MIN.items()
+}
 
-    # this is ste is pump is currently running, it is None if pump is off
-    current_run_time_start: datetime | None
-    activation_times: list[PumpActivation] = []
+
+class _PumpRuntime:
+    """Runtime queries shared by ``Pump`` and ``PumpRecord``."""
+
+    __slots__ = ()
+
+    @property
+    def start_count(self) -> int:
+        return self._history_length + (1 if self.is_active else 0)
+
+    @property
+    def last_activation(self) -> PumpActivation | None:
+        if not self._history_length:
+            return None
+        return self._ledger.activations[self._history_length - self._ledger.offset - 1]
+
+    @property
+    def last_stop_time(self) -> datetime | None:
+        last_activation = self.last_activation
+        return None if last_activation is None else last_activation.end_time
 
     @property
     def is_active(self) -> bool:
         return self.current_run_time_start is not None
 
     @property
-    def pump_capacity_m3_15min(self) -> Decimal:
-        pump_on_capacity = (
-            Decimal("750") if self.pump_type == PumpType.LARGE else Decimal("375")
-        )
-
-        return pump_on_capacity if self.is_active else Decimal(0)
+    def pump_capacity_ul_15min(self) -> int:
+        if self.current_run_time_start is None:
+            return 0
+        return PUMP_CAPACITY_UL_15MIN[self.pump_type]
 
     def capacity_m3_15min_at_level(self, water_level_m: float) -> Decimal:
         if not self.is_active:
             return Decimal(0)
 
-        L2 = 30.0  # m, fixed plant-side level from assignment
-        head_m = max(L2 - float(water_level_m), 1.0)  # avoid zero/negative head
+        # Imported here because the curve tables are keyed by PumpType.
+        from app.pump_curves import DEFAULT_PUMP_CURVES
 
-        q_m3_per_h = self._flow_from_head(head_m)
-        return Decimal(q_m3_per_h / 4.0)
+        return Decimal(DEFAULT_PUMP_CURVES.flow_m3_15min(self.pump_type, water_level_m))
 
-    def _flow_from_head(self, head_m: float) -> float:
-        if self.pump_type == PumpType.LARGE:
-            # Example points: (head [m], flow [m3/h])
-            curve = [(15.0, 3000.0), (30.0, 2000.0)]
-        else:
-            curve = [
-                (15.0, 1500.0),
-                (30.0, 1000.0),
-            ]
+    @property
+    def cumulative_runtime_seconds(self) -> float:
+        """Runtime of the finished activations."""
+        ledger = self._ledger
+        return ledger.cumulative_seconds[self._history_length - ledger.offset]
 
-        heads = [h for h, _ in curve]
-        flows = [q for _, q in curve]
+    @property
+    def cumulative_time_minutes(self) -> int:
+        return int(self.cumulative_runtime_seconds / 60)
 
-        # Clamp head into the curve range
-        if head_m <= heads[0]:
-            return flows[0]
-        if head_m >= heads[-1]:
-            return flows[-1]
+    @property
+    def current_power_kw(self) -> Decimal:
+        if not self.is_active:
+            return Decimal(0)
+        return Decimal(PUMP_POWER_KW[self.pump_type])
 
-        # Linear interpolation between nearest points
-        for (h1, q1), (h2, q2) in zip(curve, curve[1:]):
-            if h1 <= head_m <= h2:
-                alpha = (head_m - h1) / (h2 - h1)
-                return q1 + alpha * (q2 - q1)
 
-        # Fallback
-        return flows[-1]
+class Pump(_PumpRuntime, BaseModel):
+    id: str
+    pump_type: PumpType
 
-    @property
-    def cumulative_time_minutes(self) -> int:
-        return int(
-            sum(
-                (t.end_time - t.start_time).total_seconds()
-                for t in self.activation_times
+    # this is ste is pump is currently running, it is None if pump is off
+    current_run_time_start: datetime | None
+
+    # Shared history; this snapshot owns its first _history_length activations.
+    _ledger: PumpRuntimeLedger = PrivateAttr(default_factory=PumpRuntimeLedger)
+    _history_length: int = PrivateAttr(default=0)
+
+    def __init__(
+        self,
+        activation_times: list[PumpActivation | dict[str, Any]] | None = None,
+        **data: Any,
+    ) -> None:
+        super().__init__(**data)
+        if activation_times:
+            # Dumped pumps come back with the activations as dicts.
+            self._ledger = PumpRuntimeLedger(
+                [
+                    PumpActivation.model_validate(activation)
+                    for activation in activation_times
+                ]
             )
-            / 60
+            self._history_length = len(activation_times)
+
+    @classmethod
+    def _from_ledger(
+        cls,
+        pump: "Pump | PumpRecord",
+        current_run_time_start: datetime | None,
+        ledger: PumpRuntimeLedger,
+        history_length: int,
+    ) -> "Pump":
+        new_pump = cls(
+            id=pump.id,
+            pump_type=pump.pump_type,
+            current_run_time_start=current_run_time_start,
         )
+        new_pump._ledger = ledger
+        new_pump._history_length = history_length
+        return new_pump
 
+    @computed_field
     @property
-    def current_power_kw(self) -> Decimal:
-        power_kw = (
-            Decimal("350") if self.pump_type == PumpType.LARGE else Decimal("200")
+    def activation_times(self) -> list[PumpActivation]:
+        # Of a restored ledger only the activations after its offset.
+        return self._ledger.activations[: self._history_length - self._ledger.offset]
+
+
+class PumpRecord(_PumpRuntime):
+    """Slotted, unvalidated ``Pump`` for the simulation loop.
+
+    Reads like a ``Pump`` and shares its ledger, so converting in either
+    direction copies no history.
+    """
+
+    __slots__ = (
+        "id",
+        "pump_type",
+        "current_run_time_start",
+        "_ledger",
+        "_history_length",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        pump_type: PumpType,
+        current_run_time_start: datetime | None,
+        ledger: PumpRuntimeLedger,
+        history_length: int,
+    ) -> None:
+        self.id = id
+        self.pump_type = pump_type
+        self.current_run_time_start = current_run_time_start
+        self._ledger = ledger
+        self._history_length = history_length
+
+    @classmethod
+    def _from_ledger(
+        cls,
+        pump: "Pump | PumpRecord",
+        current_run_time_start: datetime | None,
+        ledger: PumpRuntimeLedger,
+        history_length: int,
+    ) -> "PumpRecord":
+        return cls(
+            pump.id, pump.pump_type, current_run_time_start, ledger, history_length
+        )
+
+    @classmethod
+    def from_model(cls, pump: Pump) -> "PumpRecord":
+        return cls._from_ledger(
+            pump, pump.current_run_time_start, pump._ledger, pump._history_length
         )
-        return power_kw if self.is_active else Decimal(0)
+
+    def to_model(self) -> Pump:
+        return Pump._from_ledger(
+            self, self.current_run_time_start, self._ledger, self._history_length
+        )
+
+    @property
+    def activation_times(self) -> list[PumpActivation]:
+        return self._ledger.activations[: self._history_length - self._ledger.offset]
 
 
-def toggle_pump(pump: Pump, timestamp: datetime) -> Pump:
+AnyPump = TypeVar("AnyPump", Pump, PumpRecord)
+
+
+def toggle_pump(pump: AnyPump, timestamp: datetime) -> AnyPump:
     # Set pump off
     if pump.current_run_time_start:
         latest_activation_start = pump.current_run_time_start
 
-        return Pump(
-            id=pump.id,
-            pump_type=pump.pump_type,
+        # Append in place unless a newer snapshot already extended the history.
+        ledger = pump._ledger
+        if len(ledger) != pump._history_length:
+            ledger = ledger.fork(pump._history_length)
+        ledger.append(
+            PumpActivation(start_time=latest_activation_start, end_time=timestamp)
+        )
+
+        return type(pump)._from_ledger(
+            pump,
             current_run_time_start=None,
-            activation_times=[
-                *pump.activation_times,
-                PumpActivation(start_time=latest_activation_start, end_time=timestamp),
-            ],
+            ledger=ledger,
+            history_length=pump._history_length + 1,
         )
 
     # Set pump on
-    return Pump(
-        id=pump.id,
-        pump_type=pump.pump_type,
+    return type(pump)._from_ledger(
+        pump,
         current_run_time_start=timestamp,
-        activation_times=pump.activation_times,
+        ledger=pump._ledger,
+        history_length=pump._history_length,
     )
 
 
 class PumpState(BaseModel):
     pumps: list[Pump]
-    target_outflow_m3_15min: Decimal | None = None
-    average_inflow_m3_15min: Decimal | None = None
+    # Integer microlitres, see app.fixed_point.
+    target_outflow_ul_15min: int | None = None
+    average_inflow_ul_15min: int | None = None
     last_daily_drain_timestamp: datetime | None = None
     pending_daily_drain: bool = False
 
     @property
-    def total_suction_m3_15min(self) -> Decimal:
-        return Decimal(sum([p.pump_capacity_m3_15min for p in self.pumps]))
+    def total_suction_ul_15min(self) -> int:
+        return sum([p.pump_capacity_ul_15min for p in self.pumps])
+
+
+class PumpStateRecord:
+    """Slotted, unvalidated ``PumpState`` passed between the loop and the controllers."""
+
+    __slots__ = (
+        "pumps",
+        "target_outflow_ul_15min",
+        "average_inflow_ul_15min",
+        "last_daily_drain_timestamp",
+        "pending_daily_drain",
+    )
+
+    def __init__(
+        self,
+        pumps: list[PumpRecord],
+        target_outflow_ul_15min: int | None = None,
+        average_inflow_ul_15min: int | None = None,
+        last_daily_drain_timestamp: datetime | None = None,
+        pending_daily_drain: bool = False,
+    ) -> None:
+        self.pumps = pumps
+        self.target_outflow_ul_15min = target_outflow_ul_15min
+        self.average_inflow_ul_15min = average_inflow_ul_15min
+        self.last_daily_drain_timestamp = last_daily_drain_timestamp
+        self.pending_daily_drain = pending_daily_drain
+
+    @property
+    def total_suction_ul_15min(self) -> int:
+        total = 0
+        for pump in self.pumps:
+            if pump.current_run_time_start is not None:
+                total += PUMP_CAPACITY_UL_15MIN[pump.pump_type]
+        return total
+
+    @classmethod
+    def from_model(cls, pump_state: PumpState) -> "PumpStateRecord":
+        return cls(
+            pumps=[PumpRecord.from_model(pump) for pump in pump_state.pumps],
+            target_outflow_ul_15min=pump_state.target_outflow_ul_15min,
+            average_inflow_ul_15min=pump_state.average_inflow_ul_15min,
+            last_daily_drain_timestamp=pump_state.last_daily_drain_timestamp,
+            pending_daily_drain=pump_state.pending_daily_drain,
+        )
+
+    def to_model(self) -> PumpState:
+        return PumpState(
+            pumps=[pump.to_model() for pump in self.pumps],
+            target_outflow_ul_15min=self.target_outflow_ul_15min,
+            average_inflow_ul_15min=self.average_inflow_ul_15min,
+            last_daily_drain_timestamp=self.last_daily_drain_timestamp,
+            pending_daily_drain=self.pending_daily_drain,
+        )
+
+
+def default_pumps() -> list[Pump]:
+    """The Blominmäki pump fleet, all pumps off."""
+    return [
+        Pump(id="1.1", pump_type=PumpType.SMALL, current_run_time_start=None),
+        Pump(id="2.1", pump_type=PumpType.SMALL, current_run_time_start=None),
+        Pump(id="2.2", pump_type=PumpType.LARGE, current_run_time_start=None),
+        Pump(id="2.3", pump_type=PumpType.LARGE, current_run_time_start=None),
+        Pump(id="2.4", pump_type=PumpType.LARGE, current_run_time_start=None),
+        Pump(id="1.2", pump_type=PumpType.LARGE, current_run_time_start=None),
+        Pump(id="1.3", pump_type=PumpType.LARGE, current_run_time_start=None),
+        Pump(id="1.4", pump_type=PumpType.LARGE, current_run_time_start=None),
+    ]
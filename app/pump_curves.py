@@ -0,0 +1,113 @@
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+from app.pump import PumpType
+
+
+"""
+Head-dependent pump flow and power from the Grundfos datasheet curves.
+
+The curves of ``Pumppukäyrä_suuret.PDF`` (S3.145, duty point 925 l/s at
+31.5 m, P1 358.1 kW) and ``Pumppukäyrä_pienet.PDF`` (S3.120, 464 l/s at
+31.5 m, P1 188.7 kW) are tabulated below as (flow, head, input power) points.
+The head a pump works against is the plant-side level ``PLANT_LEVEL_M`` minus
+the tunnel level.
+
+``PumpCurveTable`` resamples flow and power of every pump type onto one
+uniform head grid, so the operating points of a whole fleet are one gather
+and one linear interpolation. Heads outside a curve get the flow and power at
+its nearest end.
+"""
+
+PLANT_LEVEL_M = 30.0
+MIN_HEAD_M = 1.0
+HEAD_GRID_SIZE = 1024
+SECONDS_PER_STEP = 900
+
+# (flow [l/s], head [m], P1 [kW]) read off the datasheets.
+LARGE_PUMP_CURVE = (
+    (500, 38.8, 308.0),
+    (600, 37.7, 322.0),
+    (700, 36.2, 335.0),
+    (800, 34.5, 347.0),
+    (900, 32.5, 356.0),
+    (1000, 30.2, 362.0),
+    (1100, 27.6, 365.0),
+    (1200, 24.8, 363.0),
+    (1300, 21.6, 355.0),
+    (1400, 18.1, 335.0),
+    (1500, 14.4, 295.0),
+)
+SMALL_PUMP_CURVE = (
+    (300, 35.2, 171.0),
+    (350, 34.8, 177.0),
+    (400, 33.9, 182.5),
+    (450, 32.5, 187.5),
+    (500, 30.7, 192.0),
+    (550, 28.5, 196.0),
+    (600, 25.8, 199.5),
+    (650, 22.7, 202.0),
+    (700, 19.1, 204.0),
+    (750, 15.1, 205.5),
+    (780, 12.5, 206.0),
+)
+PUMP_CURVES = {PumpType.LARGE: LARGE_PUMP_CURVE, PumpType.SMALL: SMALL_PUMP_CURVE}
+
+
+def head_from_level(water_level_m: float) -> float:
+    return max(PLANT_LEVEL_M - water_level_m, MIN_HEAD_M)
+
+
+class PumpCurveTable:
+    """Flow [m³/15 min] and power [kW] of every pump type on a uniform head grid."""
+
+    def __init__(
+        self,
+        curves: Mapping[PumpType, Sequence[tuple[float, float, float]]] = PUMP_CURVES,
+        grid_size: int = HEAD_GRID_SIZE,
+    ) -> None:
+        self.pump_types = list(curves)
+        points = {
+            pump_type: np.array(curve, dtype=float)
+            for pump_type, curve in curves.items()
+        }
+        self.min_head_m = min(float(curve[:, 1].min()) for curve in points.values())
+        self.max_head_m = max(float(curve[:, 1].max()) for curve in points.values())
+        heads = np.linspace(self.min_head_m, self.max_head_m, grid_size)
+
+        # table[type, head cell] = (flow m³/15 min, power kW); heads fall with flow.
+        self.table = np.empty((len(self.pump_types), grid_size, 2))
+        for index, pump_type in enumerate(self.pump_types):
+            flow_l_s, head_m, power_kw = points[pump_type][::-1].T
+            flow_m3_15min = flow_l_s * SECONDS_PER_STEP / 1000.0
+            self.table[index, :, 0] = np.interp(heads, head_m, flow_m3_15min)
+            self.table[index, :, 1] = np.interp(heads, head_m, power_kw)
+        self.scale = (grid_size - 1) / (self.max_head_m - self.min_head_m)
+        self.last_cell = grid_size - 2
+
+    def type_indices(self, pump_types: Sequence[PumpType]) -> np.ndarray:
+        return np.array([self.pump_types.index(pump_type) for pump_type in pump_types])
+
+    def operating_points(
+        self, type_indices: np.ndarray, water_level_m: float
+    ) -> np.ndarray:
+        """Rows of (flow m³/15 min, power kW) for pumps of the given type indices."""
+        head = min(
+            max(head_from_level(water_level_m), self.min_head_m), self.max_head_m
+        )
+        position = (head - self.min_head_m) * self.scale
+        cell = min(int(position), self.last_cell)
+        low = self.table[type_indices, cell]
+        return low + (self.table[type_indices, cell + 1] - low) * (position - cell)
+
+    def flow_m3_15min(self, pump_type: PumpType, water_level_m: float) -> float:
+        index = self.pump_types.index(pump_type)
+        return float(self.operating_points(np.array([index]), water_level_m)[0, 0])
+
+    def power_kw(self, pump_type: PumpType, water_level_m: float) -> float:
+        index = self.pump_types.index(pump_type)
+        return float(self.operating_points(np.array([index]), water_level_m)[0, 1])
+
+
+DEFAULT_PUMP_CURVES = PumpCurveTable()
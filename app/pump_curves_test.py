@@ -0,0 +1,72 @@
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from app.kpi import kpis_from_log
+from app.pump import Pump, PumpType, toggle_pump
+from app.pump_curves import DEFAULT_PUMP_CURVES, PLANT_LEVEL_M
+from app.vectorized_simulation import SimulationArrays, check_parity, run_vectorized
+from app.testing import synthetic_dataframe
+
+
+class TestPumpCurves:
+    def test_table_reproduces_the_datasheet_duty_points(self) -> None:
+        duty_level = PLANT_LEVEL_M - 31.5
+
+        # 925 l/s at 358.1 kW and 464 l/s at 188.7 kW, within reading accuracy.
+        assert DEFAULT_PUMP_CURVES.flow_m3_15min(PumpType.LARGE, duty_level) == (
+            pytest.approx(925 * 0.9, rel=0.03)
+        )
+        assert DEFAULT_PUMP_CURVES.power_kw(PumpType.LARGE, duty_level) == (
+            pytest.approx(358.1, rel=0.02)
+        )
+        assert DEFAULT_PUMP_CURVES.flow_m3_15min(PumpType.SMALL, duty_level) == (
+            pytest.approx(464 * 0.9, rel=0.03)
+        )
+        assert DEFAULT_PUMP_CURVES.power_kw(PumpType.SMALL, duty_level) == (
+            pytest.approx(188.7, rel=0.02)
+        )
+
+    def test_flow_rises_with_the_tunnel_level(self) -> None:
+        type_indices = DEFAULT_PUMP_CURVES.type_indices(
+            [PumpType.LARGE, PumpType.SMALL]
+        )
+        flows = np.array(
+            [
+                DEFAULT_PUMP_CURVES.operating_points(type_indices, level)[:, 0]
+                for level in np.linspace(-20.0, 20.0, 401)
+            ]
+        )
+
+        assert (np.diff(flows, axis=0) >= 0).all()
+        pump = toggle_pump(
+            Pump(id="1.1", pump_type=PumpType.SMALL, current_run_time_start=None),
+            datetime(2024, 11, 15),
+        )
+        assert float(pump.capacity_m3_15min_at_level(3.0)) == pytest.approx(
+            DEFAULT_PUMP_CURVES.flow_m3_15min(PumpType.SMALL, 3.0)
+        )
+
+    def test_simulators_agree_with_head_dependent_pumps(self) -> None:
+        dataframe = synthetic_dataframe()
+        arrays = SimulationArrays.from_dataframe(dataframe)
+
+        nominal = run_vectorized(arrays, 20_000.0)
+        result = run_vectorized(arrays, 20_000.0, pump_curves=DEFAULT_PUMP_CURVES)
+        report = check_parity(
+            dataframe, Decimal(20_000), result, pump_curves=DEFAULT_PUMP_CURVES
+        )
+
+        assert report.passed, report
+        assert not np.array_equal(
+            result.log.outflow_m3_15min, nominal.log.outflow_m3_15min
+        )
+        pump_id = result.log.pump_ids[-1]
+        running = result.log.pump_is_active(pump_id)
+        assert (result.log.pump_power_kw(pump_id)[~running] == 0).all()
+        assert (
+            kpis_from_log(result.log).energy_kwh
+            != kpis_from_log(nominal.log).energy_kwh
+        )
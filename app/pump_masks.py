@@ -0,0 +1,113 @@
+from collections.abc import Sequence
+from decimal import Decimal
+from functools import lru_cache
+
+
+from app.pump import PUMP_CAPACITY_M3_15MIN, Pump, PumpType
+
+
+"""
+Integer bitmask tables over every activation mask of a pump fleet.
+
+Bit ``n - 1 - i`` of a mask belongs to pump ``i``, so ascending mask values
+follow the order in which ``itertools.product([False, True], repeat=n)``
+enumerates activations and ties resolve exactly like the brute-force search.
+Capacities are integers in m³ per 15 min times ``units_per_m3``, so a table
+built with ``VOLUME_UNITS_PER_M3`` searches in the exact µL of
+``app.fixed_point``.
+"""
+
+
+class ActivationMaskTable:
+    def __init__(self, pump_types: Sequence[PumpType], units_per_m3: int = 1) -> None:
+        size = len(pump_types)
+        self.size = size
+        self.bit_values = [1 << (size - 1 - index) for index in range(size)]
+        pump_capacities = [PUMP_CAPACITY_M3_15MIN[t] * units_per_m3 for t in pump_types]
+
+        mask_count = 1 << size
+        self.capacities = [0] * mask_count
+        self.popcounts = [0] * mask_count
+        for mask in range(1, mask_count):
+            # Reuse the entry of the mask without its lowest set bit.
+            lowest_bit = mask & -mask
+            pump_index = size - lowest_bit.bit_length()
+            self.capacities[mask] = (
+                self.capacities[mask ^ lowest_bit] + pump_capacities[pump_index]
+            )
+            self.popcounts[mask] = self.popcounts[mask ^ lowest_bit] + 1
+        # Toggle count between two masks is popcounts[a ^ b]; active count is popcounts[a].
+        self.active_counts = self.popcounts
+
+        # Masks grouped by total capacity, so a search can visit the capacities
+        # closest to the target first and stop as soon as it cannot improve.
+        masks_by_capacity: dict[int, list[int]] = {}
+        for mask in range(mask_count):
+            masks_by_capacity.setdefault(self.capacities[mask], []).append(mask)
+        self.masks_by_capacity = masks_by_capacity
+        self.max_capacity = sum(pump_capacities)
+        self.min_capacity = min(pump_capacities)
+        # Running total of masks scored by best_mask, read by app.instrumentation.
+        self.masks_evaluated = 0
+
+    def mask_of(self, pumps: Sequence[Pump]) -> int:
+        return sum(bit for bit, pump in zip(self.bit_values, pumps) if pump.is_active)
+
+    def best_mask(
+        self,
+        current_mask: int,
+        changeable_mask: int,
+        desired_capacity: Decimal | float,
+        current_capacity: Decimal | float,
+        allow_all_off: bool = False,
+        use_smoothing_penalty: bool = True,
+    ) -> int | None:
+        """Best reachable mask by (diff, toggles, smoothing, active count, mask).
+
+        Only pumps in ``changeable_mask`` may change state. Returns None when no
+        mask is reachable, e.g. when everything must stay off and
+        ``allow_all_off`` is False. Without the smoothing penalty the score is
+        the (diff, toggles, active count) order of ``change_pump_state``.
+        """
+        fixed_bits = ~changeable_mask
+        levels = sorted(
+            (abs(capacity - desired_capacity), capacity)
+            for capacity in self.masks_by_capacity
+            if allow_all_off or capacity > 0
+        )
+
+        popcounts = self.popcounts
+        best_score: tuple | None = None
+        best_mask: int | None = None
+        for diff, capacity in levels:
+            if best_score is not None and diff > best_score[0]:
+                break
+            smoothing_penalty = (
+                abs(capacity - current_capacity) if use_smoothing_penalty else 0
+            )
+            masks = self.masks_by_capacity[capacity]
+            self.masks_evaluated += len(masks)
+            for mask in masks:
+                toggled = mask ^ current_mask
+                if toggled & fixed_bits:
+                    continue
+                score = (
+                    diff,
+                    popcounts[toggled],
+                    smoothing_penalty,
+                    popcounts[mask],
+                    mask,
+                )
+                if best_score is None or score < best_score:
+                    best_score = score
+                    best_mask = mask
+
+        return best_mask
+
+
+@lru_cache(maxsize=32)
+def mask_table_for(
+    pump_types: tuple[PumpType, ...], units_per_m3: int = 1
+) -> ActivationMaskTable:
+    """Build the table once per fleet layout and capacity unit."""
+    return ActivationMaskTable(pump_types, units_per_m3)
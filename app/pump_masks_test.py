@@ -0,0 +1,77 @@
+import random
+from decimal import Decimal
+from itertools import product
+
+from app.pump import PUMP_CAPACITY_M3_15MIN, PumpType
+from app.pump_masks import mask_table_for
+
+
+def _brute_force_best(
+    pump_types: list[PumpType],
+    current: tuple[bool, ...],
+    changeable: tuple[bool, ...],
+    desired_capacity: Decimal,
+) -> tuple[bool, ...] | None:
+    capacities = [Decimal(PUMP_CAPACITY_M3_15MIN[t]) for t in pump_types]
+    current_capacity = sum(
+        (c for c, on in zip(capacities, current) if on), Decimal("0")
+    )
+    best_mask = None
+    best_score = None
+    for mask in product([False, True], repeat=len(pump_types)):
+        if not any(mask):
+            continue
+        if any(
+            now != wanted and not free
+            for now, wanted, free in zip(current, mask, changeable)
+        ):
+            continue
+        capacity = sum((c for c, on in zip(capacities, mask) if on), Decimal("0"))
+        score = (
+            abs(capacity - desired_capacity),
+            sum(now != wanted for now, wanted in zip(current, mask)),
+            abs(capacity - current_capacity),
+            sum(mask),
+        )
+        if best_score is None or score < best_score:
+            best_score = score
+            best_mask = mask
+    return best_mask
+
+
+class TestActivationMaskTable:
+    def test_capacities_and_counts(self) -> None:
+        table = mask_table_for((PumpType.SMALL, PumpType.LARGE, PumpType.LARGE))
+
+        assert table.capacities == [0, 750, 750, 1500, 375, 1125, 1125, 1875]
+        assert table.popcounts[0b101 ^ 0b011] == 2
+        assert table.active_counts[0b111] == 3
+
+    def test_best_mask_matches_brute_force_search(self) -> None:
+        rng = random.Random(11)
+        pump_types = [PumpType.SMALL] * 2 + [PumpType.LARGE] * 6
+        table = mask_table_for(tuple(pump_types))
+
+        for _ in range(300):
+            current = tuple(rng.random() < 0.4 for _ in pump_types)
+            changeable = tuple(rng.random() < 0.6 for _ in pump_types)
+            desired = Decimal(rng.randrange(0, 5600)) / Decimal(rng.choice([1, 4]))
+
+            expected = _brute_force_best(pump_types, current, changeable, desired)
+            current_mask = sum(bit for bit, on in zip(table.bit_values, current) if on)
+            changeable_mask = sum(
+                bit for bit, free in zip(table.bit_values, changeable) if free
+            )
+            best = table.best_mask(
+                current_mask=current_mask,
+                changeable_mask=changeable_mask,
+                desired_capacity=desired,
+                current_capacity=Decimal(table.capacities[current_mask]),
+            )
+
+            if expected is None:
+                assert best is None
+            else:
+                assert best == sum(
+                    bit for bit, on in zip(table.bit_values, expected) if on
+                )
@@ -0,0 +1,175 @@
+from collections.abc import Sequence
+from decimal import Decimal
+
+
+from app.pump import PUMP_CAPACITY_M3_15MIN, Pump, PumpType
+from app.pump_masks import mask_table_for
+
+
+"""
+Pump activation selection that scales to large fleets.
+
+Pumps with the same type and capacity are interchangeable for the score
+``(diff, toggle_count, smoothing_penalty, active_count)``: it only depends on
+how many pumps of each group run. The selection is therefore a bounded
+knapsack over the groups, keyed by total capacity, followed by picking the
+individual pumps of every group by runtime and min-runtime eligibility.
+Small fleets keep using the exhaustive mask tables, which also preserve the
+brute-force tie-breaking between equally scored masks. Both searches take
+capacities in m³ per 15 min times ``units_per_m3``; the simulator passes
+``VOLUME_UNITS_PER_M3`` and searches in exact integer µL.
+"""
+
+# Above this many pumps the 2^N mask table gets slower than the grouped search,
+# see ``python -m benchmarks.pump_selection``.
+MASK_TABLE_MAX_PUMPS = 12
+
+
+class _PumpGroup:
+    def __init__(self, pump_type: PumpType, capacity: int) -> None:
+        self.pump_type = pump_type
+        self.capacity = capacity
+        self.active_count = 0
+        self.can_turn_off: list[int] = []
+        self.can_turn_on: list[int] = []
+
+    @property
+    def min_active(self) -> int:
+        return self.active_count - len(self.can_turn_off)
+
+    @property
+    def max_active(self) -> int:
+        return self.active_count + len(self.can_turn_on)
+
+
+def _group_pumps(
+    pumps: Sequence[Pump], changeable: Sequence[bool], units_per_m3: int
+) -> list[_PumpGroup]:
+    groups: dict[tuple[PumpType, int], _PumpGroup] = {}
+    for index, (pump, is_changeable) in enumerate(zip(pumps, changeable)):
+        capacity = PUMP_CAPACITY_M3_15MIN[pump.pump_type] * units_per_m3
+        group = groups.setdefault(
+            (pump.pump_type, capacity), _PumpGroup(pump.pump_type, capacity)
+        )
+        if pump.is_active:
+            group.active_count += 1
+            if is_changeable:
+                group.can_turn_off.append(index)
+        elif is_changeable:
+            group.can_turn_on.append(index)
+    return list(groups.values())
+
+
+def select_activation_grouped(
+    pumps: Sequence[Pump],
+    changeable: Sequence[bool],
+    desired_capacity: Decimal | float,
+    current_capacity: Decimal | float,
+    allow_all_off: bool = False,
+    use_smoothing_penalty: bool = True,
+    units_per_m3: int = 1,
+) -> list[bool] | None:
+    """Best activation by grouped dynamic programming, polynomial in fleet size.
+
+    Returns the desired on/off state per pump, or None if no allowed
+    activation exists.
+    """
+    groups = _group_pumps(pumps, changeable, units_per_m3)
+
+    # Per reachable total capacity keep the lexicographically smallest
+    # (toggle_count, active_count); both are sums over groups, so the
+    # optimum for a capacity extends an optimum of the previous groups.
+    frontier: dict[int, tuple[int, int]] = {0: (0, 0)}
+    choices: list[dict[int, tuple[int, int]]] = []
+    for group in groups:
+        next_frontier: dict[int, tuple[int, int]] = {}
+        group_choices: dict[int, tuple[int, int]] = {}
+        for capacity, (toggles, active) in frontier.items():
+            for count in range(group.min_active, group.max_active + 1):
+                total = capacity + count * group.capacity
+                candidate = (
+                    toggles + abs(count - group.active_count),
+                    active + count,
+                )
+                if total not in next_frontier or candidate < next_frontier[total]:
+                    next_frontier[total] = candidate
+                    group_choices[total] = (capacity, count)
+        frontier = next_frontier
+        choices.append(group_choices)
+
+    best_score: tuple | None = None
+    best_total: int | None = None
+    for total, (toggles, active) in frontier.items():
+        if active == 0 and not allow_all_off:
+            continue
+        score = (
+            abs(total - desired_capacity),
+            toggles,
+            abs(total - current_capacity) if use_smoothing_penalty else 0,
+            active,
+        )
+        if best_score is None or score < best_score:
+            best_score = score
+            best_total = total
+
+    if best_total is None:
+        return None
+
+    # Walk the choices back to a count per group, then pick concrete pumps:
+    # start the least used idle pumps and stop the most used running ones.
+    desired = [pump.is_active for pump in pumps]
+    total = best_total
+    for group, group_choices in zip(reversed(groups), reversed(choices)):
+        total, count = group_choices[total]
+        if count > group.active_count:
+            starts = sorted(
+                group.can_turn_on, key=lambda i: pumps[i].cumulative_time_minutes
+            )
+            for index in starts[: count - group.active_count]:
+                desired[index] = True
+        elif count < group.active_count:
+            stops = sorted(
+                group.can_turn_off, key=lambda i: -pumps[i].cumulative_time_minutes
+            )
+            for index in stops[: group.active_count - count]:
+                desired[index] = False
+
+    return desired
+
+
+def select_activation(
+    pumps: Sequence[Pump],
+    changeable: Sequence[bool],
+    desired_capacity: Decimal | float,
+    current_capacity: Decimal | float,
+    allow_all_off: bool = False,
+    use_smoothing_penalty: bool = True,
+    units_per_m3: int = 1,
+) -> list[bool] | None:
+    """Best activation for any fleet size: mask tables for small fleets, grouped DP beyond."""
+    if len(pumps) > MASK_TABLE_MAX_PUMPS:
+        return select_activation_grouped(
+            pumps=pumps,
+            changeable=changeable,
+            desired_capacity=desired_capacity,
+            current_capacity=current_capacity,
+            allow_all_off=allow_all_off,
+            use_smoothing_penalty=use_smoothing_penalty,
+            units_per_m3=units_per_m3,
+        )
+
+    table = mask_table_for(tuple(pump.pump_type for pump in pumps), units_per_m3)
+    changeable_mask = sum(
+        bit for bit, is_changeable in zip(table.bit_values, changeable) if is_changeable
+    )
+    best_mask = table.best_mask(
+        current_mask=table.mask_of(pumps),
+        changeable_mask=changeable_mask,
+        desired_capacity=desired_capacity,
+        current_capacity=current_capacity,
+        allow_all_off=allow_all_off,
+        use_smoothing_penalty=use_smoothing_penalty,
+    )
+    if best_mask is None:
+        return None
+    return [bool(best_mask & bit) for bit in table.bit_values]
@@ -0,0 +1,128 @@
+import random
+from datetime import datetime
+from decimal import Decimal
+from itertools import product
+
+from app.fixed_point import VOLUME_UNITS_PER_M3, decimal_units
+from app.pump import PUMP_CAPACITY_M3_15MIN, Pump, PumpType
+from app.pump_selection import select_activation, select_activation_grouped
+
+
+def _score(
+    pumps: list[Pump],
+    activation: list[bool] | tuple[bool, ...],
+    desired_capacity: Decimal,
+    use_smoothing_penalty: bool,
+) -> tuple:
+    capacities = [Decimal(PUMP_CAPACITY_M3_15MIN[p.pump_type]) for p in pumps]
+    capacity = sum((c for c, on in zip(capacities, activation) if on), Decimal("0"))
+    current = sum((c for c, p in zip(capacities, pumps) if p.is_active), Decimal("0"))
+    return (
+        abs(capacity - desired_capacity),
+        sum(p.is_active != on for p, on in zip(pumps, activation)),
+        abs(capacity - current) if use_smoothing_penalty else 0,
+        sum(activation),
+    )
+
+
+def _random_fleet(rng: random.Random, size: int) -> list[Pump]:
+    return [
+        Pump(
+            id=str(index),
+            pump_type=rng.choice([PumpType.SMALL, PumpType.LARGE]),
+            current_run_time_start=datetime(2024, 11, 15)
+            if rng.random() < 0.5
+            else None,
+        )
+        for index in range(size)
+    ]
+
+
+class TestGroupedSelection:
+    def test_scores_match_brute_force_for_small_fleets(self) -> None:
+        rng = random.Random(5)
+        for _ in range(200):
+            pumps = _random_fleet(rng, rng.randint(1, 8))
+            changeable = [rng.random() < 0.7 for _ in pumps]
+            desired = Decimal(rng.randrange(0, 6000))
+            allow_all_off = rng.random() < 0.5
+            use_smoothing_penalty = rng.random() < 0.5
+
+            allowed_scores = [
+                _score(pumps, mask, desired, use_smoothing_penalty)
+                for mask in product([False, True], repeat=len(pumps))
+                if (any(mask) or allow_all_off)
+                and all(
+                    free or p.is_active == on
+                    for p, on, free in zip(pumps, mask, changeable)
+                )
+            ]
+            current_capacity = sum(
+                (
+                    Decimal(PUMP_CAPACITY_M3_15MIN[p.pump_type])
+                    for p in pumps
+                    if p.is_active
+                ),
+                Decimal("0"),
+            )
+            result = select_activation_grouped(
+                pumps=pumps,
+                changeable=changeable,
+                desired_capacity=desired,
+                current_capacity=current_capacity,
+                allow_all_off=allow_all_off,
+                use_smoothing_penalty=use_smoothing_penalty,
+            )
+
+            if not allowed_scores:
+                assert result is None
+                continue
+            assert result is not None
+            assert all(
+                free or p.is_active == on
+                for p, on, free in zip(pumps, result, changeable)
+            )
+            assert _score(pumps, result, desired, use_smoothing_penalty) == min(
+                allowed_scores
+            )
+
+    def test_large_fleet_uses_grouped_search(self) -> None:
+        rng = random.Random(9)
+        pumps = _random_fleet(rng, 30)
+
+        result = select_activation(
+            pumps=pumps,
+            changeable=[True] * len(pumps),
+            desired_capacity=Decimal("4500"),
+            current_capacity=Decimal("0"),
+        )
+
+        assert result is not None
+        capacity = sum(
+            PUMP_CAPACITY_M3_15MIN[p.pump_type] for p, on in zip(pumps, result) if on
+        )
+        assert capacity == 4500
+
+    def test_integer_microlitres_select_like_cubic_metres(self) -> None:
+        rng = random.Random(13)
+        for size in (8, 8, 8, 20, 20):
+            pumps = _random_fleet(rng, size)
+            changeable = [rng.random() < 0.7 for _ in pumps]
+            current = sum(
+                PUMP_CAPACITY_M3_15MIN[p.pump_type] for p in pumps if p.is_active
+            )
+            for _ in range(50):
+                desired = Decimal(rng.randrange(0, 6000 * 8)) / 8
+
+                assert select_activation(
+                    pumps=pumps,
+                    changeable=changeable,
+                    desired_capacity=decimal_units(desired, VOLUME_UNITS_PER_M3),
+                    current_capacity=current * VOLUME_UNITS_PER_M3,
+                    units_per_m3=VOLUME_UNITS_PER_M3,
+                ) == select_activation(
+                    pumps=pumps,
+                    changeable=changeable,
+                    desired_capacity=desired,
+                    current_capacity=Decimal(current),
+                )
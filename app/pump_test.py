@@ -1,5 +1,13 @@
 from datetime import datetime, timedelta
-from app.pump import Pump, PumpType, toggle_pump
+from app.pump import (
+    Pump,
+    PumpRecord,
+    PumpState,
+    PumpStateRecord,
+    PumpType,
+    default_pumps,
+    toggle_pump,
+)
 
 
 class TestPump:
@@ -29,3 +37,81 @@ class TestPump:
 
         assert pump_off_4.cumulative_time_minutes == 110
         assert len(pump_off_4.activation_times) == 2
+
+    def test_toggling_shares_history_instead_of_copying(self) -> None:
+        start = datetime(2024, 11, 15)
+        pump = Pump(id="1.1", pump_type=PumpType.SMALL, current_run_time_start=None)
+
+        running = toggle_pump(pump, start)
+        stopped = toggle_pump(running, start + timedelta(hours=2))
+        running_again = toggle_pump(stopped, start + timedelta(hours=3))
+        stopped_again = toggle_pump(running_again, start + timedelta(hours=4))
+
+        assert stopped_again._ledger is stopped._ledger
+        assert stopped_again.cumulative_time_minutes == 180
+        assert stopped_again.start_count == 2
+        assert stopped_again.last_stop_time == start + timedelta(hours=4)
+
+        # Older snapshots keep seeing only their own part of the history.
+        assert stopped.cumulative_time_minutes == 120
+        assert len(stopped.activation_times) == 1
+        assert running_again.start_count == 2
+
+    def test_branching_from_an_old_snapshot_forks_the_history(self) -> None:
+        start = datetime(2024, 11, 15)
+        running = toggle_pump(
+            Pump(id="1.2", pump_type=PumpType.LARGE, current_run_time_start=None),
+            start,
+        )
+        stopped_early = toggle_pump(running, start + timedelta(minutes=30))
+        stopped_late = toggle_pump(running, start + timedelta(minutes=90))
+
+        assert stopped_early.cumulative_time_minutes == 30
+        assert stopped_late.cumulative_time_minutes == 90
+        assert stopped_late.model_dump()["activation_times"][0]["end_time"] == (
+            start + timedelta(minutes=90)
+        )
+
+    def test_records_round_trip_to_models(self) -> None:
+        start = datetime(2024, 11, 15)
+        state = PumpStateRecord.from_model(
+            PumpState(pumps=default_pumps(), average_inflow_ul_15min=7)
+        )
+
+        running = toggle_pump(state.pumps[2], start)
+        stopped = toggle_pump(running, start + timedelta(hours=2))
+
+        assert isinstance(stopped, PumpRecord)
+        assert stopped.cumulative_time_minutes == 120
+        pump = stopped.to_model()
+        assert (
+            pump.model_dump()
+            == toggle_pump(
+                toggle_pump(default_pumps()[2], start), start + timedelta(hours=2)
+            ).model_dump()
+        )
+        assert PumpRecord.from_model(pump)._ledger is stopped._ledger
+
+        model = PumpStateRecord(
+            pumps=[running, *state.pumps[1:]], average_inflow_ul_15min=7
+        ).to_model()
+        assert model.total_suction_ul_15min == running.pump_capacity_ul_15min
+        assert PumpStateRecord.from_model(model).total_suction_ul_15min == (
+            model.total_suction_ul_15min
+        )
+
+    def test_dumped_pumps_validate_back_with_their_history(self) -> None:
+        start = datetime(2024, 11, 15)
+        pump = toggle_pump(
+            toggle_pump(default_pumps()[0], start), start + timedelta(hours=2)
+        )
+
+        for restored in (
+            Pump.model_validate(pump.model_dump()),
+            Pump.model_validate_json(pump.model_dump_json()),
+            Pump(**pump.model_dump()),
+            PumpState.model_validate(PumpState(pumps=[pump]).model_dump()).pumps[0],
+        ):
+            assert restored.model_dump() == pump.model_dump()
+            assert restored.cumulative_time_minutes == 120
+            assert restored.last_stop_time == start + timedelta(hours=2)
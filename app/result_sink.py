@@ -0,0 +1,88 @@
+import os
+from typing import Protocol
+
+import pandas
+
+from app.ingest import load_csv
+
+
+"""
+Result sinks that receive simulation output in batches while the run is going.
+
+Every batch is a frame from ``SimulationLog.to_dataframe`` with the output CSV
+labels. The CSV sink appends to one file with the header written once, and
+can continue an existing file; the Parquet sink writes one row group per batch
+with typed columns (pyarrow is an optional dependency and only imported when
+that sink is used).
+"""
+
+
+class ResultSink(Protocol):
+    def write_batch(self, frame: pandas.DataFrame) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class CsvResultSink:
+    def __init__(self, file_path: str, append: bool = False) -> None:
+        self.file_path = file_path
+        # An appended file already has its header unless it is empty.
+        self._write_header = not (
+            append and os.path.isfile(file_path) and os.path.getsize(file_path) > 0
+        )
+        self._file = open(file_path, "a" if append else "w", newline="")
+
+    def write_batch(self, frame: pandas.DataFrame) -> None:
+        frame.to_csv(self._file, index=False, header=self._write_header)
+        self._write_header = False
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetResultSink:
+    def __init__(self, file_path: str) -> None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as error:
+            raise ImportError(
+                "Writing Parquet results requires the optional pyarrow dependency: "
+                "make install-parquet (pip install -r requirements-parquet.txt)"
+            ) from error
+
+        self.file_path = file_path
+        self._pyarrow = pyarrow
+        self._parquet = pyarrow.parquet
+        self._writer = None
+
+    def write_batch(self, frame: pandas.DataFrame) -> None:
+        table = self._pyarrow.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            self._writer = self._parquet.ParquetWriter(self.file_path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_result_sink(file_path: str, append: bool = False) -> ResultSink:
+    """Pick the sink from the file extension: ``.parquet`` or CSV otherwise.
+
+    With ``append`` the batches go after the rows already in the file, which
+    only the CSV sink supports.
+    """
+    if file_path.endswith(".parquet"):
+        if append:
+            raise ValueError("Parquet results cannot be appended to; use a CSV file")
+        return ParquetResultSink(file_path)
+    return CsvResultSink(file_path, append=append)
+
+
+def read_results(file_path: str) -> pandas.DataFrame:
+    """Read a result file written by either sink (or any CSV with the same labels)."""
+    if file_path.endswith(".parquet"):
+        return pandas.read_parquet(file_path)
+    return load_csv(file_path)
@@ -0,0 +1,104 @@
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+import pandas
+import pytest
+
+from app.result_sink import (
+    CsvResultSink,
+    ParquetResultSink,
+    open_result_sink,
+    read_results,
+)
+from app.simulation import simulate
+from app.testing import synthetic_dataframe
+
+
+class _RecordingSink:
+    def __init__(self) -> None:
+        self.batch_sizes: list[int] = []
+
+    def write_batch(self, frame: pandas.DataFrame) -> None:
+        self.batch_sizes.append(len(frame))
+
+    def close(self) -> None:
+        pass
+
+
+class TestResultSinks:
+    def test_csv_batches_match_the_full_log(self, tmp_path: Path) -> None:
+        file_path = str(tmp_path / "out.csv")
+        sink = CsvResultSink(file_path)
+        log = simulate(
+            dataframe=synthetic_dataframe(50),
+            initial_water_volume_m3=Decimal("10000"),
+            verbose=False,
+            sink=sink,
+            batch_size=16,
+        )
+        sink.close()
+
+        written = read_results(file_path)
+        expected = log.to_dataframe()
+        assert list(written.columns) == list(expected.columns)
+        assert len(written) == 50
+        pandas.testing.assert_frame_equal(
+            written.drop(columns="Time stamp"), expected.drop(columns="Time stamp")
+        )
+
+    def test_appended_csv_keeps_one_header(self, tmp_path: Path) -> None:
+        file_path = str(tmp_path / "out.csv")
+        frame = simulate(
+            dataframe=synthetic_dataframe(10),
+            initial_water_volume_m3=Decimal("10000"),
+            verbose=False,
+        ).to_dataframe()
+        for rows, append in ((slice(0, 6), False), (slice(6, 10), True)):
+            sink = open_result_sink(file_path, append=append)
+            sink.write_batch(frame[rows])
+            sink.close()
+
+        written = read_results(file_path)
+        assert len(written) == 10
+        pandas.testing.assert_frame_equal(
+            written.drop(columns="Time stamp"), frame.drop(columns="Time stamp")
+        )
+
+    def test_rows_before_an_aborted_run_are_flushed(self) -> None:
+        sink = _RecordingSink()
+        with pytest.raises(AssertionError):
+            simulate(
+                dataframe=synthetic_dataframe(60, inflow_m3_15min=20_000.0),
+                initial_water_volume_m3=Decimal("10000"),
+                verbose=False,
+                sink=sink,
+                batch_size=4,
+            )
+
+        assert sink.batch_sizes
+        assert all(size <= 4 for size in sink.batch_sizes)
+
+    def test_parquet_keeps_typed_columns(self, tmp_path: Path) -> None:
+        pytest.importorskip("pyarrow")
+        file_path = str(tmp_path / "out.parquet")
+        sink = ParquetResultSink(file_path)
+        log = simulate(
+            dataframe=synthetic_dataframe(30),
+            initial_water_volume_m3=Decimal("10000"),
+            verbose=False,
+            sink=sink,
+            batch_size=8,
+        )
+        sink.close()
+
+        written = read_results(file_path)
+        pandas.testing.assert_frame_equal(written, log.to_dataframe())
+
+    def test_parquet_without_pyarrow_names_the_optional_install(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setitem(sys.modules, "pyarrow", None)
+
+        with pytest.raises(ImportError, match="requirements-parquet.txt"):
+            ParquetResultSink(str(tmp_path / "out.parquet"))
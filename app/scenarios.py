@@ -0,0 +1,194 @@
+import os
+from collections.abc import Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas
+from pydantic import BaseModel
+
+from app.controller_config import ControllerConfig
+from app.kpi import kpis_from_log
+from app.vectorized_simulation import SimulationArrays, run_vectorized
+
+
+"""
+Batch runner for many scenarios over one input dataset.
+
+The input columns are copied once into a shared memory block; worker
+processes map them as read-only numpy views instead of receiving a pickled
+copy per task. Each worker runs the vectorized engine and sends back only the
+KPIs of its scenario.
+"""
+
+_COLUMNS = (
+    ("timestamps_s", np.int64),
+    ("inflow_m3_15min", np.float64),
+    ("price_eur_cent_per_kwh", np.float64),
+    ("price_high_eur_cent_per_kwh", np.float64),
+)
+
+
+class ScenarioSpec(BaseModel):
+    name: str
+    inflow_scale: float = 1.0
+    initial_water_volume_m3: float | None = None
+    config: ControllerConfig = ControllerConfig()
+    # Simulate only this many leading steps, and stop early above this cost.
+    max_steps: int | None = None
+    cost_limit_eur: float | None = None
+
+
+class _SharedInput:
+    """The columns of a ``SimulationArrays`` laid out back to back in shared memory."""
+
+    def __init__(self, arrays: SimulationArrays) -> None:
+        self.length = len(arrays)
+        self.memory = shared_memory.SharedMemory(
+            create=True, size=max(8 * len(_COLUMNS) * self.length, 1)
+        )
+        for name, view in zip(
+            (name for name, _ in _COLUMNS), _views(self.memory, self.length)
+        ):
+            view[:] = getattr(arrays, name)
+
+    def close(self) -> None:
+        self.memory.close()
+        self.memory.unlink()
+
+
+def _views(memory: shared_memory.SharedMemory, length: int) -> list[np.ndarray]:
+    return [
+        np.ndarray((length,), dtype=dtype, buffer=memory.buf, offset=8 * length * index)
+        for index, (_, dtype) in enumerate(_COLUMNS)
+    ]
+
+
+# Set in each worker process by _attach_worker.
+_worker_memory: shared_memory.SharedMemory | None = None
+_worker_arrays: SimulationArrays | None = None
+_worker_initial_volume = 0.0
+
+
+def _attach_worker(memory_name: str, length: int, initial_volume: float) -> None:
+    global _worker_memory, _worker_arrays, _worker_initial_volume
+    # The parent owns the block; the workers must not unlink it on exit.
+    _worker_memory = shared_memory.SharedMemory(name=memory_name, track=False)
+    views = _views(_worker_memory, length)
+    for view in views:
+        view.flags.writeable = False
+    _worker_arrays = SimulationArrays(
+        **{name: view for (name, _), view in zip(_COLUMNS, views)}
+    )
+    _worker_initial_volume = initial_volume
+
+
+def _scenario_arrays(arrays: SimulationArrays, spec: ScenarioSpec) -> SimulationArrays:
+    if spec.inflow_scale == 1.0:
+        return arrays
+    return arrays.model_copy(
+        update={"inflow_m3_15min": arrays.inflow_m3_15min * spec.inflow_scale}
+    )
+
+
+def _run_scenario(
+    arrays: SimulationArrays, initial_volume: float, spec: ScenarioSpec
+) -> dict:
+    result = run_vectorized(
+        arrays=_scenario_arrays(arrays, spec),
+        initial_water_volume_m3=(
+            initial_volume
+            if spec.initial_water_volume_m3 is None
+            else spec.initial_water_volume_m3
+        ),
+        config=spec.config,
+        max_steps=spec.max_steps,
+        cost_limit_eur=spec.cost_limit_eur,
+    )
+    kpis = kpis_from_log(result.log, breached_safe_level=result.breached_safe_level)
+    return {
+        "scenario": spec.name,
+        **kpis.model_dump(),
+        "stopped_at_cost_limit": result.stopped_at_cost_limit,
+    }
+
+
+def _run_in_worker(spec: ScenarioSpec) -> dict:
+    assert _worker_arrays is not None, "worker was not attached to the shared input"
+    return _run_scenario(_worker_arrays, _worker_initial_volume, spec)
+
+
+class ScenarioPool:
+    """Worker processes attached to one shared copy of the input arrays.
+
+    With ``max_workers=1`` scenarios run in-process when submitted.
+    """
+
+    def __init__(
+        self,
+        arrays: SimulationArrays,
+        initial_water_volume_m3: float,
+        max_workers: int | None = None,
+    ) -> None:
+        self.arrays = arrays
+        self.initial_water_volume_m3 = initial_water_volume_m3
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._shared_input: _SharedInput | None = None
+        self._executor: ProcessPoolExecutor | None = None
+
+    def __enter__(self) -> "ScenarioPool":
+        if self.max_workers > 1:
+            self._shared_input = _SharedInput(self.arrays)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_attach_worker,
+                initargs=(
+                    self._shared_input.memory.name,
+                    self._shared_input.length,
+                    self.initial_water_volume_m3,
+                ),
+            )
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        try:
+            if self._executor is not None:
+                self._executor.shutdown()
+        finally:
+            if self._shared_input is not None:
+                self._shared_input.close()
+            self._executor = None
+            self._shared_input = None
+
+    def submit(self, spec: ScenarioSpec) -> "Future[dict]":
+        if self._executor is not None:
+            return self._executor.submit(_run_in_worker, spec)
+        future: Future[dict] = Future()
+        try:
+            future.set_result(
+                _run_scenario(self.arrays, self.initial_water_volume_m3, spec)
+            )
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+def run_scenarios(
+    arrays: SimulationArrays,
+    initial_water_volume_m3: float,
+    scenarios: Sequence[ScenarioSpec],
+    max_workers: int | None = None,
+) -> pandas.DataFrame:
+    """Run every scenario and return one KPI row per scenario, in input order.
+
+    ``max_workers=1`` runs in-process without a pool.
+    """
+    names = [spec.name for spec in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError("Scenario names must be unique")
+
+    with ScenarioPool(arrays, initial_water_volume_m3, max_workers) as pool:
+        futures = [pool.submit(spec) for spec in scenarios]
+        rows = [future.result() for future in futures]
+
+    return pandas.DataFrame(rows).set_index("scenario")
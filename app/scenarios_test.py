@@ -0,0 +1,43 @@
+import pandas
+import pytest
+
+from app.kpi import kpis_from_log
+from app.scenarios import ScenarioSpec, run_scenarios
+from app.vectorized_simulation import run_vectorized
+from app.testing import synthetic_arrays
+
+
+class TestScenarioRunner:
+    def test_pool_results_match_in_process_runs(self) -> None:
+        arrays = synthetic_arrays(inflow_swing_m3_15min=800)
+        scenarios = [
+            ScenarioSpec(name="base"),
+            ScenarioSpec(name="wet", inflow_scale=1.5),
+            ScenarioSpec(name="full", initial_water_volume_m3=60_000.0),
+        ]
+
+        pooled = run_scenarios(arrays, 10_000.0, scenarios, max_workers=2)
+        serial = run_scenarios(arrays, 10_000.0, scenarios, max_workers=1)
+
+        assert list(pooled.index) == ["base", "wet", "full"]
+        pandas.testing.assert_frame_equal(pooled, serial)
+
+        wet = run_vectorized(
+            arrays=arrays.model_copy(
+                update={"inflow_m3_15min": arrays.inflow_m3_15min * 1.5}
+            ),
+            initial_water_volume_m3=10_000.0,
+        )
+        assert pooled.loc["wet", "energy_kwh"] == pytest.approx(
+            kpis_from_log(wet.log).energy_kwh
+        )
+        assert pooled.loc["wet", "energy_kwh"] > pooled.loc["base", "energy_kwh"]
+
+    def test_duplicate_names_are_rejected(self) -> None:
+        with pytest.raises(ValueError):
+            run_scenarios(
+                synthetic_arrays(10, inflow_swing_m3_15min=800),
+                10_000.0,
+                [ScenarioSpec(name="a"), ScenarioSpec(name="a")],
+                max_workers=1,
+            )
@@ -1,17 +1,52 @@
-import csv
+from collections.abc import Callable, Mapping
 from datetime import datetime, timedelta
-from decimal import Decimal, ROUND_HALF_UP
-from itertools import product
+from decimal import Decimal
+import math
+import numpy as np
 import pandas
 from pydantic import BaseModel
 
 
-from app.pump import Pump, PumpType, PumpState, toggle_pump
+from app.checkpoint import SimulationCheckpoint, physics_fingerprint, state_path
+from app.controller_config import (
+    DEFAULT_CONTROLLER_CONFIG,
+    ControllerConfig,
+    fixed_controller_config,
+)
+from app.fixed_point import (
+    VOLUME_UNITS_PER_M3,
+    decimal_units,
+    price_units,
+    round_half_up_div,
+    round_to_increment,
+    volume_from_units,
+    volume_units,
+)
+from app.fast_forward import FastForward
+from app.geometry import ANALYTIC_GEOMETRY, TunnelGeometry
+from app.instrumentation import Instrumentation
+from app.mpc import MpcController
+from app.price_window import ForwardPriceWindow, IntegerPriceWindowStats
+from app.pump import (
+    PUMP_CAPACITY_UL_15MIN,
+    PumpRecord,
+    PumpState,
+    PumpStateRecord,
+    PumpType,
+    default_pumps,
+    toggle_pump,
+)
+from app.pump_curves import PumpCurveTable
+from app.pump_masks import ActivationMaskTable, mask_table_for
+from app.pump_selection import MASK_TABLE_MAX_PUMPS, select_activation
+from app.result_sink import ResultSink, open_result_sink
+from app.simulation_log import SimulationLog
 from app.util import format_duration_from_minutes
-from app.water_level import level_from_volume, V_MIN
+from app.water_level import V_MIN
 
 
-MIN_VOLUME_REMAINING = Decimal(str(V_MIN))
+# Volumes, flows and prices in the core are integers, see app.fixed_point.
+MIN_VOLUME_REMAINING_UL = decimal_units(Decimal(str(V_MIN)), VOLUME_UNITS_PER_M3)
 
 """
 TODO:
@@ -26,45 +61,105 @@ TODO:
 """
 
 
-def _round_to_increment(value: Decimal, increment: Decimal) -> Decimal:
-    if increment == 0:
-        return value
-    return (value / increment).quantize(
-        Decimal("1"), rounding=ROUND_HALF_UP
-    ) * increment
-
-
 class SimulationState(BaseModel):
-    outflow_m3_15min: Decimal
-    water_volume_m3: Decimal
+    outflow_ul_15min: int
+    water_volume_ul: int
     water_level_from_water_volume_m: float
     pump_state: PumpState
+    # Per-pump operating points when the step used head-dependent pump curves.
+    pump_power_kw: list[float] | None = None
+    pump_flow_m3_15min: list[float] | None = None
+    # The pumps could not run at full flow without emptying the tunnel.
+    outflow_clamped: bool = False
+
+
+class SimulationStateRecord:
+    """Slotted, unvalidated ``SimulationState`` returned by ``run_step``."""
+
+    __slots__ = (
+        "outflow_ul_15min",
+        "water_volume_ul",
+        "water_level_from_water_volume_m",
+        "pump_state",
+        "pump_power_kw",
+        "pump_flow_m3_15min",
+        "outflow_clamped",
+    )
+
+    def __init__(
+        self,
+        outflow_ul_15min: int,
+        water_volume_ul: int,
+        water_level_from_water_volume_m: float,
+        pump_state: PumpStateRecord,
+        pump_power_kw: list[float] | None = None,
+        pump_flow_m3_15min: list[float] | None = None,
+        outflow_clamped: bool = False,
+    ) -> None:
+        self.outflow_ul_15min = outflow_ul_15min
+        self.water_volume_ul = water_volume_ul
+        self.water_level_from_water_volume_m = water_level_from_water_volume_m
+        self.pump_state = pump_state
+        self.pump_power_kw = pump_power_kw
+        self.pump_flow_m3_15min = pump_flow_m3_15min
+        self.outflow_clamped = outflow_clamped
+
+    def to_model(self) -> SimulationState:
+        return SimulationState(
+            outflow_ul_15min=self.outflow_ul_15min,
+            water_volume_ul=self.water_volume_ul,
+            water_level_from_water_volume_m=self.water_level_from_water_volume_m,
+            pump_state=self.pump_state.to_model(),
+            pump_power_kw=self.pump_power_kw,
+            pump_flow_m3_15min=self.pump_flow_m3_15min,
+            outflow_clamped=self.outflow_clamped,
+        )
 
 
 def run_step(
-    inflow_to_tunnel_m3_15min: Decimal,
-    water_volume_m3: Decimal,
-    pump_state: PumpState,
-) -> SimulationState:
-    pump_outflow_m3_15min = pump_state.total_suction_m3_15min
-    max_removable = water_volume_m3 + inflow_to_tunnel_m3_15min - MIN_VOLUME_REMAINING
-    if max_removable < Decimal("0"):
-        max_removable = Decimal("0")
-    actual_outflow_m3_15min = min(pump_outflow_m3_15min, max_removable)
+    inflow_to_tunnel_ul_15min: int,
+    water_volume_ul: int,
+    pump_state: PumpStateRecord,
+    geometry: TunnelGeometry = ANALYTIC_GEOMETRY,
+    pump_curves: PumpCurveTable | None = None,
+) -> SimulationStateRecord:
+    pump_power_kw = pump_flow_m3_15min = None
+    if pump_curves is None:
+        pump_outflow_ul_15min = pump_state.total_suction_ul_15min
+    else:
+        # Flow and power of every pump at the head of the level before the step.
+        points = pump_curves.operating_points(
+            pump_curves.type_indices([pump.pump_type for pump in pump_state.pumps]),
+            geometry.level_from_volume(volume_from_units(water_volume_ul)),
+        ) * np.array([[pump.is_active] for pump in pump_state.pumps])
+        pump_outflow_ul_15min = int(volume_units(float(points[:, 0].sum())))
+        pump_flow_m3_15min = points[:, 0].tolist()
+        pump_power_kw = points[:, 1].tolist()
+    max_removable = (
+        water_volume_ul + inflow_to_tunnel_ul_15min - MIN_VOLUME_REMAINING_UL
+    )
+    if max_removable < 0:
+        max_removable = 0
+    actual_outflow_ul_15min = min(pump_outflow_ul_15min, max_removable)
 
     current_water_volume = (
-        water_volume_m3 + inflow_to_tunnel_m3_15min - actual_outflow_m3_15min
+        water_volume_ul + inflow_to_tunnel_ul_15min - actual_outflow_ul_15min
     )
-    if current_water_volume < MIN_VOLUME_REMAINING:
-        current_water_volume = MIN_VOLUME_REMAINING
+    if current_water_volume < MIN_VOLUME_REMAINING_UL:
+        current_water_volume = MIN_VOLUME_REMAINING_UL
 
     new_pump_state = pump_state
 
-    return SimulationState(
-        outflow_m3_15min=actual_outflow_m3_15min,
-        water_volume_m3=current_water_volume,
-        water_level_from_water_volume_m=level_from_volume(float(current_water_volume)),
+    return SimulationStateRecord(
+        outflow_ul_15min=actual_outflow_ul_15min,
+        water_volume_ul=current_water_volume,
+        water_level_from_water_volume_m=geometry.level_from_volume(
+            volume_from_units(current_water_volume)
+        ),
         pump_state=new_pump_state,
+        pump_power_kw=pump_power_kw,
+        pump_flow_m3_15min=pump_flow_m3_15min,
+        outflow_clamped=actual_outflow_ul_15min < pump_outflow_ul_15min,
     )
 
 
@@ -75,23 +170,12 @@ def water_level_from_water_volume(water_level_m: Decimal) -> Decimal:
     return water_level_m
 
 
-class LogEntry(BaseModel):
-    timestamp: datetime
-    water_volume_m3: Decimal
-    water_level_from_water_volume_m: float
-    inflow_to_tunnel_m3_15min: Decimal
-    outflow_m3_15min: Decimal
-    pump_state: PumpState
-    electricity_price_eur_cent_per_kwh: Decimal
-    electricity_price_eur_cent_per_kwh_high: Decimal
-
-
 def change_pump_state(
-    pump_state: PumpState,
+    pump_state: PumpStateRecord,
     water_volume_m3: Decimal,
     inflow_to_tunnel_m3_15min: Decimal,
     timestamp: datetime,
-) -> PumpState:
+) -> PumpStateRecord:
     upper_water_level_threshold = 100_000
     lower_water_level_threshold = 90_000
 
@@ -118,7 +202,7 @@ def change_pump_state(
 
         new_pump_state = [set_on if p.id == set_on.id else p for p in pump_state.pumps]
 
-        return PumpState(pumps=new_pump_state)
+        return PumpStateRecord(pumps=new_pump_state)
 
     if water_volume_m3 < lower_water_level_threshold:
         if sum(p.is_active for p in pump_state.pumps) == 1:
@@ -142,115 +226,82 @@ def change_pump_state(
             set_off if p.id == set_off.id else p for p in pump_state.pumps
         ]
 
-        return PumpState(pumps=new_pump_state)
+        return PumpStateRecord(pumps=new_pump_state)
 
     # Align total pump capacity with inflow to avoid over/under pumping when water level is stable.
-    current_capacity = pump_state.total_suction_m3_15min
-    baseline_diff = abs(inflow_to_tunnel_m3_15min - current_capacity)
-
-    pump_capacities = [
-        Decimal("750") if pump.pump_type == PumpType.LARGE else Decimal("375")
-        for pump in pump_state.pumps
-    ]
-    current_activation_mask = [pump.is_active for pump in pump_state.pumps]
-
-    best_mask = tuple(current_activation_mask)
-    best_diff = baseline_diff
-    best_toggle_count = 0
-    best_active_count = sum(current_activation_mask)
+    desired_activation = select_activation(
+        pumps=pump_state.pumps,
+        changeable=[True] * len(pump_state.pumps),
+        desired_capacity=decimal_units(inflow_to_tunnel_m3_15min, VOLUME_UNITS_PER_M3),
+        current_capacity=pump_state.total_suction_ul_15min,
+        allow_all_off=True,
+        use_smoothing_penalty=False,
+        units_per_m3=VOLUME_UNITS_PER_M3,
+    )
 
-    for activation_mask in product([False, True], repeat=len(pump_state.pumps)):
-        capacity = sum(
-            cap for cap, is_on in zip(pump_capacities, activation_mask) if is_on
-        )
-        diff = abs(inflow_to_tunnel_m3_15min - capacity)
-        toggle_count = sum(
-            1
-            for current_state, desired_state in zip(
-                current_activation_mask, activation_mask
-            )
-            if current_state != desired_state
-        )
-        active_count = sum(activation_mask)
-
-        choose_candidate = False
-        if diff < best_diff:
-            choose_candidate = True
-        elif diff == best_diff:
-            if toggle_count < best_toggle_count:
-                choose_candidate = True
-            elif toggle_count == best_toggle_count and active_count < best_active_count:
-                choose_candidate = True
-
-        if choose_candidate:
-            best_mask = activation_mask
-            best_diff = diff
-            best_toggle_count = toggle_count
-            best_active_count = active_count
-
-    if best_mask == tuple(current_activation_mask):
+    current_activation = [pump.is_active for pump in pump_state.pumps]
+    if desired_activation is None or desired_activation == current_activation:
         return pump_state
 
-    updated_pumps: list[Pump] = []
-    for pump, desired_active in zip(pump_state.pumps, best_mask):
+    updated_pumps: list[PumpRecord] = []
+    for pump, desired_active in zip(pump_state.pumps, desired_activation):
         if pump.is_active == desired_active:
             updated_pumps.append(pump)
         else:
             updated_pumps.append(toggle_pump(pump=pump, timestamp=timestamp))
 
-    return PumpState(pumps=updated_pumps)
+    return PumpStateRecord(pumps=updated_pumps)
 
 
 def change_pump_state_constant_flow(
-    pump_state: PumpState,
-    water_volume_m3: Decimal,
-    inflow_to_tunnel_m3_15min: Decimal,
+    pump_state: PumpStateRecord,
+    water_volume_ul: int,
+    water_level_m: float,
+    inflow_to_tunnel_ul_15min: int,
     timestamp: datetime,
-    current_price_eur_cent_per_kwh: Decimal,
-    future_prices_eur_cent_per_kwh: list[Decimal],
-) -> PumpState:
+    current_price_milli_cent_per_kwh: int,
+    future_price_stats: IntegerPriceWindowStats | None,
+    config: ControllerConfig = DEFAULT_CONTROLLER_CONFIG,
+) -> PumpStateRecord:
     """Balance pump usage for steady outflow while enforcing operational constraints and energy-cost awareness."""
 
     # Operational guardrails and smoothing factors for pump scheduling decisions.
-    min_runtime = timedelta(hours=2)
-    rain_threshold = Decimal("2000")
-    flow_increment = Decimal("375")
-    smoothing_alpha = Decimal("0.2")
+    fixed_config = fixed_controller_config(config)
+    min_runtime = fixed_config.min_runtime
+    rain_threshold = fixed_config.rain_threshold_ul_15min
+    flow_increment = fixed_config.flow_increment_ul_15min
 
     # Determine individual pump capacities and global bounds for any activation mask.
     pump_capacities = [
-        Decimal("750") if pump.pump_type == PumpType.LARGE else flow_increment
-        for pump in pump_state.pumps
+        PUMP_CAPACITY_UL_15MIN[pump.pump_type] for pump in pump_state.pumps
     ]
-    max_capacity = sum(pump_capacities, Decimal("0"))
+    max_capacity = sum(pump_capacities)
     min_non_zero_capacity = min(pump_capacities)
 
     # Use forecast data when available to bias behaviour toward cheaper future prices.
-    sorted_prices = (
-        sorted(future_prices_eur_cent_per_kwh)
-        if future_prices_eur_cent_per_kwh
-        else [current_price_eur_cent_per_kwh]
-    )
-    has_price_forecast = bool(future_prices_eur_cent_per_kwh)
-
-    def _quantile(sorted_values: list[Decimal], fraction: float) -> Decimal:
-        if not sorted_values:
-            return current_price_eur_cent_per_kwh
-        if len(sorted_values) == 1:
-            return sorted_values[0]
-        index = int((len(sorted_values) - 1) * fraction)
-        return sorted_values[index]
+    current_price = current_price_milli_cent_per_kwh
+    has_price_forecast = future_price_stats is not None
+    if future_price_stats is None:
+        future_price_stats = IntegerPriceWindowStats(
+            min_price=current_price,
+            q25_price=current_price,
+            q75_price=current_price,
+            price_sum=current_price,
+            count=1,
+        )
 
     # Snapshot key price statistics that inform the pump biasing rules below.
-    future_min_price = sorted_prices[0]
-    future_avg_price = sum(sorted_prices, Decimal("0")) / Decimal(len(sorted_prices))
-    future_q25_price = _quantile(sorted_prices, 0.25)
-    future_q75_price = _quantile(sorted_prices, 0.75)
-
-    # Convert current water volume to a level and derive situational flags.
-    level_m = Decimal(str(level_from_volume(float(water_volume_m3))))
-    low_inflow = inflow_to_tunnel_m3_15min <= rain_threshold
-    level_meets_drain_target = level_m <= Decimal("0.5")
+    # The mean is kept as sum / count and compared by cross-multiplying.
+    future_min_price = future_price_stats.min_price
+    future_price_sum = future_price_stats.price_sum
+    future_price_count = future_price_stats.count
+    future_q25_price = future_price_stats.q25_price
+    future_q75_price = future_price_stats.q75_price
+
+    # Derive situational flags from the current level.
+    level_m = water_level_m
+    low_inflow = inflow_to_tunnel_ul_15min <= rain_threshold
+    level_meets_drain_target = level_m <= fixed_config.drain_target_level_m
 
     # Track daily draining obligations to guarantee a full flush every 24h.
     last_drain_timestamp = pump_state.last_daily_drain_timestamp
@@ -262,61 +313,64 @@ def change_pump_state_constant_flow(
 
     drain_due = (
         last_drain_timestamp is None
-        or timestamp - last_drain_timestamp >= timedelta(hours=24)
+        or timestamp - last_drain_timestamp >= fixed_config.drain_interval
     )
 
     if drain_due and not level_meets_drain_target:
         pending_drain = True
 
     # Exponentially smooth inflow to create a stable outflow target.
-    previous_avg = pump_state.average_inflow_m3_15min
+    previous_avg = pump_state.average_inflow_ul_15min
     if previous_avg is None:
-        updated_average = inflow_to_tunnel_m3_15min
+        updated_average = inflow_to_tunnel_ul_15min
     else:
-        updated_average = (
-            previous_avg * (Decimal("1") - smoothing_alpha)
-            + inflow_to_tunnel_m3_15min * smoothing_alpha
+        alpha_numerator = fixed_config.smoothing_numerator
+        alpha_denominator = fixed_config.smoothing_denominator
+        updated_average = round_half_up_div(
+            previous_avg * (alpha_denominator - alpha_numerator)
+            + inflow_to_tunnel_ul_15min * alpha_numerator,
+            alpha_denominator,
         )
 
     # Start from the most recent target or current capacity to avoid abrupt jumps.
-    current_target = pump_state.target_outflow_m3_15min
-    if current_target is None or current_target == Decimal("0"):
-        current_target = pump_state.total_suction_m3_15min
-    if current_target == Decimal("0"):
+    current_target = pump_state.target_outflow_ul_15min
+    if current_target is None or current_target == 0:
+        current_target = pump_state.total_suction_ul_15min
+    if current_target == 0:
         current_target = min_non_zero_capacity
 
     # Fulfil pending drains aggressively; otherwise bias toward steady, cost-aware outflow.
     if pending_drain and low_inflow and not level_meets_drain_target:
         desired_target = max_capacity
     else:
-        baseline_target = _round_to_increment(updated_average, flow_increment)
+        baseline_target = round_to_increment(updated_average, flow_increment)
         baseline_target = max(min_non_zero_capacity, min(baseline_target, max_capacity))
         price_bias_steps = 0
         if not pending_drain and has_price_forecast:
             # Shift the baseline target when prices are favourable or expensive.
-            if current_price_eur_cent_per_kwh <= future_q25_price:
+            if current_price <= future_q25_price:
                 price_bias_steps = 1
             elif (
-                current_price_eur_cent_per_kwh >= future_q75_price
+                current_price >= future_q75_price
                 and low_inflow
-                and level_m < Decimal("7.0")
+                and level_m < fixed_config.expensive_price_max_level_m
             ):
                 price_bias_steps = -1
             elif (
-                current_price_eur_cent_per_kwh > future_avg_price
-                and current_price_eur_cent_per_kwh > future_min_price
+                current_price * future_price_count > future_price_sum
+                and current_price > future_min_price
                 and low_inflow
-                and level_m < Decimal("6.5")
+                and level_m < fixed_config.above_mean_price_max_level_m
             ):
                 price_bias_steps = -1
             elif (
-                current_price_eur_cent_per_kwh <= future_avg_price
-                and current_price_eur_cent_per_kwh <= future_min_price
+                current_price * future_price_count <= future_price_sum
+                and current_price <= future_min_price
             ):
                 price_bias_steps = 1
 
         if price_bias_steps:
-            baseline_target += Decimal(price_bias_steps) * flow_increment
+            baseline_target += price_bias_steps * flow_increment
             baseline_target = max(
                 min_non_zero_capacity, min(baseline_target, max_capacity)
             )
@@ -332,247 +386,595 @@ def change_pump_state_constant_flow(
         desired_target = max(min_non_zero_capacity, min(desired_target, max_capacity))
 
     max_safe_outflow = (
-        water_volume_m3 + inflow_to_tunnel_m3_15min - MIN_VOLUME_REMAINING
+        water_volume_ul + inflow_to_tunnel_ul_15min - MIN_VOLUME_REMAINING_UL
     )
-    if max_safe_outflow < Decimal("0"):
-        max_safe_outflow = Decimal("0")
+    if max_safe_outflow < 0:
+        max_safe_outflow = 0
     if max_safe_outflow < min_non_zero_capacity:
         max_safe_outflow = min_non_zero_capacity
     desired_target = min(desired_target, max_safe_outflow)
 
     # Reference configuration for evaluating candidate pump activation masks.
-    current_mask = [pump.is_active for pump in pump_state.pumps]
-    current_capacity = pump_state.total_suction_m3_15min
+    current_activation = [pump.is_active for pump in pump_state.pumps]
+    current_capacity = pump_state.total_suction_ul_15min
 
-    def can_turn_on(pump: Pump) -> bool:
-        if not pump.activation_times:
+    def can_turn_on(pump: PumpRecord) -> bool:
+        last_stop_time = pump.last_stop_time
+        if last_stop_time is None:
             return True
-        last_cycle = pump.activation_times[-1]
-        return timestamp - last_cycle.end_time >= min_runtime
+        return timestamp - last_stop_time >= min_runtime
 
-    def can_turn_off(pump: Pump) -> bool:
+    def can_turn_off(pump: PumpRecord) -> bool:
         if pump.current_run_time_start is None:
             return True
         return timestamp - pump.current_run_time_start >= min_runtime
 
-    best_mask = tuple(current_mask)
-    best_score: tuple[Decimal, int, Decimal, int] | None = None
-
-    # Exhaustively search feasible masks, preferring those closest to target with minimal churn.
-    for activation_mask in product([False, True], repeat=len(pump_state.pumps)):
-        active_count = sum(activation_mask)
-        if active_count == 0:
-            continue
-
-        toggle_count = 0
-        allowed = True
-        for pump, current, desired in zip(
-            pump_state.pumps, current_mask, activation_mask
-        ):
-            if current == desired:
-                continue
-            if desired and not can_turn_on(pump):
-                allowed = False
-                break
-            if not desired and not can_turn_off(pump):
-                allowed = False
-                break
-            toggle_count += 1
-
-        if not allowed:
-            continue
-
-        capacity = sum(
-            cap for cap, is_on in zip(pump_capacities, activation_mask) if is_on
-        )
-        diff = abs(capacity - desired_target)
-        smoothing_penalty = abs(capacity - current_capacity)
-        score = (diff, toggle_count, smoothing_penalty, active_count)
-
-        if best_score is None or score < best_score:
-            best_score = score
-            best_mask = activation_mask
+    # Feasible activation closest to target with minimal churn; only pumps that
+    # satisfy the minimum runtime rule may change state.
+    desired_activation = select_activation(
+        pumps=pump_state.pumps,
+        changeable=[
+            can_turn_off(pump) if pump.is_active else can_turn_on(pump)
+            for pump in pump_state.pumps
+        ],
+        desired_capacity=desired_target,
+        current_capacity=current_capacity,
+        units_per_m3=VOLUME_UNITS_PER_M3,
+    )
+    if desired_activation is None:
+        desired_activation = current_activation
 
-    selected_pumps: list[Pump]
-    if best_mask == tuple(current_mask):
-        selected_pumps = list(pump_state.pumps)
+    selected_pumps: list[PumpRecord]
+    if desired_activation == current_activation:
+        # Records are never mutated, so the unchanged list is shared.
+        selected_pumps = pump_state.pumps
     else:
         # Apply activation changes while recording run histories.
         selected_pumps = []
-        for pump, desired in zip(pump_state.pumps, best_mask):
+        for pump, desired in zip(pump_state.pumps, desired_activation):
             if pump.is_active == desired:
                 selected_pumps.append(pump)
             else:
                 selected_pumps.append(toggle_pump(pump=pump, timestamp=timestamp))
 
-    raw_capacity = sum(cap for cap, is_on in zip(pump_capacities, best_mask) if is_on)
+    raw_capacity = sum(
+        cap for cap, is_on in zip(pump_capacities, desired_activation) if is_on
+    )
     selected_capacity = min(raw_capacity, max_safe_outflow)
 
     # Return updated pump state with refreshed target and inflow tracking.
-    return PumpState(
+    return PumpStateRecord(
         pumps=selected_pumps,
-        target_outflow_m3_15min=selected_capacity,
-        average_inflow_m3_15min=updated_average,
+        target_outflow_ul_15min=selected_capacity,
+        average_inflow_ul_15min=updated_average,
         last_daily_drain_timestamp=last_drain_timestamp,
         pending_daily_drain=pending_drain,
     )
 
 
-def run(dataframe: pandas.DataFrame, initial_water_volume_m3: Decimal) -> None:
+def simulate(
+    dataframe: pandas.DataFrame,
+    initial_water_volume_m3: Decimal,
+    verbose: bool = True,
+    sink: ResultSink | None = None,
+    batch_size: int = 96,
+    config: ControllerConfig = DEFAULT_CONTROLLER_CONFIG,
+    mpc: MpcController | None = None,
+    geometry: TunnelGeometry = ANALYTIC_GEOMETRY,
+    pump_curves: PumpCurveTable | None = None,
+    instrumentation: Instrumentation | None = None,
+    fast_forward: bool = False,
+    initial_pump_state: PumpStateRecord | None = None,
+    stop_row: int | None = None,
+    checkpoint_every: int | None = None,
+    on_checkpoint: Callable[[SimulationCheckpoint], None] | None = None,
+) -> SimulationLog:
+    """Step through ``dataframe`` and log every step.
+
+    Row 0 is the initial state: ``initial_water_volume_m3`` and
+    ``initial_pump_state`` (all pumps off by default). Rows from ``stop_row``
+    on are not simulated and only feed the price look-ahead. The state after
+    the last simulated row is left on the log (``final_water_volume_ul``,
+    ``final_pump_state``) to continue from. A run given an
+    ``initial_pump_state`` continues an earlier one whose output already
+    holds row 0, so row 0 is logged but not written to ``sink``.
+
+    ``on_checkpoint`` receives a ``SimulationCheckpoint`` after every
+    ``checkpoint_every``-th row and, even if the run aborts, one of the state
+    after the last logged row.
+
+    With ``instrumentation`` the time of every phase of the loop is recorded
+    and mask evaluations, pump toggles and outflow clamps are counted.
+
+    With ``fast_forward`` stretches of rows in which the constant flow
+    controller keeps its pumps are advanced in bulk (see
+    ``app.fast_forward``) and the controller only runs at the rows in
+    between. The log is identical to that of a step-by-step run.
+    """
+    if fast_forward and (mpc is not None or pump_curves is not None):
+        raise ValueError(
+            "Fast-forward needs the constant flow controller without pump curves"
+        )
+
+    if instrumentation is not None:
+        instrumentation.start()
+
     # TODO:
     # Does the initial state assume that outflow starts from zero or from an initial value?
-    utcnow = datetime.now()
-    outflow = Decimal(0)
-    water_volume_m3 = initial_water_volume_m3
-
-    pump_state = PumpState(
-        pumps=[
-            Pump(id="1.1", pump_type=PumpType.SMALL, current_run_time_start=None),
-            Pump(id="2.1", pump_type=PumpType.SMALL, current_run_time_start=None),
-            Pump(id="2.2", pump_type=PumpType.LARGE, current_run_time_start=None),
-            Pump(id="2.3", pump_type=PumpType.LARGE, current_run_time_start=None),
-            Pump(id="2.4", pump_type=PumpType.LARGE, current_run_time_start=None),
-            Pump(id="1.2", pump_type=PumpType.LARGE, current_run_time_start=None),
-            Pump(id="1.3", pump_type=PumpType.LARGE, current_run_time_start=None),
-            Pump(id="1.4", pump_type=PumpType.LARGE, current_run_time_start=None),
-        ]
+    water_volume_ul = decimal_units(initial_water_volume_m3, VOLUME_UNITS_PER_M3)
+    water_level_m = geometry.level_from_volume(volume_from_units(water_volume_ul))
+
+    pump_state = (
+        PumpStateRecord.from_model(PumpState(pumps=default_pumps()))
+        if initial_pump_state is None
+        else initial_pump_state
     )
+    stop_row = len(dataframe) if stop_row is None else min(stop_row, len(dataframe))
 
-    logs: list[LogEntry] = [
-        LogEntry(
-            timestamp=dataframe.iloc[0]["timestamp"],
-            water_volume_m3=water_volume_m3,
-            inflow_to_tunnel_m3_15min=Decimal(
-                dataframe.iloc[0]["inflow_to_tunnel_m3_per_15min"]
-            ),
-            outflow_m3_15min=outflow,
-            water_level_from_water_volume_m=level_from_volume(float(water_volume_m3)),
-            pump_state=pump_state,
-            electricity_price_eur_cent_per_kwh=Decimal(
-                dataframe.iloc[0]["electricity_price_eur_cent_per_kwh"]
-            ),
-            electricity_price_eur_cent_per_kwh_high=Decimal(
-                dataframe.iloc[0]["electricity_price_eur_cent_per_kwh_high"]
-            ),
+    # Columns are converted once: integers for the core, floats for the log.
+    timestamps = [
+        timestamp.to_pydatetime() for timestamp in dataframe["timestamp"].tolist()
+    ]
+    inflows_m3_15min = dataframe["inflow_to_tunnel_m3_per_15min"].to_numpy(float)
+    inflows_ul_15min = volume_units(inflows_m3_15min).tolist()
+    prices = dataframe["electricity_price_eur_cent_per_kwh"].to_numpy(float)
+    prices_high = dataframe["electricity_price_eur_cent_per_kwh_high"].to_numpy(float)
+    price_milli_cents = [
+        None if math.isnan(price) else units
+        for price, units in zip(
+            prices.tolist(), price_units(np.nan_to_num(prices)).tolist()
         )
     ]
+    inflow_column, price_column, price_high_column = (
+        inflows_m3_15min,
+        prices,
+        prices_high,
+    )
+    inflows_m3_15min = inflows_m3_15min.tolist()
+    prices = prices.tolist()
+    prices_high = prices_high.tolist()
+
+    log = SimulationLog.for_pumps(
+        pump_state.pumps,
+        capacity=stop_row,
+        operating_points=pump_curves is not None,
+    )
+    no_pumps_running = [0.0] * len(pump_state.pumps)
+    log.append(
+        timestamp=dataframe["timestamp"].iloc[0],
+        water_volume_m3=volume_from_units(water_volume_ul),
+        water_level_m=water_level_m,
+        inflow_m3_15min=inflows_m3_15min[0],
+        outflow_m3_15min=0.0,
+        activation_mask=log.mask_of(pump_state.pumps),
+        electricity_price_eur_cent_per_kwh=prices[0],
+        electricity_price_eur_cent_per_kwh_high=prices_high[0],
+        pump_power_kw=no_pumps_running,
+        pump_flow_m3_15min=no_pumps_running,
+    )
 
-    round_number = 0
+    # Look-ahead price statistics for every row, built once for the whole run.
+    price_window = ForwardPriceWindow(
+        timestamps=timestamps,
+        prices=price_milli_cents,
+        horizon=timedelta(hours=24),
+    )
 
-    for _, row in dataframe[1:].iterrows():
-        altered_state = run_step(
-            inflow_to_tunnel_m3_15min=Decimal(
-                row["inflow_to_tunnel_m3_per_15min"]
-            ),  # pyright: ignore
-            water_volume_m3=water_volume_m3,
-            pump_state=pump_state,
+    quiet_rows = None
+    if fast_forward:
+        quiet_rows = FastForward(
+            timestamps=timestamps,
+            inflows_ul_15min=inflows_ul_15min,
+            price_milli_cents=price_milli_cents,
+            pump_types=[pump.pump_type for pump in pump_state.pumps],
+            geometry=geometry,
+            config=config,
+            initial_average_inflow_ul_15min=pump_state.average_inflow_ul_15min,
         )
 
-        assert (
-            altered_state.water_level_from_water_volume_m < 8.00
-        ), "Water level exceeded safe limit!"
-
-        current_price_normal = Decimal(str(row["electricity_price_eur_cent_per_kwh"]))
-        current_price_high = Decimal(
-            str(row["electricity_price_eur_cent_per_kwh_high"])
+    # Rows already handed to the sink; batches go out while the loop runs and
+    # whatever is left is flushed even if the run aborts.
+    written_rows = 0 if initial_pump_state is None else 1
+
+    def flush(min_rows: int) -> None:
+        nonlocal written_rows
+        if sink is None or len(log) - written_rows < max(min_rows, 1):
+            return
+        sink.write_batch(log.to_dataframe(start=written_rows, stop=len(log)))
+        written_rows = len(log)
+
+    # ``state_row`` is the row the loop state follows; it is checkpointed last.
+    state_row = checkpointed_row = 0
+    fingerprint = None
+
+    def checkpoint(row_index: int) -> None:
+        nonlocal checkpointed_row, fingerprint
+        if on_checkpoint is None or row_index == checkpointed_row:
+            return
+        # The output must hold every row the checkpoint has passed.
+        flush(min_rows=1)
+        if fingerprint is None:
+            fingerprint = physics_fingerprint(geometry, pump_curves)
+        on_checkpoint(
+            SimulationCheckpoint.capture(
+                timestamps[row_index],
+                water_volume_ul,
+                pump_state,
+                config,
+                fingerprint,
+            )
         )
+        checkpointed_row = row_index
+
+    # Masks are only counted on fleets small enough for the mask tables;
+    # larger fleets take the grouped search and never build a 2^N table.
+    mask_table: ActivationMaskTable | None = None
+    masks_before = 0
+    previous_pumps = pump_state.pumps
+    if instrumentation is not None:
+        if len(pump_state.pumps) <= MASK_TABLE_MAX_PUMPS:
+            mask_table = mask_table_for(
+                tuple(pump.pump_type for pump in pump_state.pumps), VOLUME_UNITS_PER_M3
+            )
+        instrumentation.lap("prepare")
 
-        logs.append(
-            LogEntry(
-                timestamp=row["timestamp"],
-                water_volume_m3=altered_state.water_volume_m3,
-                outflow_m3_15min=altered_state.outflow_m3_15min,
-                water_level_from_water_volume_m=altered_state.water_level_from_water_volume_m,
-                inflow_to_tunnel_m3_15min=Decimal(row["inflow_to_tunnel_m3_per_15min"]),
-                pump_state=altered_state.pump_state,
-                electricity_price_eur_cent_per_kwh=current_price_normal,
-                electricity_price_eur_cent_per_kwh_high=current_price_high,
+    try:
+        round_number = 0
+        # Rows up to ``resume_row`` were fast-forwarded; ``event_row`` is the
+        # row that ended the last quiet stretch and needs the controller.
+        resume_row = event_row = 1
+
+        for row_index in range(1, stop_row):
+            if row_index < resume_row:
+                continue
+            if quiet_rows is not None and row_index != event_row:
+                stretch_stop = stop_row
+                if checkpoint_every and on_checkpoint is not None:
+                    # End the stretch at the next checkpoint row.
+                    checkpoints = -(-row_index // checkpoint_every)
+                    stretch_stop = min(stop_row, checkpoints * checkpoint_every + 1)
+                stretch = quiet_rows.advance(
+                    row_index, water_volume_ul, water_level_m, pump_state, stretch_stop
+                )
+                if stretch is not None:
+                    rows = slice(stretch.start, stretch.stop)
+                    capacity_ul_15min = pump_state.total_suction_ul_15min
+                    log.extend(
+                        timestamps_ns=quiet_rows.timestamps_ns[rows],
+                        water_volume_m3=np.array(stretch.water_volume_ul)
+                        / VOLUME_UNITS_PER_M3,
+                        water_level_m=stretch.water_level_m,
+                        inflow_m3_15min=inflow_column[rows],
+                        outflow_m3_15min=volume_from_units(capacity_ul_15min),
+                        activation_masks=log.mask_of(pump_state.pumps),
+                        electricity_price_eur_cent_per_kwh=price_column[rows],
+                        electricity_price_eur_cent_per_kwh_high=price_high_column[rows],
+                    )
+                    flush(min_rows=batch_size)
+                    pump_state = stretch.pump_state
+                    water_volume_ul = stretch.water_volume_ul[-1]
+                    water_level_m = stretch.water_level_m[-1]
+                    round_number += stretch.stop - stretch.start
+                    resume_row = event_row = stretch.stop
+                    state_row = stretch.stop - 1
+                    if instrumentation is not None:
+                        instrumentation.lap("fast_forward")
+                        instrumentation.count(
+                            "fast_forward_rows", stretch.stop - stretch.start
+                        )
+                    if verbose:
+                        for row, level in zip(
+                            range(stretch.start, stretch.stop), stretch.water_level_m
+                        ):
+                            print(f"inflow m3 15min {inflows_m3_15min[row]}")
+                            print(
+                                "outflow m3 15min "
+                                f"{volume_from_units(capacity_ul_15min)}"
+                            )
+                            print(f"water_level_m  {level}")
+                            print()
+                    if checkpoint_every and state_row % checkpoint_every == 0:
+                        checkpoint(state_row)
+                    continue
+                if instrumentation is not None:
+                    instrumentation.lap("fast_forward")
+
+            inflow_ul_15min = inflows_ul_15min[row_index]
+            altered_state = run_step(
+                inflow_to_tunnel_ul_15min=inflow_ul_15min,
+                water_volume_ul=water_volume_ul,
+                pump_state=pump_state,
+                geometry=geometry,
+                pump_curves=pump_curves,
+            )
+            if instrumentation is not None:
+                instrumentation.lap("run_step")
+                instrumentation.count("outflow_clamps", altered_state.outflow_clamped)
+
+            assert (
+                altered_state.water_level_from_water_volume_m < 8.00
+            ), "Water level exceeded safe limit!"
+
+            dt = timestamps[row_index]
+            log.append(
+                timestamp=dt,
+                water_volume_m3=volume_from_units(altered_state.water_volume_ul),
+                water_level_m=altered_state.water_level_from_water_volume_m,
+                inflow_m3_15min=inflows_m3_15min[row_index],
+                outflow_m3_15min=volume_from_units(altered_state.outflow_ul_15min),
+                activation_mask=log.mask_of(altered_state.pump_state.pumps),
+                electricity_price_eur_cent_per_kwh=prices[row_index],
+                electricity_price_eur_cent_per_kwh_high=prices_high[row_index],
+                pump_power_kw=altered_state.pump_power_kw,
+                pump_flow_m3_15min=altered_state.pump_flow_m3_15min,
             )
+            if instrumentation is not None:
+                instrumentation.lap("log")
+            flush(min_rows=batch_size)
+            if instrumentation is not None:
+                instrumentation.lap("sink")
+                if mask_table is not None:
+                    masks_before = mask_table.masks_evaluated
+                previous_pumps = pump_state.pumps
+
+            if mpc is not None:
+                pump_state = mpc.decide(
+                    step_index=row_index,
+                    water_volume_m3=volume_from_units(altered_state.water_volume_ul),
+                    pump_state=pump_state,
+                    timestamp=dt,
+                )
+            else:
+                future_price_stats = (
+                    price_window.integer_stats(row_index)
+                    if quiet_rows is None
+                    else quiet_rows.price_stats(row_index)
+                )
+                if instrumentation is not None:
+                    instrumentation.lap("price_window")
+                pump_state = change_pump_state_constant_flow(
+                    pump_state=pump_state,
+                    water_volume_ul=water_volume_ul,
+                    water_level_m=water_level_m,
+                    inflow_to_tunnel_ul_15min=inflow_ul_15min,
+                    timestamp=dt,
+                    current_price_milli_cent_per_kwh=price_milli_cents[row_index],
+                    future_price_stats=future_price_stats,
+                    config=config,
+                )
+            if instrumentation is not None:
+                instrumentation.lap("controller")
+                if mask_table is not None:
+                    instrumentation.count(
+                        "masks_evaluated", mask_table.masks_evaluated - masks_before
+                    )
+                instrumentation.count(
+                    "pump_toggles",
+                    sum(
+                        before.is_active != after.is_active
+                        for before, after in zip(previous_pumps, pump_state.pumps)
+                    ),
+                )
+
+            round_number += 1
+
+            water_volume_ul = altered_state.water_volume_ul
+            water_level_m = altered_state.water_level_from_water_volume_m
+            state_row = row_index
+
+            if water_volume_ul > 225000 * VOLUME_UNITS_PER_M3:
+                print("shitfuckshit")
+                break
+
+            if checkpoint_every and row_index % checkpoint_every == 0:
+                checkpoint(row_index)
+
+            if not verbose:
+                continue
+
+            # print(round_number)
+            print(f"inflow m3 15min {inflows_m3_15min[row_index]}")
+            print(
+                f"outflow m3 15min {volume_from_units(altered_state.outflow_ul_15min)}"
+            )
+            print(f"water_level_m  {altered_state.water_level_from_water_volume_m}")
+
+            # for pump in altered_state.pump_state.pumps:
+            #     print(
+            #         f"ID: {pump.id}; {pump.pump_type}; Active: {pump.is_active}; Total time on: {format_duration_from_minutes(pump.cumulative_time_minutes)}"
+            #     )
+
+            print()
+            if instrumentation is not None:
+                instrumentation.lap("print")
+    finally:
+        log.final_water_volume_ul = water_volume_ul
+        log.final_pump_state = pump_state
+        flush(min_rows=1)
+        checkpoint(state_row)
+        if instrumentation is not None:
+            instrumentation.lap("sink")
+            instrumentation.stop()
+
+    return log
+
+
+def resume(
+    dataframe: pandas.DataFrame,
+    checkpoint: SimulationCheckpoint,
+    verbose: bool = False,
+    sink: ResultSink | None = None,
+    config: ControllerConfig | None = None,
+    geometry: TunnelGeometry = ANALYTIC_GEOMETRY,
+    pump_curves: PumpCurveTable | None = None,
+    instrumentation: Instrumentation | None = None,
+    fast_forward: bool = False,
+    checkpoint_every: int | None = None,
+    on_checkpoint: Callable[[SimulationCheckpoint], None] | None = None,
+) -> SimulationLog:
+    """Continue a run from ``checkpoint`` over the rows of ``dataframe`` after it.
+
+    Rows up to the checkpoint are skipped, so ``dataframe`` may be the whole
+    input or only the rows that arrived since. The returned log (and
+    ``sink``) starts with the row after the checkpoint, so it matches the
+    tail of the uninterrupted run.
+
+    The run continues with the checkpoint's controller config unless
+    ``config`` is given. ``geometry`` and ``pump_curves`` must be those of
+    the checkpointed run; otherwise a ValueError is raised.
+    """
+    if physics_fingerprint(geometry, pump_curves) != checkpoint.physics_fingerprint:
+        raise ValueError(
+            "The checkpoint was taken with another tunnel geometry or pump curves"
         )
-        timestamp: pandas.Timestamp = row["timestamp"]  # pyright: ignore
-        dt = timestamp.to_pydatetime()
-        window_end = timestamp + pandas.Timedelta(hours=24)
-        future_mask = (dataframe["timestamp"] > timestamp) & (
-            dataframe["timestamp"] <= window_end
+    config = checkpoint.config if config is None else config
+    checkpoint_time = pandas.Timestamp(checkpoint.timestamp)
+    later = dataframe[dataframe["timestamp"] > checkpoint_time]
+    if later.empty:
+        pump_state = checkpoint.pump_state()
+        log = SimulationLog.for_pumps(pump_state.pumps, capacity=0)
+        log.final_water_volume_ul = checkpoint.water_volume_ul
+        log.final_pump_state = pump_state
+        return log
+    # Row 0 stands for the checkpoint's row; only its time stamp is read.
+    rows = later.iloc[np.r_[0, : len(later)]].reset_index(drop=True)
+    rows.loc[0, "timestamp"] = checkpoint_time
+    log = simulate(
+        rows,
+        Decimal(checkpoint.water_volume_ul) / VOLUME_UNITS_PER_M3,
+        verbose=verbose,
+        sink=sink,
+        config=config,
+        geometry=geometry,
+        pump_curves=pump_curves,
+        instrumentation=instrumentation,
+        fast_forward=fast_forward,
+        initial_pump_state=checkpoint.pump_state(),
+        checkpoint_every=checkpoint_every,
+        on_checkpoint=on_checkpoint,
+    )
+    return log.rows(1)
+
+
+def fork(
+    dataframe: pandas.DataFrame,
+    checkpoint: SimulationCheckpoint,
+    variants: Mapping[str, ControllerConfig],
+    geometry: TunnelGeometry = ANALYTIC_GEOMETRY,
+    fast_forward: bool = False,
+) -> dict[str, SimulationLog]:
+    """The rows after ``checkpoint`` re-simulated with every controller config of
+    ``variants``, by name; the shared history before it is not simulated again.
+    """
+    return {
+        name: resume(
+            dataframe,
+            checkpoint,
+            config=config,
+            geometry=geometry,
+            fast_forward=fast_forward,
         )
-        future_prices_series = dataframe.loc[
-            future_mask, "electricity_price_eur_cent_per_kwh"
-        ].dropna()
-        future_prices_normal = [
-            Decimal(str(value)) for value in future_prices_series.tolist()
-        ]
-
-        pump_state = change_pump_state_constant_flow(
-            pump_state=pump_state,
-            water_volume_m3=water_volume_m3,
-            inflow_to_tunnel_m3_15min=Decimal(row["inflow_to_tunnel_m3_per_15min"]),
-            timestamp=dt,
-            current_price_eur_cent_per_kwh=current_price_normal,
-            future_prices_eur_cent_per_kwh=future_prices_normal,
+        for name, config in variants.items()
+    }
+
+
+def run(
+    dataframe: pandas.DataFrame,
+    initial_water_volume_m3: Decimal,
+    output_path: str | None = None,
+    controller: str = "constant_flow",
+    horizon_hours: int = 12,
+    geometry: TunnelGeometry = ANALYTIC_GEOMETRY,
+    pump_curves: PumpCurveTable | None = None,
+    instrumentation: Instrumentation | None = None,
+    fast_forward: bool = False,
+    checkpoint_path: str | None = None,
+    checkpoint_every: int = 96,
+    resume_path: str | None = None,
+    append: bool = False,
+) -> None:
+    """Simulate and stream the results to ``output_path`` (``.csv`` or ``.parquet``).
+
+    ``controller`` is ``"constant_flow"`` or ``"mpc"``; the MPC controller
+    plans ``horizon_hours`` ahead and its per-step latency is printed. The
+    report of ``instrumentation``, if given, is printed at the end.
+    ``fast_forward`` is passed on to ``simulate``.
+
+    The state after the last row is kept next to the output, in
+    ``checkpoint.state_path(output_path)``, when the run ends or aborts. With
+    ``checkpoint_path`` it goes there instead and is also rewritten every
+    ``checkpoint_every`` rows. With ``resume_path`` the run continues from
+    the checkpoint in that file and outputs only the rows after it.
+    ``append`` continues from the state kept with an existing output and
+    appends the rows of ``dataframe`` after it, so an update only costs the
+    new rows.
+    """
+    if output_path is None:
+        if append:
+            raise ValueError("Appending needs the output_path of the earlier run")
+        utcnow = datetime.now()
+        output_path = (
+            f"simulation_output_{utcnow.hour}_{utcnow.minute}_{utcnow.second}.csv"
         )
-
-        round_number += 1
-
-        outflow = altered_state.outflow_m3_15min
-        water_volume_m3 = altered_state.water_volume_m3
-
-        if altered_state.water_volume_m3 > 225000:
-            print("shitfuckshit")
-            break
-
-        # print(round_number)
-        print(f"inflow m3 15min {row["inflow_to_tunnel_m3_per_15min"]}")
-        print(f"outflow m3 15min {altered_state.outflow_m3_15min}")
-        print(f"water_level_m  {altered_state.water_level_from_water_volume_m}")
-
-        # for pump in altered_state.pump_state.pumps:
-        #     print(
-        #         f"ID: {pump.id}; {pump.pump_type}; Active: {pump.is_active}; Total time on: {format_duration_from_minutes(pump.cumulative_time_minutes)}"
-        #     )
-
-        print()
-
-    with open(
-        f"simulation_output_{utcnow.hour}_{utcnow.minute}_{utcnow.second}.csv", "w"
-    ) as filepointer:
-
-        # Create fieldnames dynamically for all the pumps that were logged
-
-        pump_ids = sorted(set(pump.id for log in logs for pump in log.pump_state.pumps))
-        fieldnames_and_labels = {
-            "timestamp": "Time stamp",
-            "water_volume_m3": "Water volume in tunnel V (m3)",
-            "water_level_from_water_volume_m": "Water level in tunnel L1 (m)",
-            "inflow_to_tunnel_m3_15min": "Inflow to tunnel F1 (m3/15 min)",
-            "outflow_m3_15min": "Outflow (m3/15 min)",
-            **{
-                f"pump_{pump_id}_power_kw": f"Pump efficiency {pump_id} (kW)"
-                for pump_id in pump_ids
-            },
-            **{
-                f"pump_{pump_id}_flow_m3_15min": f"Pump flow {pump_id} (m3/15 min)"
-                for pump_id in pump_ids
-            },
-            "electricity_price_eur_cent_per_kwh": "Electricity price 2: normal (EUR/kWh)",
-            "electricity_price_eur_cent_per_kwh_high": "Electricity price 1: high (EUR/kWh)",
-        }
-
-        csv_dictwriter = csv.DictWriter(
-            filepointer,
-            fieldnames=list(fieldnames_and_labels.keys()),
+    if checkpoint_path is None:
+        # Only the end state, which is all a later append needs.
+        checkpoint_path = state_path(output_path)
+        checkpoint_every = 0
+    if append:
+        resume_path = checkpoint_path
+
+    mpc = None
+    if controller == "mpc":
+        if resume_path is not None:
+            raise ValueError("Only the constant flow controller can resume a run")
+        mpc = MpcController.from_dataframe(dataframe, horizon_hours=horizon_hours)
+    elif controller != "constant_flow":
+        raise ValueError(f"Unknown controller: {controller}")
+
+    def on_checkpoint(checkpoint: SimulationCheckpoint) -> None:
+        checkpoint.save(checkpoint_path)
+
+    # Loaded before the sink opens, so a missing state leaves the output as it is.
+    checkpoint = None if resume_path is None else SimulationCheckpoint.load(resume_path)
+    sink = open_result_sink(output_path, append=append)
+    try:
+        if checkpoint is not None:
+            resume(
+                dataframe=dataframe,
+                checkpoint=checkpoint,
+                verbose=True,
+                sink=sink,
+                geometry=geometry,
+                pump_curves=pump_curves,
+                instrumentation=instrumentation,
+                fast_forward=fast_forward,
+                checkpoint_every=checkpoint_every,
+                on_checkpoint=on_checkpoint,
+            )
+        else:
+            simulate(
+                dataframe=dataframe,
+                initial_water_volume_m3=initial_water_volume_m3,
+                sink=sink,
+                mpc=mpc,
+                geometry=geometry,
+                pump_curves=pump_curves,
+                instrumentation=instrumentation,
+                fast_forward=fast_forward,
+                checkpoint_every=checkpoint_every,
+                on_checkpoint=on_checkpoint,
+            )
+    finally:
+        sink.close()
+
+    if instrumentation is not None:
+        print(instrumentation.report().format())
+
+    if mpc is not None:
+        summary = mpc.latency_summary()
+        print(
+            f"MPC decision latency over {summary['steps']:.0f} steps: "
+            f"p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms, "
+            f"p99 {summary['p99_ms']:.1f} ms, max {summary['max_ms']:.1f} ms, "
+            f"{summary['mean_iterations']:.1f} search iterations per step"
         )
-        csv_dictwriter.writerow(fieldnames_and_labels)
-        for log in logs:
-            row_dict = {
-                "timestamp": log.timestamp,
-                "water_volume_m3": log.water_volume_m3,
-                "water_level_from_water_volume_m": log.water_level_from_water_volume_m,
-                "inflow_to_tunnel_m3_15min": log.inflow_to_tunnel_m3_15min,
-                "outflow_m3_15min": log.outflow_m3_15min,
-                "electricity_price_eur_cent_per_kwh": log.electricity_price_eur_cent_per_kwh,
-                "electricity_price_eur_cent_per_kwh_high": log.electricity_price_eur_cent_per_kwh_high,
-            }
-            for pump in log.pump_state.pumps:
-                row_dict[f"pump_{pump.id}_power_kw"] = pump.current_power_kw
-                row_dict[f"pump_{pump.id}_flow_m3_15min"] = pump.pump_capacity_m3_15min
-            csv_dictwriter.writerow(row_dict)
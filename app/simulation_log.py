@@ -0,0 +1,311 @@
+from collections.abc import Sequence
+from datetime import datetime
+import numpy as np
+import pandas
+
+
+from app.pump import (
+    PUMP_CAPACITY_M3_15MIN,
+    PUMP_POWER_KW,
+    Pump,
+    PumpStateRecord,
+    PumpType,
+)
+
+
+class SimulationLog:
+    """Preallocated columnar record of a simulation run.
+
+    Every step stores fixed-width scalars plus one integer activation mask
+    (bit ``n - 1 - i`` for pump ``i``, as in ``pump_masks``). Per-pump power
+    and flow are derived from the masks only when the log is exported, unless
+    the log is created with ``operating_points=True`` for head-dependent pump
+    curves; then every step also stores the power and flow of each pump.
+
+    ``simulate`` leaves the state after the last row in
+    ``final_water_volume_ul`` and ``final_pump_state``.
+    """
+
+    def __init__(
+        self,
+        pump_ids: Sequence[str],
+        pump_types: Sequence[PumpType],
+        capacity: int,
+        operating_points: bool = False,
+    ) -> None:
+        self.pump_ids = list(pump_ids)
+        self.pump_types = list(pump_types)
+        self.bit_values = [
+            1 << (len(self.pump_ids) - 1 - index) for index in range(len(self.pump_ids))
+        ]
+        self.operating_points = operating_points
+        self.final_water_volume_ul: int | None = None
+        self.final_pump_state: PumpStateRecord | None = None
+        self._size = 0
+        self._allocate(max(capacity, 1))
+
+    @classmethod
+    def for_pumps(
+        cls, pumps: Sequence[Pump], capacity: int, operating_points: bool = False
+    ) -> "SimulationLog":
+        return cls(
+            pump_ids=[pump.id for pump in pumps],
+            pump_types=[pump.pump_type for pump in pumps],
+            capacity=capacity,
+            operating_points=operating_points,
+        )
+
+    @classmethod
+    def from_arrays(
+        cls,
+        pumps: Sequence[Pump],
+        timestamps_ns: np.ndarray,
+        water_volume_m3: np.ndarray,
+        water_level_m: np.ndarray,
+        inflow_m3_15min: np.ndarray,
+        outflow_m3_15min: np.ndarray,
+        activation_masks: np.ndarray,
+        electricity_price_eur_cent_per_kwh: np.ndarray,
+        electricity_price_eur_cent_per_kwh_high: np.ndarray,
+        pump_power_kw: np.ndarray | None = None,
+        pump_flow_m3_15min: np.ndarray | None = None,
+    ) -> "SimulationLog":
+        """Wrap already filled column arrays, e.g. from the vectorized engine.
+
+        ``pump_power_kw`` and ``pump_flow_m3_15min`` are (steps, pumps)
+        operating points; without them both follow from the masks.
+        """
+        log = cls.for_pumps(
+            pumps, capacity=1, operating_points=pump_power_kw is not None
+        )
+        log._timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        log._water_volume_m3 = np.asarray(water_volume_m3, dtype=np.float64)
+        log._water_level_m = np.asarray(water_level_m, dtype=np.float64)
+        log._inflow_m3_15min = np.asarray(inflow_m3_15min, dtype=np.float64)
+        log._outflow_m3_15min = np.asarray(outflow_m3_15min, dtype=np.float64)
+        log._activation_masks = np.asarray(activation_masks, dtype=np.int64)
+        log._price = np.asarray(electricity_price_eur_cent_per_kwh, dtype=np.float64)
+        log._price_high = np.asarray(
+            electricity_price_eur_cent_per_kwh_high, dtype=np.float64
+        )
+        if pump_power_kw is not None:
+            log._pump_power_kw = np.asarray(pump_power_kw, dtype=np.float64)
+            log._pump_flow_m3_15min = np.asarray(pump_flow_m3_15min, dtype=np.float64)
+        log._size = len(log._timestamps_ns)
+        return log
+
+    @classmethod
+    def concatenate(cls, logs: Sequence["SimulationLog"]) -> "SimulationLog":
+        """One log of the rows of ``logs`` in order, e.g. of consecutive chunks."""
+        first = logs[0]
+        log = cls(
+            pump_ids=first.pump_ids,
+            pump_types=first.pump_types,
+            capacity=1,
+            operating_points=first.operating_points,
+        )
+        for name in log._column_names():
+            setattr(
+                log,
+                name,
+                np.concatenate([getattr(part, name)[: part._size] for part in logs]),
+            )
+        log._size = sum(len(part) for part in logs)
+        log.final_water_volume_ul = logs[-1].final_water_volume_ul
+        log.final_pump_state = logs[-1].final_pump_state
+        return log
+
+    def rows(self, start: int, stop: int | None = None) -> "SimulationLog":
+        """A log of rows ``start:stop`` that shares the column arrays."""
+        stop = self._size if stop is None else min(stop, self._size)
+        log = type(self)(
+            pump_ids=self.pump_ids,
+            pump_types=self.pump_types,
+            capacity=1,
+            operating_points=self.operating_points,
+        )
+        for name in self._column_names():
+            setattr(log, name, getattr(self, name)[start:stop])
+        log._size = max(stop - start, 0)
+        log.final_water_volume_ul = self.final_water_volume_ul
+        log.final_pump_state = self.final_pump_state
+        return log
+
+    def _column_names(self) -> tuple[str, ...]:
+        return (
+            "_timestamps_ns",
+            "_water_volume_m3",
+            "_water_level_m",
+            "_inflow_m3_15min",
+            "_outflow_m3_15min",
+            "_price",
+            "_price_high",
+            "_activation_masks",
+        ) + (("_pump_power_kw", "_pump_flow_m3_15min") if self.operating_points else ())
+
+    def _allocate(self, capacity: int) -> None:
+        self._timestamps_ns = np.empty(capacity, dtype=np.int64)
+        self._water_volume_m3 = np.empty(capacity)
+        self._water_level_m = np.empty(capacity)
+        self._inflow_m3_15min = np.empty(capacity)
+        self._outflow_m3_15min = np.empty(capacity)
+        self._price = np.empty(capacity)
+        self._price_high = np.empty(capacity)
+        self._activation_masks = np.empty(capacity, dtype=np.int64)
+        if self.operating_points:
+            self._pump_power_kw = np.empty((capacity, len(self.pump_ids)))
+            self._pump_flow_m3_15min = np.empty((capacity, len(self.pump_ids)))
+
+    def _grow(self) -> None:
+        columns = {
+            name: getattr(self, name)[: self._size] for name in self._column_names()
+        }
+        self._allocate(2 * len(self._timestamps_ns))
+        for name, values in columns.items():
+            getattr(self, name)[: self._size] = values
+
+    def __len__(self) -> int:
+        return self._size
+
+    def mask_of(self, pumps: Sequence[Pump]) -> int:
+        return sum(bit for bit, pump in zip(self.bit_values, pumps) if pump.is_active)
+
+    def append(
+        self,
+        timestamp: datetime,
+        water_volume_m3: float,
+        water_level_m: float,
+        inflow_m3_15min: float,
+        outflow_m3_15min: float,
+        activation_mask: int,
+        electricity_price_eur_cent_per_kwh: float,
+        electricity_price_eur_cent_per_kwh_high: float,
+        pump_power_kw: Sequence[float] | None = None,
+        pump_flow_m3_15min: Sequence[float] | None = None,
+    ) -> None:
+        if self._size == len(self._timestamps_ns):
+            self._grow()
+        index = self._size
+        self._timestamps_ns[index] = pandas.Timestamp(timestamp).value
+        self._water_volume_m3[index] = water_volume_m3
+        self._water_level_m[index] = water_level_m
+        self._inflow_m3_15min[index] = inflow_m3_15min
+        self._outflow_m3_15min[index] = outflow_m3_15min
+        self._activation_masks[index] = activation_mask
+        self._price[index] = electricity_price_eur_cent_per_kwh
+        self._price_high[index] = electricity_price_eur_cent_per_kwh_high
+        if self.operating_points:
+            self._pump_power_kw[index] = pump_power_kw
+            self._pump_flow_m3_15min[index] = pump_flow_m3_15min
+        self._size += 1
+
+    def extend(
+        self,
+        timestamps_ns: np.ndarray,
+        water_volume_m3: np.ndarray,
+        water_level_m: np.ndarray,
+        inflow_m3_15min: np.ndarray,
+        outflow_m3_15min: np.ndarray,
+        activation_masks: np.ndarray,
+        electricity_price_eur_cent_per_kwh: np.ndarray,
+        electricity_price_eur_cent_per_kwh_high: np.ndarray,
+    ) -> None:
+        """Append a block of steps at once; scalar outflows and masks broadcast."""
+        if self.operating_points:
+            raise ValueError("Operating points can only be logged step by step")
+        rows = len(timestamps_ns)
+        while self._size + rows > len(self._timestamps_ns):
+            self._grow()
+        block = slice(self._size, self._size + rows)
+        self._timestamps_ns[block] = timestamps_ns
+        self._water_volume_m3[block] = water_volume_m3
+        self._water_level_m[block] = water_level_m
+        self._inflow_m3_15min[block] = inflow_m3_15min
+        self._outflow_m3_15min[block] = outflow_m3_15min
+        self._activation_masks[block] = activation_masks
+        self._price[block] = electricity_price_eur_cent_per_kwh
+        self._price_high[block] = electricity_price_eur_cent_per_kwh_high
+        self._size += rows
+
+    @property
+    def timestamps(self) -> pandas.DatetimeIndex:
+        return pandas.to_datetime(self._timestamps_ns[: self._size])
+
+    @property
+    def water_volume_m3(self) -> np.ndarray:
+        return self._water_volume_m3[: self._size]
+
+    @property
+    def water_level_m(self) -> np.ndarray:
+        return self._water_level_m[: self._size]
+
+    @property
+    def inflow_m3_15min(self) -> np.ndarray:
+        return self._inflow_m3_15min[: self._size]
+
+    @property
+    def outflow_m3_15min(self) -> np.ndarray:
+        return self._outflow_m3_15min[: self._size]
+
+    @property
+    def activation_masks(self) -> np.ndarray:
+        return self._activation_masks[: self._size]
+
+    @property
+    def electricity_price_eur_cent_per_kwh(self) -> np.ndarray:
+        return self._price[: self._size]
+
+    @property
+    def electricity_price_eur_cent_per_kwh_high(self) -> np.ndarray:
+        return self._price_high[: self._size]
+
+    def pump_is_active(self, pump_id: str, rows: slice = slice(None)) -> np.ndarray:
+        bit = self.bit_values[self.pump_ids.index(pump_id)]
+        return (self.activation_masks[rows] & bit) != 0
+
+    def pump_power_kw(self, pump_id: str, rows: slice = slice(None)) -> np.ndarray:
+        if self.operating_points:
+            column = self.pump_ids.index(pump_id)
+            return self._pump_power_kw[: self._size, column][rows]
+        pump_type = self.pump_types[self.pump_ids.index(pump_id)]
+        return np.where(
+            self.pump_is_active(pump_id, rows), float(PUMP_POWER_KW[pump_type]), 0.0
+        )
+
+    def pump_flow_m3_15min(self, pump_id: str, rows: slice = slice(None)) -> np.ndarray:
+        if self.operating_points:
+            column = self.pump_ids.index(pump_id)
+            return self._pump_flow_m3_15min[: self._size, column][rows]
+        pump_type = self.pump_types[self.pump_ids.index(pump_id)]
+        return np.where(
+            self.pump_is_active(pump_id, rows),
+            float(PUMP_CAPACITY_M3_15MIN[pump_type]),
+            0.0,
+        )
+
+    def to_dataframe(self, start: int = 0, stop: int | None = None) -> pandas.DataFrame:
+        """Rows ``start:stop`` labelled like the output CSV and the HSY input data."""
+        rows = slice(start, self._size if stop is None else min(stop, self._size))
+        pump_ids = sorted(self.pump_ids)
+        columns: dict[str, object] = {
+            "Time stamp": self.timestamps[rows],
+            "Water volume in tunnel V (m3)": self.water_volume_m3[rows],
+            "Water level in tunnel L1 (m)": self.water_level_m[rows],
+            "Inflow to tunnel F1 (m3/15 min)": self.inflow_m3_15min[rows],
+            "Outflow (m3/15 min)": self.outflow_m3_15min[rows],
+        }
+        for pump_id in pump_ids:
+            columns[f"Pump efficiency {pump_id} (kW)"] = self.pump_power_kw(
+                pump_id, rows
+            )
+        for pump_id in pump_ids:
+            columns[f"Pump flow {pump_id} (m3/15 min)"] = self.pump_flow_m3_15min(
+                pump_id, rows
+            )
+        columns["Electricity price 2: normal (EUR/kWh)"] = (
+            self.electricity_price_eur_cent_per_kwh[rows]
+        )
+        columns["Electricity price 1: high (EUR/kWh)"] = (
+            self.electricity_price_eur_cent_per_kwh_high[rows]
+        )
+        return pandas.DataFrame(columns)
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+from app.pump import default_pumps
+from app.simulation_log import SimulationLog
+
+
+class TestSimulationLog:
+    def test_columns_grow_and_pump_values_come_from_masks(self) -> None:
+        pumps = default_pumps()
+        log = SimulationLog.for_pumps(pumps, capacity=2)
+        start = datetime(2024, 11, 15)
+
+        for step in range(5):
+            log.append(
+                timestamp=start + timedelta(minutes=15 * step),
+                water_volume_m3=1000.0 + step,
+                water_level_m=1.0,
+                inflow_m3_15min=500.0,
+                outflow_m3_15min=375.0,
+                # Pump "1.1" (small, first) and "1.4" (large, last) on odd steps.
+                activation_mask=(log.bit_values[0] | log.bit_values[7]) * (step % 2),
+                electricity_price_eur_cent_per_kwh=0.291,
+                electricity_price_eur_cent_per_kwh_high=3.383,
+            )
+
+        assert len(log) == 5
+        assert list(log.water_volume_m3) == [1000.0, 1001.0, 1002.0, 1003.0, 1004.0]
+        assert list(log.pump_power_kw("1.1")) == [0.0, 200.0, 0.0, 200.0, 0.0]
+        assert list(log.pump_flow_m3_15min("1.4")) == [0.0, 750.0, 0.0, 750.0, 0.0]
+
+        dataframe = log.to_dataframe(start=1, stop=3)
+        assert len(dataframe) == 2
+        assert dataframe["Time stamp"].iloc[0] == start + timedelta(minutes=15)
+        assert dataframe["Pump efficiency 1.4 (kW)"].tolist() == [350.0, 0.0]
+        assert dataframe["Pump efficiency 2.2 (kW)"].tolist() == [0.0, 0.0]
+        assert dataframe.columns[-1] == "Electricity price 1: high (EUR/kWh)"
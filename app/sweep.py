@@ -0,0 +1,199 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+from collections.abc import Mapping, Sequence
+from decimal import Decimal
+from itertools import product
+
+import pandas
+
+from app.controller_config import DEFAULT_CONTROLLER_CONFIG, ControllerConfig
+from app.ingest import load_simulation_input
+from app.scenarios import ScenarioSpec, run_scenarios
+from app.vectorized_simulation import MAX_SAFE_LEVEL_M, SimulationArrays
+
+
+"""
+Parallel parameter sweep over ``ControllerConfig``.
+
+Every evaluated point is stored as JSON under
+``<cache_dir>/<input hash>/<config hash>.json``, so re-running a sweep, or a
+larger one over the same input, only simulates configs it has not seen.
+"""
+
+DEFAULT_CACHE_DIR = ".sweep_cache"
+
+
+def input_hash(arrays: SimulationArrays, initial_water_volume_m3: float) -> str:
+    digest = hashlib.sha256()
+    for values in (
+        arrays.timestamps_s,
+        arrays.inflow_m3_15min,
+        arrays.price_eur_cent_per_kwh,
+        arrays.price_high_eur_cent_per_kwh,
+    ):
+        digest.update(values.tobytes())
+    digest.update(repr(float(initial_water_volume_m3)).encode())
+    return digest.hexdigest()
+
+
+def grid_configs(
+    grid: Mapping[str, Sequence[object]],
+    base: ControllerConfig = DEFAULT_CONTROLLER_CONFIG,
+) -> list[ControllerConfig]:
+    """Every combination of the given field values, other fields from ``base``."""
+    names = list(grid)
+    return [
+        ControllerConfig(**{**base.model_dump(), **dict(zip(names, values))})
+        for values in product(*(grid[name] for name in names))
+    ]
+
+
+def sample_configs(
+    grid: Mapping[str, Sequence[object]],
+    count: int,
+    seed: int = 0,
+    base: ControllerConfig = DEFAULT_CONTROLLER_CONFIG,
+) -> list[ControllerConfig]:
+    """Up to ``count`` distinct random points of the grid, without enumerating it."""
+    rng = random.Random(seed)
+    names = list(grid)
+    size = 1
+    for name in names:
+        size *= len(grid[name])
+
+    configs: dict[str, ControllerConfig] = {}
+    while len(configs) < min(count, size):
+        config = ControllerConfig(
+            **{
+                **base.model_dump(),
+                **{name: rng.choice(list(grid[name])) for name in names},
+            }
+        )
+        configs.setdefault(config.config_hash(), config)
+    return list(configs.values())
+
+
+class SweepCache:
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR) -> None:
+        self.directory = directory
+
+    def _path(self, input_key: str, config_key: str) -> str:
+        return os.path.join(self.directory, input_key[:16], f"{config_key}.json")
+
+    def get(self, input_key: str, config_key: str) -> dict | None:
+        path = self._path(input_key, config_key)
+        if not os.path.isfile(path):
+            return None
+        with open(path) as file:
+            return json.load(file)["kpis"]
+
+    def put(
+        self, input_key: str, config: ControllerConfig, kpis: Mapping[str, object]
+    ) -> None:
+        path = self._path(input_key, config.config_hash())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump(
+                {"config": config.model_dump(mode="json"), "kpis": dict(kpis)}, file
+            )
+        os.replace(temporary_path, path)
+
+
+def _config_columns(config: ControllerConfig) -> dict[str, object]:
+    return {
+        name: float(value) if isinstance(value, Decimal) else value
+        for name, value in config.model_dump().items()
+    }
+
+
+def run_sweep(
+    arrays: SimulationArrays,
+    initial_water_volume_m3: float,
+    configs: Sequence[ControllerConfig],
+    cache: SweepCache | None = None,
+    max_workers: int | None = None,
+    rank_by: str = "cost_normal_eur",
+) -> pandas.DataFrame:
+    """Evaluate the configs and rank them by cost, feasible ones first.
+
+    A config is feasible when its run never reaches the safe level limit.
+    """
+    cache = cache or SweepCache()
+    input_key = input_hash(arrays, initial_water_volume_m3)
+    unique_configs = {config.config_hash(): config for config in configs}
+
+    results: dict[str, dict] = {}
+    missing: list[ScenarioSpec] = []
+    for config_key, config in unique_configs.items():
+        cached = cache.get(input_key, config_key)
+        if cached is None:
+            missing.append(ScenarioSpec(name=config_key, config=config))
+        else:
+            results[config_key] = cached
+
+    if missing:
+        summary = run_scenarios(
+            arrays, initial_water_volume_m3, missing, max_workers=max_workers
+        )
+        for config_key, kpis in summary.to_dict(orient="index").items():
+            cache.put(input_key, unique_configs[str(config_key)], kpis)
+            results[str(config_key)] = kpis
+
+    table = pandas.DataFrame(
+        [
+            {
+                "config_hash": config_key,
+                "cached": config_key not in {spec.name for spec in missing},
+                **_config_columns(config),
+                **results[config_key],
+            }
+            for config_key, config in unique_configs.items()
+        ]
+    )
+    table["feasible"] = ~table["breached_safe_level"] & (
+        table["max_level_m"] < MAX_SAFE_LEVEL_M
+    )
+    return table.sort_values(
+        ["feasible", rank_by], ascending=[False, True], kind="stable"
+    ).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep controller tuning constants.")
+    parser.add_argument("--data", default="Hackathon_HSY_data.csv")
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=None,
+        help="Evaluate a random sample of the grid instead of all of it.",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    grid = {
+        "min_runtime": ["PT1H", "PT2H", "PT3H"],
+        "rain_threshold_m3_15min": ["1500", "2000", "2500"],
+        "smoothing_alpha": ["0.1", "0.2", "0.3"],
+        "expensive_price_max_level_m": ["6.0", "7.0"],
+        "above_mean_price_max_level_m": ["5.5", "6.5"],
+    }
+    configs = (
+        grid_configs(grid)
+        if args.samples is None
+        else sample_configs(grid, count=args.samples)
+    )
+
+    simulation_input = load_simulation_input(args.data)
+    ranked = run_sweep(
+        arrays=SimulationArrays.from_dataframe(simulation_input.dataframe),
+        initial_water_volume_m3=float(simulation_input.initial_water_volume_m3),
+        configs=configs,
+        cache=SweepCache(args.cache_dir),
+        max_workers=args.workers,
+    )
+    print(ranked.head(10).to_string())
@@ -0,0 +1,73 @@
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+
+from app.controller_config import ControllerConfig
+from app.sweep import SweepCache, grid_configs, run_sweep, sample_configs
+from app.testing import synthetic_arrays
+
+
+class TestSweep:
+    def test_grid_and_sample_configs(self) -> None:
+        grid = {
+            "smoothing_alpha": ["0.1", "0.2"],
+            "min_runtime": ["PT1H", "PT2H", "PT3H"],
+        }
+
+        configs = grid_configs(grid)
+        sampled = sample_configs(grid, count=4, seed=1)
+
+        assert len(configs) == 6
+        assert configs[0].smoothing_alpha == Decimal("0.1")
+        assert len({config.config_hash() for config in sampled}) == 4
+        assert all(config in configs for config in sampled)
+        assert len(sample_configs(grid, count=100)) == 6
+
+    def test_equal_configs_hash_equally(self) -> None:
+        assert (
+            ControllerConfig(expensive_price_max_level_m=Decimal("7")).config_hash()
+            == ControllerConfig().config_hash()
+        )
+
+    def test_reruns_only_compute_new_points(self, tmp_path: Path) -> None:
+        arrays = synthetic_arrays(inflow_swing_m3_15min=800)
+        cache = SweepCache(str(tmp_path))
+        first_configs = grid_configs({"smoothing_alpha": ["0.1", "0.3"]})
+        more_configs = grid_configs({"smoothing_alpha": ["0.1", "0.3", "0.5"]})
+
+        first = run_sweep(arrays, 10_000.0, first_configs, cache=cache, max_workers=1)
+        second = run_sweep(arrays, 10_000.0, more_configs, cache=cache, max_workers=1)
+
+        assert not first["cached"].any()
+        assert second["cached"].sum() == 2
+        assert second.loc[~second["cached"], "smoothing_alpha"].tolist() == [0.5]
+        merged = first.merge(second, on="config_hash", suffixes=("", "_again"))
+        assert (merged["cost_normal_eur"] == merged["cost_normal_eur_again"]).all()
+
+    def test_infeasible_configs_rank_last(self, tmp_path: Path) -> None:
+        arrays = synthetic_arrays(inflow_swing_m3_15min=800)
+        # A rain spike that only the coarse target step keeps up with.
+        steps = np.arange(300)
+        arrays = arrays.model_copy(
+            update={
+                "inflow_m3_15min": np.where(
+                    (steps > 100) & (steps < 160), 3500.0, 1000.0
+                )
+            }
+        )
+
+        ranked = run_sweep(
+            arrays,
+            10_000.0,
+            grid_configs({"flow_increment_m3_15min": ["100", "375"]}),
+            cache=SweepCache(str(tmp_path)),
+            max_workers=1,
+        )
+
+        assert ranked["feasible"].any() and not ranked["feasible"].all()
+        assert ranked["feasible"].tolist() == sorted(
+            ranked["feasible"].tolist(), reverse=True
+        )
+        feasible = ranked[ranked["feasible"]]
+        assert feasible["cost_normal_eur"].is_monotonic_increasing
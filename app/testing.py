@@ -0,0 +1,60 @@
+import numpy as np
+import pandas
+
+from app.vectorized_simulation import SimulationArrays
+
+
+"""
+Synthetic inputs for the tests, with the input columns ``simulate`` reads.
+
+Prices follow a sine around 5 c/kWh (high prices 3 c/kWh above). The inflow
+is either a slow sin² swing above a base flow, or, for ``storm_dataframe``,
+dry weather with a small ripple and one Gaussian rain pulse.
+"""
+
+
+def _frame(prices: np.ndarray, inflow: np.ndarray) -> pandas.DataFrame:
+    return pandas.DataFrame(
+        {
+            "timestamp": pandas.date_range(
+                "2024-11-15", periods=len(inflow), freq="15min"
+            ),
+            "electricity_price_eur_cent_per_kwh": prices,
+            "electricity_price_eur_cent_per_kwh_high": prices + 3,
+            "inflow_to_tunnel_m3_per_15min": inflow,
+        }
+    )
+
+
+def _prices(steps: np.ndarray, price_period_steps: float) -> np.ndarray:
+    return np.round(5 + 4 * np.sin(steps / price_period_steps), 3)
+
+
+def synthetic_dataframe(
+    rows: int = 300,
+    inflow_m3_15min: float = 1500.0,
+    inflow_swing_m3_15min: float = 900.0,
+    inflow_period_steps: float = 40.0,
+    price_period_steps: float = 12.0,
+) -> pandas.DataFrame:
+    steps = np.arange(rows)
+    inflow = (
+        inflow_m3_15min
+        + inflow_swing_m3_15min * np.sin(steps / inflow_period_steps) ** 2
+    )
+    return _frame(_prices(steps, price_period_steps), inflow)
+
+
+def synthetic_arrays(rows: int = 300, **kwargs: float) -> SimulationArrays:
+    return SimulationArrays.from_dataframe(synthetic_dataframe(rows, **kwargs))
+
+
+def storm_dataframe(
+    rows: int = 600,
+    storm_step: int = 300,
+    storm_m3_15min: float = 2500.0,
+    storm_width_steps: float = 25.0,
+) -> pandas.DataFrame:
+    steps = np.arange(rows)
+    rain = storm_m3_15min * np.exp(-(((steps - storm_step) / storm_width_steps) ** 2))
+    return _frame(_prices(steps, 12.0), 1000 + 80 * np.sin(steps / 7) + rain)
@@ -0,0 +1,192 @@
+import argparse
+import math
+from collections.abc import Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+import pandas
+from pydantic import BaseModel, ConfigDict
+
+from app.controller_config import ControllerConfig
+from app.ingest import load_simulation_input
+from app.scenarios import ScenarioPool, ScenarioSpec
+from app.sweep import sample_configs
+from app.vectorized_simulation import SimulationArrays
+
+
+"""
+Successive-halving search for good ``ControllerConfig`` values.
+
+All candidates first run on a short prefix of the data; the cheapest
+``1 / eta`` of those that stay below the level limit are promoted to a prefix
+``eta`` times longer, until the survivors run on the whole series.
+
+Within a rung a candidate is stopped as soon as its running cost exceeds the
+cost of the last candidate that would currently be promoted: with
+non-negative prices the cost only grows, so such a candidate cannot be
+promoted any more. Candidates are started in the order of the previous rung,
+so the promotion threshold tightens early.
+"""
+
+
+class TunerResult(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    best_config: ControllerConfig | None
+    evaluations: pandas.DataFrame
+    simulated_steps: int
+    full_grid_steps: int
+
+    @property
+    def compute_fraction(self) -> float:
+        """Simulated steps relative to running every candidate on all data."""
+        return self.simulated_steps / self.full_grid_steps
+
+
+def rung_steps(
+    total_steps: int, candidates: int, eta: int, min_steps: int
+) -> list[int]:
+    """Prefix lengths of the rungs, growing by ``eta`` and ending at the full series."""
+    rung_count = max(1, math.floor(math.log(max(candidates, 1), eta)) + 1)
+    first = max(min_steps, math.ceil(total_steps / eta ** (rung_count - 1)))
+    steps = []
+    budget = first
+    while budget < total_steps and len(steps) < rung_count - 1:
+        steps.append(budget)
+        budget *= eta
+    steps.append(total_steps)
+    return steps
+
+
+def _run_rung(
+    pool: ScenarioPool,
+    candidates: Sequence[tuple[str, ControllerConfig]],
+    steps: int,
+    keep: int,
+    prune: bool,
+) -> list[dict]:
+    """Evaluate the candidates on a prefix, keeping at most one task per worker in flight."""
+    completed_costs: list[float] = []
+    rows: list[dict] = []
+    in_flight: dict[Future, str] = {}
+    queue = list(candidates)
+
+    def threshold() -> float | None:
+        if not prune or len(completed_costs) < keep:
+            return None
+        return sorted(completed_costs)[keep - 1]
+
+    while queue or in_flight:
+        while queue and len(in_flight) < pool.max_workers:
+            config_hash, config = queue.pop(0)
+            spec = ScenarioSpec(
+                name=config_hash,
+                config=config,
+                max_steps=steps,
+                cost_limit_eur=threshold(),
+            )
+            in_flight[pool.submit(spec)] = config_hash
+
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            del in_flight[future]
+            row = future.result()
+            rows.append(row)
+            if not row["breached_safe_level"] and not row["stopped_at_cost_limit"]:
+                completed_costs.append(row["cost_normal_eur"])
+    return rows
+
+
+def successive_halving(
+    arrays: SimulationArrays,
+    initial_water_volume_m3: float,
+    configs: Sequence[ControllerConfig],
+    eta: int = 3,
+    min_steps: int = 96,
+    max_workers: int | None = None,
+) -> TunerResult:
+    """Find the cheapest config that never reaches the level limit.
+
+    Costs are compared at the normal tariff over equal prefixes.
+    """
+    candidates = list({config.config_hash(): config for config in configs}.items())
+    total_steps = len(arrays)
+    # Cost pruning is only exact when the running cost cannot decrease.
+    prune = bool((arrays.price_eur_cent_per_kwh >= 0).all())
+
+    evaluations: list[dict] = []
+    simulated_steps = 0
+    with ScenarioPool(arrays, initial_water_volume_m3, max_workers) as pool:
+        for rung, steps in enumerate(
+            rung_steps(total_steps, len(candidates), eta, min_steps)
+        ):
+            is_last = steps >= total_steps
+            keep = 1 if is_last else max(1, math.ceil(len(candidates) / eta))
+            rows = _run_rung(pool, candidates, steps, keep, prune)
+
+            for row in rows:
+                row["rung"] = rung
+                row["prefix_steps"] = steps
+                row["promoted"] = False
+                simulated_steps += row["steps"]
+
+            finished = sorted(
+                (
+                    row
+                    for row in rows
+                    if not row["breached_safe_level"]
+                    and not row["stopped_at_cost_limit"]
+                ),
+                key=lambda row: row["cost_normal_eur"],
+            )
+            survivors = finished[:keep]
+            for row in survivors:
+                row["promoted"] = True
+            evaluations.extend(rows)
+
+            configs_by_hash = dict(candidates)
+            candidates = [
+                (row["scenario"], configs_by_hash[row["scenario"]]) for row in survivors
+            ]
+            if not candidates or is_last:
+                break
+
+    best_config = candidates[0][1] if candidates and is_last else None
+    return TunerResult(
+        best_config=best_config,
+        evaluations=pandas.DataFrame(evaluations).rename(
+            columns={"scenario": "config_hash"}
+        ),
+        simulated_steps=simulated_steps,
+        full_grid_steps=len(dict.fromkeys(config.config_hash() for config in configs))
+        * total_steps,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the constant flow controller.")
+    parser.add_argument("--data", default="Hackathon_HSY_data.csv")
+    parser.add_argument("--samples", type=int, default=81)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    grid = {
+        "min_runtime": ["PT1H", "PT2H", "PT3H"],
+        "rain_threshold_m3_15min": ["1500", "2000", "2500"],
+        "smoothing_alpha": ["0.1", "0.2", "0.3", "0.4"],
+        "expensive_price_max_level_m": ["5.0", "6.0", "7.0"],
+        "above_mean_price_max_level_m": ["4.5", "5.5", "6.5"],
+    }
+    simulation_input = load_simulation_input(args.data)
+    result = successive_halving(
+        arrays=SimulationArrays.from_dataframe(simulation_input.dataframe),
+        initial_water_volume_m3=float(simulation_input.initial_water_volume_m3),
+        configs=sample_configs(grid, count=args.samples),
+        eta=args.eta,
+        max_workers=args.workers,
+    )
+    print(f"Best config: {result.best_config}")
+    print(
+        f"Simulated {result.simulated_steps:,} steps, "
+        f"{result.compute_fraction:.1%} of the full grid"
+    )
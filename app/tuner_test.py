@@ -0,0 +1,66 @@
+from app.controller_config import ControllerConfig
+from app.scenarios import ScenarioPool
+from app.sweep import grid_configs, run_sweep, SweepCache
+from app.tuner import _run_rung, rung_steps, successive_halving
+from app.testing import synthetic_arrays
+
+
+def _configs() -> list[ControllerConfig]:
+    return grid_configs(
+        {
+            "smoothing_alpha": ["0.1", "0.2", "0.4"],
+            "min_runtime": ["PT1H", "PT2H", "PT3H"],
+            "above_mean_price_max_level_m": ["4.5", "6.5"],
+        }
+    )
+
+
+class TestSuccessiveHalving:
+    def test_rungs_grow_by_eta_and_end_at_the_full_series(self) -> None:
+        assert rung_steps(1535, 81, eta=3, min_steps=96) == [96, 288, 864, 1535]
+        assert rung_steps(1535, 1, eta=3, min_steps=96) == [1535]
+        assert rung_steps(100, 81, eta=3, min_steps=96) == [96, 100]
+
+    def test_cost_pruning_keeps_the_same_promotions(self) -> None:
+        arrays = synthetic_arrays(600)
+        candidates = [(config.config_hash(), config) for config in _configs()]
+
+        with ScenarioPool(arrays, 10_000.0, max_workers=1) as pool:
+            pruned = _run_rung(pool, candidates, steps=300, keep=6, prune=True)
+            full = _run_rung(pool, candidates, steps=300, keep=6, prune=False)
+
+        def promoted(rows: list[dict]) -> list[str]:
+            finished = [
+                row
+                for row in rows
+                if not row["breached_safe_level"] and not row["stopped_at_cost_limit"]
+            ]
+            return [
+                row["scenario"]
+                for row in sorted(finished, key=lambda row: row["cost_normal_eur"])[:6]
+            ]
+
+        assert any(row["stopped_at_cost_limit"] for row in pruned)
+        assert sum(row["steps"] for row in pruned) < sum(row["steps"] for row in full)
+        assert promoted(pruned) == promoted(full)
+
+    def test_finds_a_feasible_config_with_less_compute(self, tmp_path) -> None:
+        arrays = synthetic_arrays(600)
+        configs = _configs()
+
+        result = successive_halving(
+            arrays, 10_000.0, configs, min_steps=64, max_workers=2
+        )
+        ranked = run_sweep(
+            arrays, 10_000.0, configs, cache=SweepCache(str(tmp_path)), max_workers=1
+        )
+
+        assert result.best_config is not None
+        assert result.compute_fraction < 0.6
+        best_hash = result.best_config.config_hash()
+        best_row = ranked.set_index("config_hash").loc[best_hash]
+        assert best_row["feasible"]
+        # Within the cheapest third of the exhaustive ranking.
+        assert ranked.index[ranked["config_hash"] == best_hash][0] < len(ranked) / 3
+        final = result.evaluations[result.evaluations["prefix_steps"] == len(arrays)]
+        assert final["promoted"].sum() == 1
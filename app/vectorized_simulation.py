@@ -0,0 +1,450 @@
+import math
+from decimal import Decimal
+import numpy as np
+import pandas
+from pydantic import BaseModel, ConfigDict
+
+
+from app.controller_config import DEFAULT_CONTROLLER_CONFIG, ControllerConfig
+from app.geometry import ANALYTIC_GEOMETRY, TunnelGeometry
+from app.price_window import forward_price_stat_arrays
+from app.pump import PUMP_CAPACITY_M3_15MIN, PUMP_POWER_KW, Pump, default_pumps
+from app.pump_curves import PumpCurveTable
+from app.pump_masks import mask_table_for
+from app.simulation import simulate
+from app.simulation_log import SimulationLog
+from app.water_level import V_MIN
+
+
+"""
+Float64 simulation engine with the same semantics as ``simulation.simulate``.
+
+The input columns are loaded into contiguous arrays once, the look-ahead price
+statistics and the smoothed inflow are precomputed for the whole series, and
+the controller keeps its pump state in plain arrays instead of pydantic models.
+"""
+
+MAX_SAFE_LEVEL_M = 8.0
+NO_TIME = np.iinfo(np.int64).min
+
+
+class SimulationArrays(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    timestamps_s: np.ndarray
+    inflow_m3_15min: np.ndarray
+    price_eur_cent_per_kwh: np.ndarray
+    price_high_eur_cent_per_kwh: np.ndarray
+
+    @classmethod
+    def from_dataframe(cls, dataframe: pandas.DataFrame) -> "SimulationArrays":
+        timestamps = pandas.to_datetime(dataframe["timestamp"])
+        return cls(
+            timestamps_s=np.ascontiguousarray(
+                timestamps.to_numpy(dtype="datetime64[s]").astype(np.int64)
+            ),
+            inflow_m3_15min=np.ascontiguousarray(
+                dataframe["inflow_to_tunnel_m3_per_15min"].to_numpy(dtype=np.float64)
+            ),
+            price_eur_cent_per_kwh=np.ascontiguousarray(
+                dataframe["electricity_price_eur_cent_per_kwh"].to_numpy(
+                    dtype=np.float64
+                )
+            ),
+            price_high_eur_cent_per_kwh=np.ascontiguousarray(
+                dataframe["electricity_price_eur_cent_per_kwh_high"].to_numpy(
+                    dtype=np.float64
+                )
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.timestamps_s)
+
+
+class PumpFleetArrays:
+    """Per-pump constants of a fleet plus its precomputed activation mask table."""
+
+    def __init__(self, pumps: list[Pump]) -> None:
+        self.pump_ids = [pump.id for pump in pumps]
+        self.capacities = np.array(
+            [PUMP_CAPACITY_M3_15MIN[pump.pump_type] for pump in pumps], dtype=float
+        )
+        self.power_kw = np.array(
+            [PUMP_POWER_KW[pump.pump_type] for pump in pumps], dtype=float
+        )
+        self.mask_table = mask_table_for(tuple(pump.pump_type for pump in pumps))
+        self.bit_values = self.mask_table.bit_values
+        self.max_capacity = float(self.capacities.sum())
+        self.min_capacity = float(self.capacities.min())
+
+    def mask_of(self, pumps: list[Pump]) -> int:
+        return self.mask_table.mask_of(pumps)
+
+
+class VectorizedSimulationResult(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    log: SimulationLog
+    breached_safe_level: bool
+    stopped_at_cost_limit: bool = False
+
+
+class ParityReport(BaseModel):
+    steps_compared: int
+    max_volume_diff_m3: float
+    max_level_diff_m: float
+    max_outflow_diff_m3: float
+    mask_mismatches: int
+    tolerance: float
+
+    @property
+    def passed(self) -> bool:
+        return (
+            self.mask_mismatches == 0
+            and self.max_volume_diff_m3 <= self.tolerance
+            and self.max_outflow_diff_m3 <= self.tolerance
+            and self.max_level_diff_m <= self.tolerance
+        )
+
+
+class ParityError(Exception):
+    pass
+
+
+def _round_half_up(value: float, increment: float) -> float:
+    steps = value / increment
+    return math.copysign(math.floor(abs(steps) + 0.5), steps) * increment
+
+
+def _smoothed_inflow(inflow: np.ndarray, alpha: float) -> np.ndarray:
+    """Exponential smoothing the controller applies from the second row on."""
+    smoothed = np.empty_like(inflow)
+    if len(inflow) < 2:
+        return smoothed
+    average = float(inflow[1])
+    smoothed[1] = average
+    keep = 1.0 - alpha
+    for index, value in enumerate(inflow[2:].tolist(), start=2):
+        average = average * keep + value * alpha
+        smoothed[index] = average
+    return smoothed
+
+
+def run_vectorized(
+    arrays: SimulationArrays,
+    initial_water_volume_m3: float,
+    pumps: list[Pump] | None = None,
+    config: ControllerConfig = DEFAULT_CONTROLLER_CONFIG,
+    max_steps: int | None = None,
+    cost_limit_eur: float | None = None,
+    geometry: TunnelGeometry = ANALYTIC_GEOMETRY,
+    pump_curves: PumpCurveTable | None = None,
+) -> VectorizedSimulationResult:
+    """Simulate the tunnel with the constant flow controller on float64 arrays.
+
+    Stops at the first step whose level reaches ``MAX_SAFE_LEVEL_M``, where
+    the fixed-point ``simulate`` loop would fail its safety assertion; the
+    result then only holds the steps before the breach. ``max_steps``
+    simulates only a prefix (with the price look-ahead still seeing the whole
+    series), and the run also stops once its energy cost at the normal tariff
+    exceeds ``cost_limit_eur``. With ``pump_curves`` the pumps deliver the
+    head-dependent flow and power of the curves instead of their nominal
+    figures.
+    """
+    if pumps is None:
+        pumps = default_pumps()
+    fleet = PumpFleetArrays(pumps)
+    size = len(arrays) if max_steps is None else min(len(arrays), max_steps)
+
+    inflow = arrays.inflow_m3_15min
+    timestamps = arrays.timestamps_s
+    prices = arrays.price_eur_cent_per_kwh
+    price_stats = forward_price_stat_arrays(timestamps, prices)
+
+    # Tuning constants of the controller, as floats.
+    min_runtime_s = int(config.min_runtime.total_seconds())
+    drain_interval_s = int(config.drain_interval.total_seconds())
+    rain_threshold = float(config.rain_threshold_m3_15min)
+    flow_increment = float(config.flow_increment_m3_15min)
+    expensive_price_max_level = float(config.expensive_price_max_level_m)
+    above_mean_price_max_level = float(config.above_mean_price_max_level_m)
+    drain_target_level = float(config.drain_target_level_m)
+    smoothed_inflow = _smoothed_inflow(inflow, float(config.smoothing_alpha))
+
+    water_volume = np.empty(size)
+    water_level = np.empty(size)
+    outflow = np.empty(size)
+    activation_masks = np.zeros(size, dtype=np.int64)
+    if pump_curves is not None:
+        pump_type_indices = pump_curves.type_indices([pump.pump_type for pump in pumps])
+        pump_power = np.zeros((size, len(pumps)))
+        pump_flow = np.zeros((size, len(pumps)))
+
+    # Controller state kept in plain arrays and scalars.
+    pump_count = len(fleet.pump_ids)
+    is_active = np.zeros(pump_count, dtype=bool)
+    run_start_s = np.full(pump_count, NO_TIME, dtype=np.int64)
+    last_stop_s = np.full(pump_count, NO_TIME, dtype=np.int64)
+    current_mask = 0
+    current_capacity = 0.0
+    target_outflow: float | None = None
+    last_drain_s: int | None = None
+    pending_drain = False
+
+    level_from_volume = geometry.level_from_volume
+    volume = float(initial_water_volume_m3)
+    level = level_from_volume(volume)
+    water_volume[0] = volume
+    water_level[0] = level
+    outflow[0] = 0.0
+
+    mask_table = fleet.mask_table
+    bit_values = fleet.bit_values
+    max_capacity = fleet.max_capacity
+    min_capacity = fleet.min_capacity
+
+    # Energy cost per step of every activation mask, in EUR per (EUR cent/kWh).
+    mask_cost_factor = np.zeros(1 << pump_count)
+    all_masks = np.arange(1 << pump_count)
+    for pump_index, bit in enumerate(bit_values):
+        mask_cost_factor[(all_masks & bit) != 0] += fleet.power_kw[pump_index]
+    mask_cost_factor *= 0.25 / 100.0
+    cost_eur = 0.0
+
+    steps = size
+    breached = False
+    stopped_at_cost_limit = False
+    for index in range(1, size):
+        step_inflow = float(inflow[index])
+
+        # Tunnel mass balance, identical to run_step.
+        pump_capacity = current_capacity
+        if pump_curves is not None:
+            points = (
+                pump_curves.operating_points(pump_type_indices, level)
+                * (is_active[:, None])
+            )
+            pump_capacity = float(points[:, 0].sum())
+        max_removable = volume + step_inflow - V_MIN
+        if max_removable < 0.0:
+            max_removable = 0.0
+        step_outflow = min(pump_capacity, max_removable)
+        new_volume = volume + step_inflow - step_outflow
+        if new_volume < V_MIN:
+            new_volume = V_MIN
+        new_level = level_from_volume(new_volume)
+
+        if new_level >= MAX_SAFE_LEVEL_M:
+            breached = True
+            steps = index
+            break
+
+        water_volume[index] = new_volume
+        water_level[index] = new_level
+        outflow[index] = step_outflow
+        activation_masks[index] = current_mask
+        if pump_curves is not None:
+            pump_flow[index] = points[:, 0]
+            pump_power[index] = points[:, 1]
+
+        if cost_limit_eur is not None:
+            if pump_curves is None:
+                step_cost_factor = mask_cost_factor[current_mask]
+            else:
+                step_cost_factor = float(points[:, 1].sum()) * 0.25 / 100.0
+            cost_eur += step_cost_factor * float(prices[index])
+            if cost_eur > cost_limit_eur:
+                stopped_at_cost_limit = True
+                steps = index + 1
+                break
+
+        # Constant flow controller, fed with the volume before this step.
+        now_s = int(timestamps[index])
+        low_inflow = step_inflow <= rain_threshold
+        meets_drain_target = level <= drain_target_level
+        if meets_drain_target:
+            last_drain_s = now_s
+            pending_drain = False
+        drain_due = last_drain_s is None or now_s - last_drain_s >= drain_interval_s
+        if drain_due and not meets_drain_target:
+            pending_drain = True
+
+        current_target = target_outflow
+        if current_target is None or current_target == 0.0:
+            current_target = current_capacity
+        if current_target == 0.0:
+            current_target = min_capacity
+
+        if pending_drain and low_inflow and not meets_drain_target:
+            desired_target = max_capacity
+        else:
+            baseline_target = _round_half_up(
+                float(smoothed_inflow[index]), flow_increment
+            )
+            baseline_target = max(min_capacity, min(baseline_target, max_capacity))
+            price_bias_steps = 0
+            if not pending_drain and price_stats.count[index] > 0:
+                price = float(prices[index])
+                if price <= price_stats.q25_price[index]:
+                    price_bias_steps = 1
+                elif (
+                    price >= price_stats.q75_price[index]
+                    and low_inflow
+                    and level < expensive_price_max_level
+                ):
+                    price_bias_steps = -1
+                elif (
+                    price > price_stats.mean_price[index]
+                    and price > price_stats.min_price[index]
+                    and low_inflow
+                    and level < above_mean_price_max_level
+                ):
+                    price_bias_steps = -1
+                elif (
+                    price <= price_stats.mean_price[index]
+                    and price <= price_stats.min_price[index]
+                ):
+                    price_bias_steps = 1
+
+            if price_bias_steps:
+                baseline_target += price_bias_steps * flow_increment
+                baseline_target = max(min_capacity, min(baseline_target, max_capacity))
+
+            delta = baseline_target - current_target
+            if delta > flow_increment:
+                desired_target = current_target + flow_increment
+            elif delta < -flow_increment:
+                desired_target = current_target - flow_increment
+            else:
+                desired_target = baseline_target
+            desired_target = max(min_capacity, min(desired_target, max_capacity))
+
+        max_safe_outflow = volume + step_inflow - V_MIN
+        if max_safe_outflow < 0.0:
+            max_safe_outflow = 0.0
+        if max_safe_outflow < min_capacity:
+            max_safe_outflow = min_capacity
+        desired_target = min(desired_target, max_safe_outflow)
+
+        # Pumps whose state may change under the minimum runtime rule.
+        changeable = 0
+        for pump_index in range(pump_count):
+            if is_active[pump_index]:
+                if now_s - run_start_s[pump_index] >= min_runtime_s:
+                    changeable |= bit_values[pump_index]
+            elif (
+                last_stop_s[pump_index] == NO_TIME
+                or now_s - last_stop_s[pump_index] >= min_runtime_s
+            ):
+                changeable |= bit_values[pump_index]
+
+        best_mask = mask_table.best_mask(
+            current_mask=current_mask,
+            changeable_mask=changeable,
+            desired_capacity=desired_target,
+            current_capacity=current_capacity,
+        )
+        if best_mask is None:
+            best_mask = current_mask
+
+        if best_mask != current_mask:
+            changed = best_mask ^ current_mask
+            for pump_index in range(pump_count):
+                if not changed & bit_values[pump_index]:
+                    continue
+                if is_active[pump_index]:
+                    is_active[pump_index] = False
+                    last_stop_s[pump_index] = now_s
+                    run_start_s[pump_index] = NO_TIME
+                else:
+                    is_active[pump_index] = True
+                    run_start_s[pump_index] = now_s
+            current_mask = best_mask
+            current_capacity = float(mask_table.capacities[best_mask])
+
+        target_outflow = min(float(mask_table.capacities[best_mask]), max_safe_outflow)
+
+        volume = new_volume
+        level = new_level
+
+    return VectorizedSimulationResult(
+        log=SimulationLog.from_arrays(
+            pumps=pumps,
+            timestamps_ns=timestamps[:steps] * 1_000_000_000,
+            water_volume_m3=water_volume[:steps],
+            water_level_m=water_level[:steps],
+            inflow_m3_15min=inflow[:steps],
+            outflow_m3_15min=outflow[:steps],
+            activation_masks=activation_masks[:steps],
+            electricity_price_eur_cent_per_kwh=prices[:steps],
+            electricity_price_eur_cent_per_kwh_high=arrays.price_high_eur_cent_per_kwh[
+                :steps
+            ],
+            pump_power_kw=None if pump_curves is None else pump_power[:steps],
+            pump_flow_m3_15min=None if pump_curves is None else pump_flow[:steps],
+        ),
+        breached_safe_level=breached,
+        stopped_at_cost_limit=stopped_at_cost_limit,
+    )
+
+
+def check_parity(
+    dataframe: pandas.DataFrame,
+    initial_water_volume_m3: Decimal,
+    result: VectorizedSimulationResult,
+    tolerance: float = 1e-6,
+    config: ControllerConfig = DEFAULT_CONTROLLER_CONFIG,
+    geometry: TunnelGeometry = ANALYTIC_GEOMETRY,
+    pump_curves: PumpCurveTable | None = None,
+) -> ParityReport:
+    """Compare a vectorized run against the fixed-point ``simulate`` loop."""
+    reference = simulate(
+        dataframe=dataframe,
+        initial_water_volume_m3=initial_water_volume_m3,
+        verbose=False,
+        config=config,
+        geometry=geometry,
+        pump_curves=pump_curves,
+    )
+    log = result.log
+    steps = min(len(reference), len(log))
+
+    def _max_diff(reference_values: np.ndarray, values: np.ndarray) -> float:
+        return float(np.max(np.abs(reference_values[:steps] - values[:steps])))
+
+    return ParityReport(
+        steps_compared=steps,
+        max_volume_diff_m3=_max_diff(reference.water_volume_m3, log.water_volume_m3),
+        max_level_diff_m=_max_diff(reference.water_level_m, log.water_level_m),
+        max_outflow_diff_m3=_max_diff(reference.outflow_m3_15min, log.outflow_m3_15min),
+        mask_mismatches=int(
+            np.count_nonzero(
+                reference.activation_masks[:steps] != log.activation_masks[:steps]
+            )
+        ),
+        tolerance=tolerance,
+    )
+
+
+def run_vectorized_with_parity(
+    dataframe: pandas.DataFrame,
+    initial_water_volume_m3: Decimal,
+    tolerance: float = 1e-6,
+) -> VectorizedSimulationResult:
+    """Run the vectorized engine and fail loudly if it drifts from ``simulate``."""
+    result = run_vectorized(
+        arrays=SimulationArrays.from_dataframe(dataframe),
+        initial_water_volume_m3=float(initial_water_volume_m3),
+    )
+    report = check_parity(
+        dataframe=dataframe,
+        initial_water_volume_m3=initial_water_volume_m3,
+        result=result,
+        tolerance=tolerance,
+    )
+    if not report.passed:
+        raise ParityError(
+            f"Vectorized run diverged from the fixed-point simulate loop: {report}"
+        )
+    return result
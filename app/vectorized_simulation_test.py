@@ -0,0 +1,109 @@
+import math
+from decimal import Decimal
+
+from datetime import timedelta
+
+import numpy as np
+import pandas
+
+from app.controller_config import ControllerConfig
+from app.vectorized_simulation import (
+    SimulationArrays,
+    check_parity,
+    run_vectorized,
+)
+
+
+def _synthetic_dataframe(rows: int = 400) -> pandas.DataFrame:
+    rng = np.random.default_rng(3)
+    steps = np.arange(rows)
+    inflow = 1200 + 900 * np.sin(steps / 30) ** 2 + rng.uniform(0, 400, rows)
+    inflow[150:170] += 2500  # a short storm
+    prices = np.round(5 + 4 * np.sin(steps / 12) + rng.uniform(0, 1, rows), 3)
+    return pandas.DataFrame(
+        {
+            "timestamp": pandas.date_range("2024-11-15", periods=rows, freq="15min"),
+            "electricity_price_eur_cent_per_kwh": prices,
+            "electricity_price_eur_cent_per_kwh_high": prices + 3,
+            "inflow_to_tunnel_m3_per_15min": inflow,
+        }
+    )
+
+
+class TestVectorizedSimulation:
+    def test_matches_the_fixed_point_simulation(self) -> None:
+        dataframe = _synthetic_dataframe()
+        initial_volume = Decimal("10064.9892578125")
+
+        result = run_vectorized(
+            arrays=SimulationArrays.from_dataframe(dataframe),
+            initial_water_volume_m3=float(initial_volume),
+        )
+        report = check_parity(
+            dataframe=dataframe,
+            initial_water_volume_m3=initial_volume,
+            result=result,
+        )
+
+        assert not result.breached_safe_level
+        assert report.steps_compared == len(dataframe)
+        assert report.passed, report
+
+    def test_matches_the_fixed_point_simulation_with_a_tuned_config(self) -> None:
+        dataframe = _synthetic_dataframe()
+        initial_volume = Decimal("30000")
+        config = ControllerConfig(
+            min_runtime=timedelta(hours=1),
+            rain_threshold_m3_15min=Decimal("1800"),
+            smoothing_alpha=Decimal("0.35"),
+            above_mean_price_max_level_m=Decimal("5"),
+            drain_interval=timedelta(hours=12),
+        )
+
+        result = run_vectorized(
+            arrays=SimulationArrays.from_dataframe(dataframe),
+            initial_water_volume_m3=float(initial_volume),
+            config=config,
+        )
+        report = check_parity(
+            dataframe=dataframe,
+            initial_water_volume_m3=initial_volume,
+            result=result,
+            config=config,
+        )
+
+        assert report.passed, report
+
+    def test_prefix_and_cost_limit_stop_early(self) -> None:
+        arrays = SimulationArrays.from_dataframe(_synthetic_dataframe())
+        full = run_vectorized(arrays=arrays, initial_water_volume_m3=10_000.0)
+        prefix = run_vectorized(
+            arrays=arrays, initial_water_volume_m3=10_000.0, max_steps=120
+        )
+        limited = run_vectorized(
+            arrays=arrays, initial_water_volume_m3=10_000.0, cost_limit_eur=50.0
+        )
+
+        assert len(prefix.log) == 120
+        assert np.array_equal(
+            prefix.log.activation_masks, full.log.activation_masks[:120]
+        )
+        assert limited.stopped_at_cost_limit
+        assert len(limited.log) < len(full.log)
+        assert np.array_equal(
+            limited.log.water_volume_m3, full.log.water_volume_m3[: len(limited.log)]
+        )
+
+    def test_stops_before_the_safe_level_is_exceeded(self) -> None:
+        dataframe = _synthetic_dataframe(rows=50)
+        dataframe["inflow_to_tunnel_m3_per_15min"] = 20_000.0
+
+        result = run_vectorized(
+            arrays=SimulationArrays.from_dataframe(dataframe),
+            initial_water_volume_m3=10_000.0,
+        )
+
+        assert result.breached_safe_level
+        assert len(result.log) < len(dataframe)
+        assert math.isfinite(result.log.water_level_m.max())
+        assert result.log.water_level_m.max() < 8.0
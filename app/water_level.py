@@ -1,4 +1,8 @@
 import math
+from typing import Literal
+
+import numpy as np
+import numpy.typing as npt
 
 # Constants from the definition
 R1 = 0.4  # m
@@ -102,6 +106,74 @@ def level_from_volume(volume: float) -> float:
     return R3 + Vdx
 
 
+OutOfRangePolicy = Literal["nan", "clip"]
+
+
+def _check_policy(out_of_range: OutOfRangePolicy) -> None:
+    if out_of_range not in ("nan", "clip"):
+        raise ValueError(f"Unknown out_of_range policy: {out_of_range}")
+
+
+def volume_from_level_array(
+    levels: npt.ArrayLike, out_of_range: OutOfRangePolicy = "nan"
+) -> np.ndarray:
+    """
+    Array version of volume_from_level, bit-identical to it inside the domain.
+
+    All four cases are evaluated with masks in one pass. Levels above R4
+    become NaN with ``out_of_range="nan"``; with ``"clip"`` they give the
+    volume at R4. NaN levels stay NaN under either policy.
+    """
+    _check_policy(out_of_range)
+    level = np.asarray(levels, dtype=float)
+    if out_of_range == "clip":
+        level = np.minimum(level, R4)
+
+    Vbx = level - R1
+    Vcx = level - R2
+    Vdx = level - R3
+    return np.select(
+        [level < R1, level < R2, level < R3, level <= R4],
+        [
+            V_MIN,
+            ((1000.0 * Vbx * Vbx) / 2.0) * 5.0 + 350.0,
+            (5500.0 * Vcx * 5.0) + 75975.0,
+            (((5.5 * 5500.0 / 2.0) - ((5.5 - Vdx) * (5.5 - Vdx) * 1000.0 / 2.0)) * 5.0)
+            + 150225.0,
+        ],
+        default=np.nan,
+    )
+
+
+def level_from_volume_array(
+    volumes: npt.ArrayLike, out_of_range: OutOfRangePolicy = "nan"
+) -> np.ndarray:
+    """
+    Array version of level_from_volume, bit-identical to it inside the domain.
+
+    Volumes outside [V_MIN, V_MAX] become NaN with ``out_of_range="nan"``;
+    with ``"clip"`` they are clipped to the range first, so they map to R1
+    and the level at V_MAX. NaN volumes stay NaN under either policy.
+    """
+    _check_policy(out_of_range)
+    volume = np.asarray(volumes, dtype=float)
+    if out_of_range == "clip":
+        volume = np.clip(volume, V_MIN, V_MAX)
+
+    in_range = (volume >= V_MIN) & (volume <= V_MAX)
+    # Same tolerance as math.isclose with its default rel_tol.
+    at_min = np.abs(volume - V_MIN) <= 1e-9 * np.maximum(np.abs(volume), V_MIN)
+    with np.errstate(invalid="ignore"):
+        case_2 = R1 + np.sqrt((volume - 350.0) / 2500.0)
+        case_3 = R2 + (volume - 75975.0) / 27500.0
+        case_4 = R3 + (5.5 - np.sqrt((225850.0 - volume) / 2500.0))
+    return np.select(
+        [~in_range, at_min, volume <= V_R2, volume <= V_R3],
+        [np.nan, R1, case_2, case_3],
+        default=case_4,
+    )
+
+
 # (Optional) quick sanity checks
 if __name__ == "__main__":
     for lvl in [R1, R2, R3, R4]:
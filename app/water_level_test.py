@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from app.water_level import (
+    R1,
+    R2,
+    R3,
+    R4,
+    V_MAX,
+    V_MIN,
+    V_R2,
+    V_R3,
+    level_from_volume,
+    level_from_volume_array,
+    volume_from_level,
+    volume_from_level_array,
+)
+
+
+class TestWaterLevelArrays:
+    def test_volume_from_level_matches_the_scalar_function_exactly(self) -> None:
+        rng = np.random.default_rng(1)
+        levels = np.concatenate(
+            [rng.uniform(-1.0, R4, 10_000), [R1, R2, R3, R4, np.nextafter(R2, 0)]]
+        )
+
+        expected = np.array([volume_from_level(level) for level in levels])
+
+        assert np.array_equal(volume_from_level_array(levels), expected)
+
+    def test_level_from_volume_matches_the_scalar_function_exactly(self) -> None:
+        rng = np.random.default_rng(2)
+        volumes = np.concatenate(
+            [
+                rng.uniform(V_MIN, V_MAX, 10_000),
+                [V_MIN, V_MIN * (1 + 1e-10), V_R2, V_R3, V_MAX],
+                [np.nextafter(V_R2, 0), np.nextafter(V_R3, V_MAX)],
+            ]
+        )
+
+        expected = np.array([level_from_volume(volume) for volume in volumes])
+
+        assert np.array_equal(level_from_volume_array(volumes), expected)
+
+    def test_out_of_range_policy(self) -> None:
+        volumes = np.array([V_MIN - 1, V_MAX + 1, np.nan])
+
+        assert np.isnan(level_from_volume_array(volumes)).all()
+        clipped = level_from_volume_array(volumes, out_of_range="clip")
+        assert clipped[0] == R1
+        assert clipped[1] == level_from_volume(V_MAX)
+        assert np.isnan(clipped[2])
+
+        assert np.isnan(volume_from_level_array([R4 + 1]))[0]
+        assert volume_from_level_array([R4 + 1], out_of_range="clip")[0] == V_MAX
+        with pytest.raises(ValueError):
+            level_from_volume_array(volumes, out_of_range="raise")  # pyright: ignore
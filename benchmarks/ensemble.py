@@ -0,0 +1,57 @@
+import argparse
+import time
+
+from app.ensemble import perturbed_inflows, run_ensemble
+from app.ingest import load_simulation_input
+from app.vectorized_simulation import SimulationArrays, run_vectorized
+
+
+"""
+Monte Carlo ensemble of storm scenarios on the HSY data, against separate runs.
+
+    python -m benchmarks.ensemble --members 500
+"""
+
+
+def main(data_path: str, members: int, separate_runs: int, seed: int) -> None:
+    simulation_input = load_simulation_input(data_path)
+    arrays = SimulationArrays.from_dataframe(simulation_input.dataframe)
+    initial_volume = float(simulation_input.initial_water_volume_m3)
+    inflows = perturbed_inflows(arrays.inflow_m3_15min, members, seed=seed)
+
+    start = time.perf_counter()
+    result = run_ensemble(arrays, initial_volume, inflows)
+    ensemble_s = time.perf_counter() - start
+
+    # A sample of the members run one by one, extrapolated to the whole ensemble.
+    sample = min(separate_runs, members)
+    start = time.perf_counter()
+    for inflow in inflows[:sample]:
+        run_vectorized(
+            arrays.model_copy(update={"inflow_m3_15min": inflow}), initial_volume
+        )
+    separate_s = (time.perf_counter() - start) / sample * members
+
+    summary = result.summary()
+    print(f"{members} members x {len(arrays)} steps")
+    print(
+        f"ensemble {ensemble_s:.2f} s, separate runs ~{separate_s:.2f} s "
+        f"({separate_s / ensemble_s:.1f}x)"
+    )
+    print(f"overflow probability {summary.overflow_probability:.1%}")
+    for name, distribution in (
+        ("peak level m", summary.peak_level_m),
+        ("cost EUR", summary.cost_eur),
+    ):
+        values = ", ".join(f"{key} {value:.2f}" for key, value in distribution.items())
+        print(f"{name:>13}: {values}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the ensemble runner.")
+    parser.add_argument("--data", default="Hackathon_HSY_data.csv")
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--separate-runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    main(args.data, args.members, args.separate_runs, args.seed)
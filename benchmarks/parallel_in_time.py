@@ -0,0 +1,84 @@
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import pandas
+
+from app.ingest import load_simulation_input
+from app.parallel_in_time import run_parallel_in_time
+from app.simulation import run, simulate
+from benchmarks.suite import DATASET_ROWS, synthetic_extension
+
+
+"""
+Parallel-in-time runner against the plain sequential loop.
+
+Times ``simulation.run`` (with its output silenced, as in the suite), the
+bare ``simulate`` loop and ``run_parallel_in_time``, checks that the
+parallel log is identical, and reports the iterations it needed.
+
+    python -m benchmarks.parallel_in_time --size 1y --chunks 16 --workers 8
+"""
+
+
+def main(data_path: str, size: str, chunks: int | None, workers: int | None) -> None:
+    simulation_input = load_simulation_input(data_path)
+    rows = DATASET_ROWS[size]
+    dataframe = (
+        simulation_input.dataframe
+        if rows is None
+        else synthetic_extension(simulation_input.dataframe, rows)
+    )
+    initial_volume = simulation_input.initial_water_volume_m3
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(
+                dataframe,
+                initial_volume,
+                output_path=os.path.join(directory, "run.csv"),
+            )
+        run_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = simulate(dataframe, initial_volume, verbose=False)
+    simulate_s = time.perf_counter() - start
+
+    log, report = run_parallel_in_time(
+        dataframe, initial_volume, chunks=chunks, max_workers=workers
+    )
+    pandas.testing.assert_frame_equal(
+        log.to_dataframe(), reference.to_dataframe(), check_exact=True
+    )
+
+    print(
+        f"{len(dataframe)} rows in {report.chunks} chunks on {report.workers} workers "
+        f"({os.cpu_count()} CPUs)"
+    )
+    print(
+        f"{report.iterations} iterations ({report.iterations - 1} corrections), "
+        f"{report.chunk_runs} chunk runs, identical log"
+    )
+    print(f"simulation.run      {run_s:8.3f} s")
+    print(f"simulate            {simulate_s:8.3f} s")
+    print(
+        f"parallel in time    {report.wall_s:8.3f} s "
+        f"({run_s / report.wall_s:.2f}x over run, "
+        f"{simulate_s / report.wall_s:.2f}x over simulate)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the parallel-in-time runner."
+    )
+    parser.add_argument("--data", default="Hackathon_HSY_data.csv")
+    parser.add_argument("--size", choices=list(DATASET_ROWS), default="1y")
+    parser.add_argument("--chunks", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    main(args.data, args.size, args.chunks, args.workers)
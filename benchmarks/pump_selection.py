@@ -0,0 +1,136 @@
+import argparse
+import random
+import time
+from collections.abc import Callable
+from datetime import datetime
+from decimal import Decimal
+from itertools import product
+
+from app.pump import PUMP_CAPACITY_M3_15MIN, Pump, PumpType
+from app.pump_masks import ActivationMaskTable
+from app.pump_selection import select_activation_grouped
+
+
+"""
+Pump selection cost per decision versus fleet size.
+
+Compares the original 2^N ``itertools.product`` search, the precomputed mask
+tables (build cost reported separately) and the grouped knapsack search.
+
+    python -m benchmarks.pump_selection --max-pumps 20
+"""
+
+
+def _fleet(size: int, rng: random.Random) -> list[Pump]:
+    return [
+        Pump(
+            id=str(index),
+            pump_type=PumpType.SMALL if index % 4 == 0 else PumpType.LARGE,
+            current_run_time_start=datetime(2024, 11, 15)
+            if rng.random() < 0.4
+            else None,
+        )
+        for index in range(size)
+    ]
+
+
+def _brute_force(
+    pumps: list[Pump], changeable: list[bool], desired: Decimal, current: Decimal
+) -> tuple[bool, ...] | None:
+    capacities = [Decimal(PUMP_CAPACITY_M3_15MIN[p.pump_type]) for p in pumps]
+    best_mask = None
+    best_score = None
+    for mask in product([False, True], repeat=len(pumps)):
+        active_count = sum(mask)
+        if active_count == 0:
+            continue
+        toggle_count = 0
+        allowed = True
+        for pump, free, desired_on in zip(pumps, changeable, mask):
+            if pump.is_active == desired_on:
+                continue
+            if not free:
+                allowed = False
+                break
+            toggle_count += 1
+        if not allowed:
+            continue
+        capacity = sum(c for c, on in zip(capacities, mask) if on)
+        score = (
+            abs(capacity - desired),
+            toggle_count,
+            abs(capacity - current),
+            active_count,
+        )
+        if best_score is None or score < best_score:
+            best_score = score
+            best_mask = mask
+    return best_mask
+
+
+def _time_per_call(function: Callable[[], object], budget_s: float = 0.2) -> float:
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget_s:
+            return elapsed / calls
+
+
+def main(max_pumps: int, brute_force_max_pumps: int) -> None:
+    rng = random.Random(1)
+    print(
+        f"{'pumps':>5} {'brute force':>14} {'table build':>14} "
+        f"{'table':>12} {'grouped':>12}"
+    )
+    crossover: int | None = None
+    for size in range(2, max_pumps + 1, 2):
+        pumps = _fleet(size, rng)
+        changeable = [rng.random() < 0.8 for _ in pumps]
+        current = sum(
+            (
+                Decimal(PUMP_CAPACITY_M3_15MIN[p.pump_type])
+                for p in pumps
+                if p.is_active
+            ),
+            Decimal("0"),
+        )
+        desired = Decimal(375 * size // 2)
+
+        brute_force = (
+            f"{_time_per_call(lambda: _brute_force(pumps, changeable, desired, current)) * 1e6:.1f}us"
+            if size <= brute_force_max_pumps
+            else "-"
+        )
+
+        build_start = time.perf_counter()
+        table = ActivationMaskTable([p.pump_type for p in pumps])
+        build_s = time.perf_counter() - build_start
+        current_mask = table.mask_of(pumps)
+        changeable_mask = sum(b for b, f in zip(table.bit_values, changeable) if f)
+        table_s = _time_per_call(
+            lambda: table.best_mask(current_mask, changeable_mask, desired, current)
+        )
+
+        grouped_s = _time_per_call(
+            lambda: select_activation_grouped(pumps, changeable, desired, current)
+        )
+        if crossover is None and grouped_s < table_s:
+            crossover = size
+
+        print(
+            f"{size:>5} {brute_force:>14} {build_s * 1e6:>12.1f}us "
+            f"{table_s * 1e6:>10.1f}us {grouped_s * 1e6:>10.1f}us"
+        )
+
+    print(f"Grouped search beats the mask table from {crossover} pumps on.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pump selection.")
+    parser.add_argument("--max-pumps", type=int, default=20)
+    parser.add_argument("--brute-force-max-pumps", type=int, default=14)
+    args = parser.parse_args()
+    main(args.max_pumps, args.brute_force_max_pumps)
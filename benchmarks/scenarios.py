@@ -0,0 +1,45 @@
+import argparse
+import os
+import time
+
+from app.ingest import load_simulation_input
+from app.scenarios import ScenarioSpec, run_scenarios
+from app.vectorized_simulation import SimulationArrays
+
+
+"""
+Scenario runner throughput versus worker count on the HSY data.
+
+    python -m benchmarks.scenarios --scenarios 64
+"""
+
+
+def main(data_path: str, scenario_count: int, max_workers: int) -> None:
+    simulation_input = load_simulation_input(data_path)
+    arrays = SimulationArrays.from_dataframe(simulation_input.dataframe)
+    initial_volume = float(simulation_input.initial_water_volume_m3)
+    scenarios = [
+        ScenarioSpec(name=f"inflow x{scale:.3f}", inflow_scale=scale)
+        for scale in (0.5 + index / scenario_count for index in range(scenario_count))
+    ]
+
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+    baseline: float | None = None
+    workers = 1
+    while workers <= max_workers:
+        start = time.perf_counter()
+        run_scenarios(arrays, initial_volume, scenarios, max_workers=workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>9.3f} {baseline / elapsed:>8.2f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scenario runner.")
+    parser.add_argument("--data", default="Hackathon_HSY_data.csv")
+    parser.add_argument("--scenarios", type=int, default=32)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    main(args.data, args.scenarios, args.max_workers)
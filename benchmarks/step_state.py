@@ -0,0 +1,126 @@
+import argparse
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime, timedelta
+
+from app.ingest import load_simulation_input
+from app.pump import PumpRecord, PumpState, PumpStateRecord, default_pumps, toggle_pump
+from app.simulation import SimulationState, SimulationStateRecord, simulate
+
+
+"""
+Cost of the per-step state objects: validated pydantic models versus the
+slotted records the simulation loop passes around.
+
+For each kind of object the time per construction and the bytes allocated
+per construction are reported, followed by the whole simulation on the HSY
+data (time and peak traced memory per step).
+
+    python -m benchmarks.step_state
+"""
+
+
+def _time_per_call(function: Callable[[], object], budget_s: float = 0.2) -> float:
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget_s:
+            return elapsed / calls
+
+
+def _bytes_per_call(function: Callable[[], object], calls: int = 1000) -> float:
+    """Bytes still referenced by ``calls`` results, per call."""
+    results = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(calls):
+        results.append(function())
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / calls
+
+
+def main(data_path: str) -> None:
+    timestamp = datetime(2024, 11, 15)
+    later = timestamp + timedelta(hours=3)
+    models = [toggle_pump(pump, timestamp) for pump in default_pumps()]
+    records = [PumpRecord.from_model(pump) for pump in models]
+    model_state = PumpState(pumps=models, target_outflow_ul_15min=750_000_000_000)
+    record_state = PumpStateRecord.from_model(model_state)
+
+    cases: list[tuple[str, Callable[[], object], Callable[[], object]]] = [
+        (
+            "toggle_pump",
+            lambda: toggle_pump(models[0], later),
+            lambda: toggle_pump(records[0], later),
+        ),
+        (
+            "PumpState",
+            lambda: PumpState(
+                pumps=models,
+                target_outflow_ul_15min=750_000_000_000,
+                average_inflow_ul_15min=1_500_000_000_000,
+                last_daily_drain_timestamp=timestamp,
+            ),
+            lambda: PumpStateRecord(
+                pumps=records,
+                target_outflow_ul_15min=750_000_000_000,
+                average_inflow_ul_15min=1_500_000_000_000,
+                last_daily_drain_timestamp=timestamp,
+            ),
+        ),
+        (
+            "SimulationState",
+            lambda: SimulationState(
+                outflow_ul_15min=750_000_000_000,
+                water_volume_ul=20_000_000_000_000,
+                water_level_from_water_volume_m=1.5,
+                pump_state=model_state,
+            ),
+            lambda: SimulationStateRecord(
+                outflow_ul_15min=750_000_000_000,
+                water_volume_ul=20_000_000_000_000,
+                water_level_from_water_volume_m=1.5,
+                pump_state=record_state,
+            ),
+        ),
+    ]
+
+    print(
+        f"{'object':>16} {'pydantic':>12} {'slotted':>12} {'pydantic':>10} {'slotted':>10}"
+    )
+    for name, model_factory, record_factory in cases:
+        print(
+            f"{name:>16} "
+            f"{_time_per_call(model_factory) * 1e6:>10.2f}us "
+            f"{_time_per_call(record_factory) * 1e6:>10.2f}us "
+            f"{_bytes_per_call(model_factory):>9.0f}B "
+            f"{_bytes_per_call(record_factory):>9.0f}B"
+        )
+
+    simulation_input = load_simulation_input(data_path)
+    dataframe = simulation_input.dataframe
+    steps = len(dataframe) - 1
+    start = time.perf_counter()
+    simulate(dataframe, simulation_input.initial_water_volume_m3, verbose=False)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    simulate(dataframe, simulation_input.initial_water_volume_m3, verbose=False)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(
+        f"simulate: {elapsed / steps * 1e6:.1f}us/step, "
+        f"peak traced memory {peak / 1024:.0f} KiB for {steps} steps"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-step state objects.")
+    parser.add_argument("--data", default="Hackathon_HSY_data.csv")
+    args = parser.parse_args()
+    main(args.data)
@@ -0,0 +1,344 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas
+from pydantic import BaseModel
+
+import validate_run
+from app.fixed_point import VOLUME_UNITS_PER_M3, price_units, volume_units
+from app.geometry import ANALYTIC_GEOMETRY
+from app.ingest import load_simulation_input
+from app.price_window import ForwardPriceWindow
+from app.pump import PumpState, PumpStateRecord, default_pumps
+from app.simulation import (
+    change_pump_state,
+    change_pump_state_constant_flow,
+    run,
+    run_step,
+    simulate,
+)
+
+
+"""
+Benchmark suite for the simulation core at scaled data sizes.
+
+Times ``run_step``, ``change_pump_state``, ``change_pump_state_constant_flow``,
+a full ``simulation.run`` and the ``validate_run`` metrics on the shipped data
+and on synthetic extensions of it (the rows repeated with continuing
+timestamps). Every benchmark records the wall time, per-step latency
+percentiles and, in a separate pass, the peak traced memory.
+
+    python -m benchmarks.suite --output benchmark.json
+    python -m benchmarks.suite --sizes shipped,1y --compare benchmark.json
+
+``--compare`` exits with status 1 when a wall time or p95 latency is more
+than ``--threshold`` slower than in the baseline file.
+"""
+
+STEPS_PER_YEAR = 365 * 96
+DATASET_ROWS = {"shipped": None, "1y": STEPS_PER_YEAR, "10y": 10 * STEPS_PER_YEAR}
+COMPARED_METRICS = ("wall_s", "p95_us")
+
+
+class BenchmarkResult(BaseModel):
+    name: str
+    dataset: str
+    rows: int
+    wall_s: float
+    p50_us: float
+    p95_us: float
+    p99_us: float
+    max_us: float
+    peak_memory_kib: float
+
+
+class Regression(BaseModel):
+    name: str
+    dataset: str
+    metric: str
+    baseline: float
+    current: float
+
+
+def synthetic_extension(dataframe: pandas.DataFrame, rows: int) -> pandas.DataFrame:
+    """``rows`` rows of ``dataframe`` repeated, with 15-minute timestamps continuing on."""
+    positions = np.arange(rows) % len(dataframe)
+    extended = dataframe.iloc[positions].reset_index(drop=True)
+    extended["timestamp"] = pandas.date_range(
+        dataframe["timestamp"].iloc[0], periods=rows, freq="15min"
+    )
+    return extended
+
+
+def _percentiles(latencies_ns: list[float]) -> dict[str, float]:
+    latencies_us = np.asarray(latencies_ns, dtype=float) / 1000.0
+    p50, p95, p99 = np.percentile(latencies_us, [50, 95, 99])
+    return {
+        "p50_us": float(p50),
+        "p95_us": float(p95),
+        "p99_us": float(p99),
+        "max_us": float(latencies_us.max()),
+    }
+
+
+def _peak_memory_kib(function: Callable[[], object]) -> float:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def _replay_steps(
+    dataframe: pandas.DataFrame, initial_water_volume_m3: Decimal
+) -> dict[str, list[float]]:
+    """Per-call latencies of the step functions along a constant flow run.
+
+    ``change_pump_state`` is timed on the same states, but its decision is
+    discarded so all three functions see the same trajectory.
+    """
+    timestamps = [timestamp.to_pydatetime() for timestamp in dataframe["timestamp"]]
+    inflows = volume_units(dataframe["inflow_to_tunnel_m3_per_15min"]).tolist()
+    inflows_m3 = [
+        Decimal(value) for value in dataframe["inflow_to_tunnel_m3_per_15min"].tolist()
+    ]
+    prices = price_units(dataframe["electricity_price_eur_cent_per_kwh"]).tolist()
+    price_window = ForwardPriceWindow(timestamps=timestamps, prices=prices)
+
+    water_volume_ul = int(volume_units(float(initial_water_volume_m3)))
+    water_level_m = ANALYTIC_GEOMETRY.level_from_volume(float(initial_water_volume_m3))
+    pump_state = PumpStateRecord.from_model(PumpState(pumps=default_pumps()))
+    latencies: dict[str, list[float]] = {
+        "run_step": [],
+        "change_pump_state": [],
+        "change_pump_state_constant_flow": [],
+    }
+    clock = time.perf_counter_ns
+    for index in range(1, len(timestamps)):
+        start = clock()
+        state = run_step(inflows[index], water_volume_ul, pump_state)
+        latencies["run_step"].append(clock() - start)
+
+        start = clock()
+        change_pump_state(
+            pump_state,
+            Decimal(water_volume_ul) / VOLUME_UNITS_PER_M3,
+            inflows_m3[index],
+            timestamps[index],
+        )
+        latencies["change_pump_state"].append(clock() - start)
+
+        start = clock()
+        pump_state = change_pump_state_constant_flow(
+            pump_state,
+            water_volume_ul,
+            water_level_m,
+            inflows[index],
+            timestamps[index],
+            prices[index],
+            price_window.integer_stats(index),
+        )
+        latencies["change_pump_state_constant_flow"].append(clock() - start)
+
+        water_volume_ul = state.water_volume_ul
+        water_level_m = state.water_level_from_water_volume_m
+    return latencies
+
+
+def _benchmark_dataset(
+    dataset: str, dataframe: pandas.DataFrame, initial_water_volume_m3: Decimal
+) -> list[BenchmarkResult]:
+    rows = len(dataframe)
+    steps = rows - 1
+    results = []
+
+    def result(
+        name: str, wall_s: float, latencies_ns: list[float], peak_kib: float
+    ) -> BenchmarkResult:
+        benchmark = BenchmarkResult(
+            name=name,
+            dataset=dataset,
+            rows=rows,
+            wall_s=wall_s,
+            peak_memory_kib=peak_kib,
+            **_percentiles(latencies_ns),
+        )
+        print(
+            f"{name:>32} {dataset:>8} {wall_s:>9.3f}s "
+            f"p50 {benchmark.p50_us:>8.1f}us p95 {benchmark.p95_us:>8.1f}us "
+            f"peak {peak_kib:>9.0f} KiB",
+            flush=True,
+        )
+        return benchmark
+
+    latencies = _replay_steps(dataframe, initial_water_volume_m3)
+    peak_kib = _peak_memory_kib(
+        lambda: _replay_steps(dataframe, initial_water_volume_m3)
+    )
+    for name, step_latencies in latencies.items():
+        results.append(
+            result(name, sum(step_latencies) / 1e9, step_latencies, peak_kib)
+        )
+
+    with tempfile.TemporaryDirectory() as directory:
+        output_path = os.path.join(directory, "run.csv")
+
+        def full_run() -> None:
+            with contextlib.redirect_stdout(io.StringIO()):
+                run(dataframe, initial_water_volume_m3, output_path=output_path)
+
+        start = time.perf_counter_ns()
+        full_run()
+        elapsed_ns = time.perf_counter_ns() - start
+        # One wall time per run; the per-step figures are its mean step.
+        results.append(
+            result(
+                "simulation.run",
+                elapsed_ns / 1e9,
+                [elapsed_ns / steps],
+                _peak_memory_kib(full_run),
+            )
+        )
+
+    log_frame = simulate(
+        dataframe, initial_water_volume_m3, verbose=False
+    ).to_dataframe()
+
+    def metrics() -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            validate_run.report(log_frame, show_plots=False)
+
+    start = time.perf_counter_ns()
+    metrics()
+    elapsed_ns = time.perf_counter_ns() - start
+    results.append(
+        result(
+            "validate_run.report",
+            elapsed_ns / 1e9,
+            [elapsed_ns / rows],
+            _peak_memory_kib(metrics),
+        )
+    )
+    return results
+
+
+def compare(
+    baseline: list[BenchmarkResult], current: list[BenchmarkResult], threshold: float
+) -> list[Regression]:
+    """Metrics of ``current`` more than ``threshold`` (a fraction) above the baseline."""
+    baseline_by_key = {(result.name, result.dataset): result for result in baseline}
+    regressions = []
+    for result in current:
+        reference = baseline_by_key.get((result.name, result.dataset))
+        if reference is None:
+            continue
+        for metric in COMPARED_METRICS:
+            before = getattr(reference, metric)
+            after = getattr(result, metric)
+            if after > before * (1 + threshold):
+                regressions.append(
+                    Regression(
+                        name=result.name,
+                        dataset=result.dataset,
+                        metric=metric,
+                        baseline=before,
+                        current=after,
+                    )
+                )
+    return regressions
+
+
+def read_results(file_path: str) -> list[BenchmarkResult]:
+    with open(file_path) as file:
+        return [BenchmarkResult(**result) for result in json.load(file)["results"]]
+
+
+def write_results(file_path: str, results: list[BenchmarkResult]) -> None:
+    document = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": [result.model_dump() for result in results],
+    }
+    with open(file_path, "w") as file:
+        json.dump(document, file, indent=2)
+
+
+def main(
+    data_path: str,
+    sizes: list[str],
+    output_path: str | None,
+    baseline_path: str | None,
+    threshold: float,
+) -> int:
+    simulation_input = load_simulation_input(data_path)
+    results = []
+    for dataset in sizes:
+        rows = DATASET_ROWS[dataset]
+        dataframe = (
+            simulation_input.dataframe
+            if rows is None
+            else synthetic_extension(simulation_input.dataframe, rows)
+        )
+        results.extend(
+            _benchmark_dataset(
+                dataset, dataframe, simulation_input.initial_water_volume_m3
+            )
+        )
+
+    if output_path is not None:
+        write_results(output_path, results)
+        print(f"Results written to {output_path}")
+
+    if baseline_path is None:
+        return 0
+    regressions = compare(read_results(baseline_path), results, threshold)
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression.name} [{regression.dataset}] {regression.metric}: "
+            f"{regression.baseline:.4g} -> {regression.current:.4g} "
+            f"(+{(regression.current / regression.baseline - 1) * 100:.0f}%)"
+        )
+    if not regressions:
+        print(f"No regressions above {threshold:.0%} against {baseline_path}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the simulation core.")
+    parser.add_argument("--data", default="Hackathon_HSY_data.csv")
+    parser.add_argument(
+        "--sizes",
+        default=",".join(DATASET_ROWS),
+        help=f"Comma separated datasets out of {', '.join(DATASET_ROWS)}.",
+    )
+    parser.add_argument("--output", default=None, help="Write the results as JSON.")
+    parser.add_argument(
+        "--compare", default=None, help="Baseline JSON to flag regressions against."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown before a metric counts as a regression (0.2 = 20%%).",
+    )
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    unknown = [size for size in sizes if size not in DATASET_ROWS]
+    if unknown:
+        parser.error(f"Unknown sizes: {', '.join(unknown)}")
+    sys.exit(main(args.data, sizes, args.output, args.compare, args.threshold))
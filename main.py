@@ -1,38 +1,178 @@
+import argparse
 from decimal import Decimal
-from app.simulation import run
-import pandas as pd
-
 
-def main() -> None:
-    df = pd.read_csv("Hackathon_HSY_data.csv")
+from app.checkpoint import SimulationCheckpoint, state_path
+from app.fixed_point import VOLUME_UNITS_PER_M3
+from app.geometry import ANALYTIC_GEOMETRY, load_table_geometry
+from app.ingest import load_simulation_input, load_simulation_rows_after
+from app.instrumentation import Instrumentation
+from app.pump_curves import DEFAULT_PUMP_CURVES
+from app.simulation import run
 
-    df["Time stamp"] = pd.to_datetime(df["Time stamp"], dayfirst=True, errors="raise")
 
-    initial_water_volume_m3 = df["Water volume in tunnel V (m3)"].tolist()[0]
+def main(
+    data_path: str = "Hackathon_HSY_data.csv",
+    output_path: str | None = None,
+    controller: str = "constant_flow",
+    horizon_hours: int = 12,
+    geometry_table_path: str | None = None,
+    pump_curves: bool = False,
+    instrument: bool = False,
+    profile: bool = False,
+    instrument_output_path: str | None = None,
+    fast_forward: bool = False,
+    checkpoint_path: str | None = None,
+    checkpoint_every: int = 96,
+    resume_path: str | None = None,
+    append: bool = False,
+) -> None:
+    if append:
+        if output_path is None:
+            raise ValueError("--append needs the --output of the earlier run")
+        # Only the rows after the stored end state are read from the data file.
+        checkpoint = SimulationCheckpoint.load(
+            checkpoint_path or state_path(output_path)
+        )
+        dataframe = load_simulation_rows_after(data_path, checkpoint.timestamp)
+        initial_water_volume_m3 = (
+            Decimal(checkpoint.water_volume_ul) / VOLUME_UNITS_PER_M3
+        )
+        print(f"Appending {len(dataframe)} rows after {checkpoint.timestamp}")
+        if dataframe.empty:
+            return
+    else:
+        simulation_input = load_simulation_input(data_path)
+        dataframe = simulation_input.dataframe
+        initial_water_volume_m3 = simulation_input.initial_water_volume_m3
+        print(f"Initial water volume: {initial_water_volume_m3} m3")
 
-    dada = df[
-        [
-            "Time stamp",
-            "Electricity price 2: normal (EUR/kWh)",
-            "Electricity price 1: high (EUR/kWh)",
-            "Inflow to tunnel F1 (m3/15 min)",
-        ]
-    ]
+    instrumentation = None
+    if instrument or profile or instrument_output_path is not None:
+        instrumentation = Instrumentation(profile=profile)
 
-    dada.rename(
-        columns={
-            "Time stamp": "timestamp",
-            "Electricity price 2: normal (EUR/kWh)": "electricity_price_eur_cent_per_kwh",
-            "Electricity price 1: high (EUR/kWh)": "electricity_price_eur_cent_per_kwh_high",
-            "Inflow to tunnel F1 (m3/15 min)": "inflow_to_tunnel_m3_per_15min",
-        },
-        inplace=True,
+    run(
+        dataframe=dataframe,
+        initial_water_volume_m3=initial_water_volume_m3,
+        output_path=output_path,
+        controller=controller,
+        horizon_hours=horizon_hours,
+        geometry=(
+            ANALYTIC_GEOMETRY
+            if geometry_table_path is None
+            else load_table_geometry(geometry_table_path)
+        ),
+        pump_curves=DEFAULT_PUMP_CURVES if pump_curves else None,
+        instrumentation=instrumentation,
+        fast_forward=fast_forward,
+        checkpoint_path=checkpoint_path,
+        checkpoint_every=checkpoint_every,
+        resume_path=resume_path,
+        append=append,
     )
 
-    print(f"Initial water volume: {initial_water_volume_m3} m3")
-
-    run(dataframe=dada, initial_water_volume_m3=Decimal(initial_water_volume_m3))
+    if instrumentation is not None and instrument_output_path is not None:
+        with open(instrument_output_path, "w") as file:
+            file.write(instrumentation.report().model_dump_json(indent=2))
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Run the tunnel pump simulation.")
+    parser.add_argument(
+        "--data",
+        default="Hackathon_HSY_data.csv",
+        help="HSY data file with timestamps, prices and tunnel inflow.",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Result file, .csv or .parquet (default: simulation_output_<time>.csv).",
+    )
+    parser.add_argument(
+        "--controller",
+        choices=["constant_flow", "mpc"],
+        default="constant_flow",
+        help="Pump controller (default: constant_flow).",
+    )
+    parser.add_argument(
+        "--horizon-hours",
+        type=int,
+        default=12,
+        help="Planning horizon of the mpc controller.",
+    )
+    parser.add_argument(
+        "--geometry-table",
+        default=None,
+        help="Measured volume-level table (.xlsx or .csv) to use instead of the "
+        "analytic tunnel geometry.",
+    )
+    parser.add_argument(
+        "--pump-curves",
+        action="store_true",
+        help="Use the head-dependent flow and power of the pump datasheets "
+        "instead of the nominal 750/375 m3 per 15 min.",
+    )
+    parser.add_argument(
+        "--instrument",
+        action="store_true",
+        help="Time every phase of the simulation loop and print a report.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Also run cProfile over the simulation and add its top functions "
+        "to the report.",
+    )
+    parser.add_argument(
+        "--instrument-output",
+        default=None,
+        help="Write the instrumentation report as JSON to this file.",
+    )
+    parser.add_argument(
+        "--fast-forward",
+        action="store_true",
+        help="Advance stretches in which the constant flow controller keeps its "
+        "pumps in bulk; the output is identical.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Keep the simulation state in this JSON file instead of next to "
+        "the output, rewritten every --checkpoint-every rows and when the run "
+        "ends or aborts.",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=96,
+        help="Rows between rewrites of the --checkpoint file (default: 96, one day).",
+    )
+    parser.add_argument(
+        "--resume",
+        default=None,
+        help="Continue from the checkpoint in this file; only the rows after "
+        "it are simulated and written.",
+    )
+    parser.add_argument(
+        "--append",
+        action="store_true",
+        help="Continue the run that wrote --output: simulate only the data rows "
+        "after its stored end state and append them to it.",
+    )
+    args = parser.parse_args()
+
+    main(
+        data_path=args.data,
+        output_path=args.output,
+        controller=args.controller,
+        horizon_hours=args.horizon_hours,
+        geometry_table_path=args.geometry_table,
+        pump_curves=args.pump_curves,
+        instrument=args.instrument,
+        profile=args.profile,
+        instrument_output_path=args.instrument_output,
+        fast_forward=args.fast_forward,
+        checkpoint_path=args.checkpoint,
+        checkpoint_every=args.checkpoint_every,
+        resume_path=args.resume,
+        append=args.append,
+    )
@@ -2,9 +2,14 @@ import argparse
 import os
 from statistics import pstdev
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from app.result_sink import read_results
+from app.simulation_log import SimulationLog
+from app.water_level import level_from_volume_array
+
 
 def get_pump_power_columns(df: pd.DataFrame) -> list[str]:
     return [
@@ -158,8 +163,18 @@ def calculate_power_draw_extremes(df: pd.DataFrame) -> None:
     print(f"Minimum total power draw: {min_power_kw:,.2f} kW at {min_power_timestamp}")
 
 
-def plot_pump_power_timeseries(df: pd.DataFrame) -> None:
+def check_water_level_consistency(df: pd.DataFrame) -> None:
+    volumes = df["Water volume in tunnel V (m3)"].to_numpy(dtype=float)
+    levels = df["Water level in tunnel L1 (m)"].to_numpy(dtype=float)
+    expected_levels = level_from_volume_array(volumes)
+    out_of_range = int(np.isnan(expected_levels).sum())
+    max_deviation = np.nanmax(np.abs(levels - expected_levels), initial=0.0)
+    print(f"Max deviation of water level from volume: {max_deviation:.6f} m")
+    if out_of_range:
+        print(f"Rows with volume outside the modeled range: {out_of_range}")
 
+
+def plot_pump_power_timeseries(df: pd.DataFrame) -> None:
     pump_power_columns = get_pump_power_columns(df)
     time_stamps = df["Time stamp"]
 
@@ -256,15 +271,18 @@ def plot_energy_cost_timeseries(df: pd.DataFrame) -> None:
     plt.show()
 
 
-def main(file_path: str) -> None:
-    df = pd.read_csv(file_path)
-
+def report(df: pd.DataFrame, show_plots: bool = True) -> None:
     calculate_energy_costs(df)
 
     calculate_all_pumps_runtime_hours(df)
 
     calculate_power_draw_extremes(df)
 
+    check_water_level_consistency(df)
+
+    if not show_plots:
+        return
+
     plot_pump_power_timeseries(df)
 
     plot_water_level_timeseries(df)
@@ -276,13 +294,24 @@ def main(file_path: str) -> None:
     plot_energy_cost_timeseries(df)
 
 
+def validate_log(log: SimulationLog, show_plots: bool = False) -> None:
+    """Report on a finished simulation in-process, without a CSV round trip."""
+    report(log.to_dataframe(), show_plots=show_plots)
+
+
+def main(file_path: str) -> None:
+    df = read_results(file_path)
+
+    report(df)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Validate pump run data.")
     parser.add_argument(
         "filename",
         nargs="?",
         default="Hackathon_HSY_data.csv",
-        help="Path to the CSV file containing pump readings.",
+        help="Path to the CSV or Parquet file containing pump readings.",
     )
     args = parser.parse_args()
     if not os.path.isfile(args.filename):